@@ -0,0 +1,123 @@
+"""
+Agendador de tarefas em segundo plano para a interface Tkinter.
+
+As requisições à API rodam em um pool de threads e os resultados voltam para
+a thread da interface por meio de `root.after`, já que widgets Tkinter só
+podem ser manipulados pela thread do mainloop.
+"""
+import logging
+import queue
+import time
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from diagnostico import intervalos, medir
+
+logger = logging.getLogger(__name__)
+
+
+class Tarefa:
+    """Representa uma tarefa agendada, que pode ser cancelada."""
+    def __init__(self):
+        self.cancelada = False
+        self._futuro = None
+
+    def cancelar(self):
+        """
+        Cancela a tarefa. Se ela ainda não começou, não chega a rodar; se já
+        estiver rodando, o resultado é descartado e nenhum callback é chamado.
+        """
+        self.cancelada = True
+        if self._futuro is not None:
+            self._futuro.cancel()
+
+
+class Agendador:
+    """
+    Executa funções em um pool de threads e entrega os resultados aos
+    callbacks na thread da interface.
+    """
+    def __init__(self, root, max_workers=4, intervalo=25):
+        """
+        Construtor do Agendador.
+
+        :param root: A janela principal (tk.Tk), usada para o `after`.
+        :param max_workers: (int) Número de threads do pool.
+        :param intervalo: (int) Intervalo, em milissegundos, entre as
+        verificações de resultados prontos.
+        """
+        self.root = root
+        self.intervalo = intervalo
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix='fipe')
+        # Fila onde as threads depositam (tarefa, callback, valor).
+        self._resultados = queue.SimpleQueue()
+        self._id_after = self.root.after(self.intervalo,
+                                         self._processar_resultados)
+
+    def agendar(self, funcao, *args, ao_concluir=None, ao_falhar=None,
+                ao_progresso=None):
+        """
+        Agenda `funcao(*args)` para rodar em segundo plano.
+
+        :param funcao: (function) Função a ser executada fora da interface.
+        :param ao_concluir: (function, opcional) Recebe o valor retornado.
+        :param ao_falhar: (function, opcional) Recebe a exceção lançada.
+        :param ao_progresso: (function, opcional) Recebe, na thread da
+        interface, cada valor parcial. Quando informado, `funcao` é chamada
+        com o argumento extra `progresso=`, uma função que a tarefa chama
+        (de sua thread) para publicar esses valores.
+        :return: (Tarefa) Objeto que permite cancelar a tarefa.
+        """
+        tarefa = Tarefa()
+        kwargs = {}
+        if ao_progresso:
+            kwargs['progresso'] = lambda valor: self._resultados.put(
+                (tarefa, ao_progresso, valor))
+
+        nome = getattr(funcao, '__qualname__', repr(funcao))
+        agendada_em = time.perf_counter()
+
+        def executar():
+            if tarefa.cancelada:
+                return
+            # Tempo parado na fila do pool antes de começar.
+            intervalos.registrar('fila', nome, agendada_em,
+                                 time.perf_counter() - agendada_em)
+            try:
+                with medir('tarefa', nome):
+                    resultado = funcao(*args, **kwargs)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                self._resultados.put((tarefa, ao_falhar, e))
+            else:
+                self._resultados.put((tarefa, ao_concluir, resultado))
+
+        tarefa._futuro = self._executor.submit(executar)  # pylint: disable=protected-access
+        return tarefa
+
+    def _processar_resultados(self):
+        """Entrega os resultados prontos aos callbacks (thread da interface)."""
+        # Reagendada antes de tudo: um callback com erro não pode parar a
+        # entrega dos resultados de todas as tarefas seguintes.
+        self._id_after = self.root.after(self.intervalo,
+                                         self._processar_resultados)
+        while True:
+            try:
+                tarefa, callback, valor = self._resultados.get_nowait()
+            except queue.Empty:
+                break
+            if callback and not tarefa.cancelada:
+                try:
+                    callback(valor)
+                except Exception:  # pylint: disable=broad-exception-caught
+                    logger.exception('Erro no callback %s.',
+                                     getattr(callback, '__qualname__',
+                                             repr(callback)))
+
+    def encerrar(self):
+        """Para de verificar resultados e descarta as tarefas pendentes."""
+        try:
+            self.root.after_cancel(self._id_after)
+        except tk.TclError:
+            # A janela já foi destruída (ex: ao encerrar a aplicação).
+            pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
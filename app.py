@@ -3,11 +3,36 @@ Modulo principal da aplicação. Implementa as lógicas de consulta e redirecion
 para os módulos responsáveis por exibir e manipular os dados.
 """
 from tkinter import messagebox, filedialog
+from functools import partial
 import json
+import logging
+import os
+import sys
 from menu import Menu
 from frame_cinco import Frame as Frame_Cinco
 from frame_selecao import FrameSelecao
-from frame_grafico import FrameGrafico
+from frame_busca_catalogo import FrameBuscaCatalogo
+from frame_codigo_fipe import FrameCodigoFipe
+from cache import CacheRespostas
+from cliente_fipe import ClienteFipe
+from agendador import Agendador
+from prefetch import Prefetcher
+from importacao import Importador
+from colecao import ColecaoVeiculos
+import exportacao
+import comparacao
+from historico import HistoricoPrecos, AtualizadorHistorico
+from janela_progresso import JanelaProgresso
+from janela_diagnostico import JanelaDiagnostico
+from janela_comparacao import JanelaComparacao
+from diagnostico import Perfilador
+from navegacao import PoolTelas
+from catalogo import CatalogoModelos
+from codigos_fipe import IndiceCodigosFipe
+from memoria import (GerenciadorMemoria, INTERVALO_DESCARGA,
+                     INTERVALO_VERIFICACAO)
+
+logger = logging.getLogger(__name__)
 # pylint: disable=too-many-instance-attributes
 # 11 is reasonable in this case
 class App:
@@ -15,7 +40,15 @@ class App:
     Classe principal da aplicação que gerencia a navegação entre as telas (frames)
     e mantém o estado da consulta do usuário (tipo de veículo, marca, modelo, etc.).
     """
-    def __init__(self, root):
+    def __init__(self, root, cliente=None, memoria=None):
+        """
+        :param root: A janela principal (tk.Tk).
+        :param cliente: (opcional) Fonte dos dados da FIPE, com a mesma
+        interface do ClienteFipe (ex: um SnapshotFipe). Por padrão, usa a API
+        com cache em disco.
+        :param memoria: (GerenciadorMemoria, opcional) Orçamentos de memória
+        da sessão e dos índices. Por padrão, os de `memoria.ORCAMENTOS`.
+        """
         # --- Configuração da Janela Principal ---
         self.root = root
         self.fonte = 'Arial 12'
@@ -29,21 +62,69 @@ class App:
             self.root,
             #mapeia para o menu os comandos a passar
             restart_command=self.mostrar_frame_um,
+            back_command=self.voltar,
+            search_command=self.buscar_no_catalogo,
+            fipe_code_command=self.consultar_codigo_fipe,
             open_command=self.abrir_arquivo,
+            open_folder_command=self.abrir_pasta,
             save_as_command=self.salvar_como,
+            export_command=self.exportar_sessao,
+            export_catalog_command=self.exportar_catalogo,
+            import_catalog_command=self.importar_catalogo,
             load_graphic=self.gerar_grafico,
+            update_history_command=self.atualizar_historico,
+            download_history_command=partial(self.atualizar_historico,
+                                             meses_anteriores=12),
+            diagnostics_command=self.abrir_diagnostico,
+            profile_command=self.alternar_perfil,
             about_us=self.sobre_nos
         )
 
         # --- Estado da Aplicação ---
-        self.base_url = 'https://parallelum.com.br/fipe/api/v1/'
+        # Cliente da API compartilhado por todas as telas: monta as URLs,
+        # reaproveita as conexões e guarda as respostas em um cache em disco
+        # para que consultas repetidas não precisem ir à rede.
+        self.cliente = cliente or ClienteFipe(cache=CacheRespostas())
+        # Pool de threads que faz as requisições fora da thread da interface.
+        self.agendador = Agendador(self.root)
+        # Antecipa, em segundo plano, a próxima tela mais provável do
+        # assistente para que ela abra direto do cache.
+        self.prefetcher = Prefetcher(self.cliente)
+        # Valores de cada veículo mês a mês, para as curvas de depreciação.
+        self.historico = HistoricoPrecos()
+        # Captura do cProfile ligada pelo menu Ajuda.
+        self.perfilador = Perfilador()
+        self.janela_diagnostico = None
         self.current_frame = None
+        # Telas de seleção já montadas, escondidas em vez de destruídas para
+        # que voltar a elas seja instantâneo.
+        self.telas = PoolTelas()
+        # Caminho do assistente até a tela atual: (chave, construir, estado)
+        # de cada tela de seleção visitada, usado pelo 'Voltar'.
+        self.caminho = []
+        # Chave da tela exibida, ou None se ela não fica no pool.
+        self.chave_atual = None
+        self.root.bind('<Alt-Left>', lambda event: self.voltar())
+        # Índice de todos os modelos conhecidos, montado na primeira busca.
+        self.catalogo = CatalogoModelos(self.cliente)
+        self.root.bind('<Control-f>', lambda event: self.buscar_no_catalogo())
+        # Código FIPE -> códigos da API de cada veículo já consultado.
+        self.codigos_fipe = IndiceCodigosFipe()
 
         # `resultado_final` armazena o dicionário do último veículo consultado via API.
         self.resultado_final = None
-        # `dados` é uma lista que acumula os dicionários de todos os veículos
-        # carregados (via API ou arquivo), usada para popular o gráfico.
-        self.dados = []
+        # `dados` acumula todos os veículos carregados (via API ou arquivo),
+        # sem repetições, usados para popular o gráfico. Os veículos ficam
+        # guardados em colunas compactas e se comportam como uma lista de
+        # dicionários.
+        self.dados = ColecaoVeiculos()
+        # Acima do orçamento, os veículos usados há mais tempo vão para o
+        # disco e os índices esquecem as entradas menos usadas.
+        self.memoria = memoria or GerenciadorMemoria()
+        self.memoria.registrar('sessao', self.dados)
+        self.memoria.registrar('caches', self.codigos_fipe)
+        self.memoria.registrar('caches', self.catalogo)
+        self.root.after(INTERVALO_VERIFICACAO, self._verificar_memoria)
         # Variáveis de estado que armazenam as seleções do usuário passo a passo.
         self.tipo_veiculo = None
         self.codigo_marca = None
@@ -54,29 +135,74 @@ class App:
         self.mostrar_frame_um()
 
     def limpar_frame_atual(self):
-        """Destrói o frame (tela) atualmente visível para dar lugar ao próximo."""
-        if self.current_frame:
+        """Tira de vista o frame (tela) atual para dar lugar ao próximo.
+        As telas do pool são apenas escondidas; as demais são destruídas e,
+        ao serem destruídas, cancelam a requisição que ainda estiver em
+        andamento, evitando que o resultado chegue a uma tela que já saiu."""
+        if self.current_frame and not self.telas.esconder(self.current_frame):
             self.current_frame.destroy()
+        self.current_frame = None
+
+    def _exibir_tela(self, chave, construir):
+        """
+        Exibe uma tela, reaproveitando a guardada no pool se houver.
+
+        :param chave: (str) Identifica a tela no pool (ex: a URL da lista),
+        ou None para uma tela que não é guardada (ex: resultado, gráfico).
+        :param construir: (function) Cria a tela; chamada sem argumentos.
+        """
+        if chave is not None:
+            # Voltar a uma tela do caminho descarta as que vieram depois dela.
+            for indice, (chave_visitada, _, _) in enumerate(self.caminho):
+                if chave_visitada == chave:
+                    del self.caminho[indice:]
+                    break
+            self.caminho.append((chave, construir, (
+                self.tipo_veiculo, self.codigo_marca, self.modelo_marca,
+                self.ano_modelo)))
+        self.limpar_frame_atual()
+        self.chave_atual = chave
+        self.current_frame = (self.telas.obter(chave, construir)
+                              if chave is not None else construir())
+
+    def voltar(self):
+        """
+        Volta para a tela de seleção anterior do assistente, como ela foi
+        deixada (lista carregada, busca digitada e posição da rolagem).
+        """
+        # Se a tela atual está no caminho, a anterior é a penúltima.
+        indice = len(self.caminho) - (2 if self.chave_atual is not None else 1)
+        if indice < 0:
+            return
+        chave, construir, estado = self.caminho[indice]
+        (self.tipo_veiculo, self.codigo_marca, self.modelo_marca,
+         self.ano_modelo) = estado
+        self._exibir_tela(chave, construir)
 
     def mostrar_frame_um(self):
         """Exibe a tela inicial para seleção do tipo de veículo (carro, moto, 
                                                                     caminhão).
         Esta função também reseta o estado de qualquer consulta anterior.
         """
-        self.limpar_frame_atual()
         # Reseta todas as variáveis de estado para iniciar uma nova consulta do zero.
         self.tipo_veiculo = None
         self.codigo_marca = None
         self.modelo_marca = None
         self.ano_modelo = None
         self.resultado_final = None # Limpa o resultado da consulta FIPE
-        self.current_frame = FrameSelecao(
+        # As telas continuam no pool: refazer um caminho já visitado é
+        # instantâneo.
+        self.caminho.clear()
+        self._exibir_tela('tipos', partial(
+            FrameSelecao,
             self.root,
             # `command` especifica qual método chamar quando uma opção for selecionada.
             command=self.on_veiculo_selecionado,
             dados_estaticos=['carros', 'motos', 'caminhoes'],
-            label_busca="Selecione o Tipo:"
-        )
+            label_busca="Selecione o Tipo:",
+            prefetcher=self.prefetcher,
+            url_proximo_nivel=self.cliente.url_marcas
+        ))
 
     def on_veiculo_selecionado(self, tipo_veiculo):
         """
@@ -87,15 +213,20 @@ class App:
                             Ex: 'carros'
         """
         self.tipo_veiculo = tipo_veiculo
-        print(f"Tipo de veículo selecionado: {self.tipo_veiculo}")
+        logger.debug("Tipo de veículo selecionado: %s", self.tipo_veiculo)
 
-        self.limpar_frame_atual()
-        url_marcas = f'{self.base_url}{self.tipo_veiculo}/marcas/'
-        self.current_frame = FrameSelecao(
+        url_marcas = self.cliente.url_marcas(self.tipo_veiculo)
+        self._exibir_tela(url_marcas, partial(
+            FrameSelecao,
             self.root,
             url=url_marcas,
             command=self.on_marca_selecionada,
-            label_busca="Buscar Marca:")
+            label_busca="Buscar Marca:",
+            cliente=self.cliente,
+            agendador=self.agendador,
+            prefetcher=self.prefetcher,
+            url_proximo_nivel=partial(self.cliente.url_modelos,
+                                      self.tipo_veiculo)))
 
     def on_marca_selecionada(self, codigo_marca):
         """
@@ -105,19 +236,24 @@ class App:
         :param codigo_marca: (str) O código da marca selecionada. Ex: '59'
         """
         self.codigo_marca = codigo_marca
-        print(f"Código da marca selecionada: {self.codigo_marca}")
+        logger.debug("Código da marca selecionada: %s", self.codigo_marca)
 
-        self.limpar_frame_atual()
-        # Aqui você pode adicionar a lógica para o frame_tres
-        url_modelos = f'{self.base_url}{self.tipo_veiculo}/marcas/{
-            codigo_marca}/modelos/'
-        print(f"URL para modelos: {url_modelos}")
-        self.current_frame = FrameSelecao(
+        url_modelos = self.cliente.url_modelos(self.tipo_veiculo, codigo_marca)
+        logger.debug("URL para modelos: %s", url_modelos)
+        self._exibir_tela(url_modelos, partial(
+            FrameSelecao,
             self.root,
             url=url_modelos,
             command=self.on_modelo_selecionado,
             label_busca="Buscar Modelo:",
-            chave_json='modelos')
+            chave_json='modelos',
+            cliente=self.cliente,
+            agendador=self.agendador,
+            prefetcher=self.prefetcher,
+            url_proximo_nivel=partial(self.cliente.url_anos,
+                                      self.tipo_veiculo, codigo_marca),
+            ao_comparar=partial(self.escolher_modelos_para_comparar,
+                                self.tipo_veiculo, codigo_marca)))
 
     def on_modelo_selecionado(self,modelo):
         """
@@ -128,16 +264,60 @@ class App:
         """
 
         self.modelo_marca = modelo
-        print(f"Modelo da marca selecionado: {self.modelo_marca}")
+        logger.debug("Modelo da marca selecionado: %s", self.modelo_marca)
+        self.mostrar_frame_quatro()
 
-        self.limpar_frame_atual()
-        url_marca = f'{self.base_url}{self.tipo_veiculo}/marcas/{
-            self.codigo_marca}/modelos/{self.modelo_marca}/anos/'
-        self.current_frame = FrameSelecao(
+    def buscar_no_catalogo(self):
+        """
+        Exibe a busca de modelos em todo o catálogo, um atalho para a lista
+        de anos sem passar pelas telas de tipo e marca.
+        """
+        self._exibir_tela('catalogo', partial(
+            FrameBuscaCatalogo,
             self.root,
-            url=url_marca,
-            command=self.on_ano_selecionado,
-            label_busca="Buscar Ano-Modelo:")
+            self.catalogo,
+            command=self.on_modelo_do_catalogo,
+            agendador=self.agendador))
+
+    def on_modelo_do_catalogo(self, item):
+        """
+        Callback executado quando um modelo é escolhido na busca do
+        catálogo. Preenche o tipo e a marca e avança para a lista de anos.
+
+        :param item: (dict) Com 'tipo', 'marca' e 'modelo'.
+        """
+        self.tipo_veiculo = item['tipo']
+        self.codigo_marca = item['marca']
+        self.on_modelo_selecionado(item['modelo'])
+
+    def consultar_codigo_fipe(self):
+        """
+        Exibe a consulta pelo Código FIPE. Um snapshot responde por todo o
+        catálogo; com a API, vale o índice dos códigos já consultados.
+        """
+        localizador = (self.cliente if hasattr(self.cliente,
+                                               'localizar_codigo_fipe')
+                       else self.codigos_fipe)
+        self._exibir_tela('codigo_fipe', partial(
+            FrameCodigoFipe,
+            self.root,
+            localizador,
+            command=self.on_veiculo_do_codigo,
+            indice=self.codigos_fipe,
+            cliente=self.cliente,
+            agendador=self.agendador))
+
+    def on_veiculo_do_codigo(self, veiculo):
+        """
+        Callback executado quando um ano-modelo é escolhido na consulta por
+        Código FIPE. Preenche os códigos e exibe o valor do veículo.
+
+        :param veiculo: (dict) Com 'tipo', 'marca', 'modelo' e 'ano'.
+        """
+        self.tipo_veiculo = veiculo['tipo']
+        self.codigo_marca = veiculo['marca']
+        self.modelo_marca = veiculo['modelo']
+        self.on_ano_selecionado(veiculo['ano'])
 
     def on_ano_selecionado(self,ano):
         """
@@ -149,77 +329,326 @@ class App:
                     Ex: '2014-1'
         """
         self.ano_modelo = ano
-        print(f"Ano selecionado do modelo: {self.ano_modelo}")
-
-        self.limpar_frame_atual()
-        url_final = f'{self.base_url}{self.tipo_veiculo}/marcas/{
-            self.codigo_marca}/modelos/{self.modelo_marca}/anos/{self.ano_modelo}/'
-        # Passamos o método que volta para a tela 4 como comando
-        self.current_frame = Frame_Cinco(
+        logger.debug("Ano selecionado do modelo: %s", self.ano_modelo)
+
+        url_final = self.cliente.url_valor(self.tipo_veiculo,
+                                           self.codigo_marca,
+                                           self.modelo_marca, self.ano_modelo)
+        # A tela final não fica no pool: o valor é sempre relido (do cache).
+        self._exibir_tela(None, partial(
+            Frame_Cinco,
             self.root,
             url=url_final,
-            # O botão 'Voltar' na tela final reinicia o fluxo.
-            back_command=self.mostrar_frame_um,
+            # O botão 'Voltar' na tela final retorna à lista de anos.
+            back_command=self.mostrar_frame_quatro,
             # Passa o método que vai receber o dicionário com os dados do veículo.
-            result_callback=self.on_resultado_obtido
-        )
+            result_callback=self.on_resultado_obtido,
+            cliente=self.cliente,
+            agendador=self.agendador
+        ))
 
     def mostrar_frame_quatro(self):
         """
-        Função para retornar à tela de seleção de ano (frame_quatro).
-        É usada como callback para o botão 'Voltar' na tela final.
+        Exibe a tela de seleção de ano (frame_quatro) do modelo escolhido.
+        É usada também como callback para o botão 'Voltar' na tela final:
+        a lista reaparece do pool, sem nova busca.
         """
-        self.limpar_frame_atual()
         # Limpa a seleção de ano para permitir uma nova escolha
         self.ano_modelo = None
-        url_anos = f'{self.base_url}{self.tipo_veiculo}/marcas/{
-            self.codigo_marca}/modelos/{self.modelo_marca}/anos/'
-        self.current_frame = FrameSelecao(
+        url_anos = self.cliente.url_anos(self.tipo_veiculo,
+                                         self.codigo_marca, self.modelo_marca)
+        self._exibir_tela(url_anos, partial(
+            FrameSelecao,
             self.root,
             url=url_anos,
             command=self.on_ano_selecionado,
-            label_busca="Buscar Ano-Modelo:")
+            label_busca="Buscar Ano-Modelo:",
+            cliente=self.cliente,
+            agendador=self.agendador,
+            prefetcher=self.prefetcher,
+            url_proximo_nivel=partial(self.cliente.url_valor,
+                                      self.tipo_veiculo, self.codigo_marca,
+                                      self.modelo_marca),
+            ao_comparar=partial(self.escolher_anos_para_comparar,
+                                self.tipo_veiculo, self.codigo_marca,
+                                self.modelo_marca)))
 
     def on_resultado_obtido(self,resultado):
         """
         Callback que recebe os dados do veículo da tela final (Frame_Cinco).
-        Armazena o dicionário para a função 'Salvar' e o adiciona à lista
-        de dados para o gráfico.
+        Armazena o dicionário para a função 'Salvar', o adiciona à lista
+        de dados para o gráfico e guarda o valor no histórico de preços.
 
         :param resultado: (dict) Dicionário com os dados completos do veículo.
         """
         self.resultado_final = resultado
+        self._registrar_veiculo(resultado, {
+            'tipo': self.tipo_veiculo, 'marca': self.codigo_marca,
+            'modelo': self.modelo_marca, 'ano': self.ano_modelo})
+
+    def _registrar_veiculo(self, resultado, codigos):
+        """
+        Acrescenta um veículo consultado aos dados do gráfico, ao histórico
+        de preços e ao índice de Códigos FIPE.
+
+        :param resultado: (dict) Dados completos do veículo.
+        :param codigos: (dict) 'tipo', 'marca', 'modelo' e 'ano' da API.
+        """
         self.dados.append(resultado)
+        # Os códigos da consulta permitem atualizar o veículo nos próximos
+        # meses sem refazer o assistente.
+        self.historico.registrar(resultado, codigos)
+        # Permite voltar a este veículo pelo Código FIPE.
+        self.codigos_fipe.registrar(codigos, resultado)
+
+    # --- Comparação ---
+    def escolher_anos_para_comparar(self, tipo, marca, modelo, itens):
+        """
+        Abre a escolha dos anos-modelo a comparar (botão 'Comparar...' da
+        tela de anos).
+
+        :param itens: (list) Anos exibidos na tela, já filtrados pela busca.
+        """
+        JanelaComparacao(self.root, 'Comparar anos-modelo', itens,
+                         ao_confirmar=lambda anos: self.comparar(
+                             comparacao.consultas_de_anos(
+                                 self.cliente, tipo, marca, modelo, anos)))
+
+    def escolher_modelos_para_comparar(self, tipo, marca, itens):
+        """
+        Abre a escolha dos modelos a comparar (botão 'Comparar...' da tela
+        de modelos). Cada modelo é comparado no seu ano-modelo mais recente.
+
+        :param itens: (list) Modelos exibidos na tela, já filtrados.
+        """
+        JanelaComparacao(self.root, 'Comparar modelos', itens,
+                         ao_confirmar=lambda modelos: self.comparar(
+                             comparacao.consultas_de_modelos(
+                                 self.cliente, tipo, marca, modelos)))
+
+    def comparar(self, consultas):
+        """
+        Abre o gráfico e busca todos os veículos escolhidos ao mesmo tempo;
+        cada um entra no gráfico assim que chega.
+
+        :param consultas: (list) Funções de `comparacao.consultas_de_anos`
+        ou `comparacao.consultas_de_modelos`.
+        """
+        self.gerar_grafico()
+        self.agendador.agendar(
+            comparacao.buscar_em_paralelo, consultas,
+            ao_progresso=self._ao_progresso_comparacao,
+            ao_concluir=self._ao_concluir_comparacao)
+
+    def _ao_progresso_comparacao(self, parcial):
+        """Acrescenta ao gráfico um veículo da comparação."""
+        if 'dados' not in parcial:
+            logger.debug("Falha na comparação: %s", parcial['erro'])
+            return
+        self._registrar_veiculo(parcial['dados'], parcial['codigos'])
+        grafico = self._grafico_atual()
+        if grafico:
+            grafico.adicionar_veiculos()
+
+    def _ao_concluir_comparacao(self, resumo):
+        """Avisa se alguma consulta da comparação falhou."""
+        if resumo['falhas']:
+            messagebox.showwarning(
+                "Comparação incompleta",
+                f"{resumo['falhas']} de {resumo['total']} consulta(s) "
+                "falharam; os demais veículos estão no gráfico.")
 
     def abrir_arquivo(self, recarregar_frame_grafico=False):
         """
-        Abre um seletor de arquivos para carregar um veículo de um arquivo JSON.
+        Abre um seletor de arquivos para carregar veículos de um ou mais
+        arquivos JSON, JSONL ou NDJSON.
         """
-        filepath = filedialog.askopenfilename(
-            filetypes=[('Arquivos JSON', '*.json'), ("Todos os arquivos", "*.*")]
+        caminhos = filedialog.askopenfilenames(
+            filetypes=[('Arquivos de veículos',
+                        '*.json *.jsonl *.ndjson *.csv *.fipecol'),
+                       ('Arquivos JSON', '*.json'),
+                       ('Arquivos JSONL', '*.jsonl *.ndjson'),
+                       ('Sessões exportadas', '*.fipecol *.csv'),
+                       ("Todos os arquivos", "*.*")]
         )
-        if not filepath:
+        if not caminhos:
             return
+        self.importar_arquivos(caminhos, recarregar_frame_grafico)
 
-        try:
-            # Lê o arquivo JSON e o converte de volta para um dicionário Python.
-            with open(filepath, 'r', encoding='utf-8') as f:
-                dados_veiculo = json.load(f)
+    def abrir_pasta(self):
+        """
+        Abre um seletor de pastas e importa todos os arquivos de veículos
+        dela e de suas subpastas.
+        """
+        pasta = filedialog.askdirectory()
+        if not pasta:
+            return
+        self.importar_arquivos([pasta], self._grafico_atual() is not None)
 
-            self.dados.append(dados_veiculo) # Adiciona o dicionário à lista
+    def importar_arquivos(self, caminhos, recarregar_frame_grafico=False):
+        """
+        Importa veículos de arquivos e pastas em segundo plano, acrescentando
+        a `self.dados` os registros válidos e ainda não carregados.
 
-            # Se a função foi chamada a partir do gráfico, recarrega o gráfico.
-            if recarregar_frame_grafico:
-                self.gerar_grafico() # Recarrega o gráfico com os novos dados
-            # Caso contrário, exibe os dados do arquivo na tela de exibição.
+        :param caminhos: (list) Arquivos e/ou pastas selecionados.
+        :param recarregar_frame_grafico: (bool) Atualiza (ou abre) o gráfico
+        ao final, em vez de exibir o veículo importado.
+        """
+        if (len(caminhos) == 1 and
+                caminhos[0].lower().endswith(exportacao.EXTENSAO_COLUNAR)):
+            # Sessão colunar: carregada de uma vez, sem passar registro a
+            # registro pelo importador.
+            self.agendador.agendar(
+                exportacao.carregar_colunar, caminhos[0],
+                ao_concluir=self._ao_carregar_sessao,
+                ao_falhar=partial(self._ao_falhar_importacao, None))
+            return
+        importador = Importador(self.dados)
+        janela = JanelaProgresso(self.root, 'Importando veículos',
+                                 ao_cancelar=importador.cancelar)
+        self.agendador.agendar(
+            importador.importar, caminhos,
+            ao_progresso=partial(self._ao_progresso_importacao, janela),
+            ao_concluir=partial(self._ao_concluir_importacao, janela,
+                                caminhos, recarregar_frame_grafico),
+            ao_falhar=partial(self._ao_falhar_importacao, janela))
+
+    def _ao_progresso_importacao(self, janela, parcial):
+        """Acrescenta um lote importado aos dados e atualiza o progresso."""
+        self.dados.extend(parcial['registros'])
+        if parcial['registros']:
+            self.agendador.agendar(self.historico.registrar_varios,
+                                   parcial['registros'])
+        total = parcial['bytes_totais']
+        janela.atualizar(parcial['bytes_lidos'] / total if total else 1.0,
+                         f"{os.path.basename(parcial['arquivo'])} — "
+                         f"{len(self.dados)} veículos carregados")
+
+    def _ao_concluir_importacao(self, janela, caminhos,
+                                recarregar_frame_grafico, resumo):
+        """Fecha o progresso e exibe o resultado da importação."""
+        janela.destroy()
+        if resumo['erros']:
+            messagebox.showwarning(
+                "Registros ignorados",
+                f"{resumo['invalidos']} registro(s) inválido(s) ignorado(s):\n"
+                + "\n".join(resumo['erros'][:5]))
+
+        # Se a função foi chamada a partir do gráfico, recarrega o gráfico.
+        if recarregar_frame_grafico:
+            if self._grafico_atual():
+                # Incorpora os novos veículos sem recriar o gráfico.
+                self.current_frame.adicionar_veiculos()
             else:
-                self.limpar_frame_atual()
-                # Reutiliza o Frame_Cinco para exibir dados do arquivo
-                self.current_frame = Frame_Cinco(self.root,
-                dados_veiculo=dados_veiculo,back_command=self.mostrar_frame_um)
-        except FileNotFoundError as e:
-            messagebox.showerror("Erro ao Abrir",
-                                f"Não foi possível ler o arquivo: {e}")
+                self.gerar_grafico()
+        # Um único veículo aberto: exibe seus dados na tela de exibição.
+        elif (len(caminhos) == 1 and resumo['importados'] == 1
+              and not os.path.isdir(caminhos[0])):
+            # Reutiliza o Frame_Cinco para exibir dados do arquivo. O
+            # registro vem do próprio resumo: o fim de `self.dados` pode ser
+            # outro veículo acrescentado enquanto o arquivo era lido.
+            self._exibir_tela(None, partial(
+                Frame_Cinco, self.root, dados_veiculo=resumo['ultimo'],
+                back_command=self.mostrar_frame_um))
+        else:
+            messagebox.showinfo(
+                "Importação concluída",
+                f"{resumo['importados']} veículo(s) importado(s) de "
+                f"{resumo['arquivos']} arquivo(s); "
+                f"{resumo['duplicados']} repetido(s) ignorado(s)."
+                + (" Importação cancelada." if resumo['cancelado'] else ""))
+
+    def _ao_carregar_sessao(self, colecao):
+        """Junta uma sessão colunar aos dados e exibe o gráfico."""
+        adicionados = self.dados.incorporar(colecao)
+        if self._grafico_atual():
+            self.current_frame.adicionar_veiculos()
+        else:
+            self.gerar_grafico()
+        messagebox.showinfo("Sessão carregada",
+                            f"{adicionados} veículo(s) carregado(s).")
+
+    def _ao_falhar_importacao(self, janela, erro):
+        """Fecha o progresso e exibe o erro da importação."""
+        if janela:
+            janela.destroy()
+        messagebox.showerror("Erro ao Abrir",
+                            f"Não foi possível ler os arquivos: {erro}")
+
+    def exportar_sessao(self):
+        """
+        Exporta todos os veículos carregados para JSONL, CSV ou o formato
+        colunar (.fipecol), gravando em segundo plano.
+        """
+        if not self.dados:
+            messagebox.showwarning("Aviso", "Nenhum veículo para exportar.")
+            return
+        caminho = filedialog.asksaveasfilename(
+            defaultextension=exportacao.EXTENSAO_COLUNAR,
+            filetypes=[('Sessão (colunar)', '*.fipecol'),
+                       ('JSON Lines', '*.jsonl'), ('CSV', '*.csv')]
+        )
+        if not caminho:
+            return
+        janela = JanelaProgresso(self.root, 'Exportando sessão')
+        # A cópia das colunas é feita aqui, na thread da interface; a
+        # gravação segue em segundo plano sem ser afetada por novos veículos.
+        self.agendador.agendar(
+            exportacao.exportar, self.dados.para_colunas(), caminho,
+            ao_progresso=partial(self._ao_progresso_exportacao, janela),
+            ao_concluir=partial(self._ao_concluir_exportacao, janela),
+            ao_falhar=partial(self._ao_falhar_exportacao, janela))
+
+    def exportar_catalogo(self):
+        """Exporta para JSONL as marcas, modelos e anos guardados no cache."""
+        if self.cliente.cache is None:
+            messagebox.showwarning("Aviso", "Não há catálogo em cache.")
+            return
+        caminho = filedialog.asksaveasfilename(
+            defaultextension='.jsonl', filetypes=[('JSON Lines', '*.jsonl')])
+        if not caminho:
+            return
+        janela = JanelaProgresso(self.root, 'Exportando catálogo')
+        self.agendador.agendar(
+            exportacao.exportar_catalogo, self.cliente.cache, caminho,
+            ao_progresso=partial(self._ao_progresso_exportacao, janela),
+            ao_concluir=partial(self._ao_concluir_exportacao, janela),
+            ao_falhar=partial(self._ao_falhar_exportacao, janela))
+
+    def importar_catalogo(self):
+        """Carrega no cache um catálogo exportado por `exportar_catalogo`."""
+        if self.cliente.cache is None:
+            messagebox.showwarning("Aviso", "A fonte atual não usa cache.")
+            return
+        caminho = filedialog.askopenfilename(
+            filetypes=[('JSON Lines', '*.jsonl'), ("Todos os arquivos", "*.*")])
+        if not caminho:
+            return
+        self.agendador.agendar(
+            exportacao.importar_catalogo, self.cliente.cache, caminho,
+            ao_concluir=lambda quantidade: messagebox.showinfo(
+                "Catálogo importado", f"{quantidade} lista(s) carregada(s)."),
+            ao_falhar=partial(self._ao_falhar_importacao, None))
+
+    def _ao_progresso_exportacao(self, janela, parcial):
+        """Atualiza a janela de progresso da exportação."""
+        total = parcial.get('total')
+        janela.atualizar(parcial['gravados'] / total if total else 0,
+                         f"{parcial['gravados']} registros gravados")
+
+    def _ao_concluir_exportacao(self, janela, resumo):
+        """Fecha o progresso e informa o arquivo gravado."""
+        janela.destroy()
+        messagebox.showinfo(
+            "Sucesso", f"{resumo['registros']} registro(s) exportado(s) "
+            f"({resumo['bytes'] / 1024:.0f} KB) em:\n{resumo['caminho']}")
+
+    def _ao_falhar_exportacao(self, janela, erro):
+        """Fecha o progresso e exibe o erro da exportação."""
+        janela.destroy()
+        messagebox.showerror("Erro ao Salvar",
+                            f"Ocorreu um erro ao exportar: {erro}")
+
     def salvar_como(self):
         """Abre o diálogo para salvar o arquivo."""
         self.salvar_arquivo()
@@ -250,7 +679,7 @@ class App:
 
     def adicionar_veiculo_ao_grafico(self):
         """
-        Abre um arquivo e adiciona seus dados à lista, depois recarrega o gráfico.
+        Abre arquivos e adiciona seus dados à lista, depois recarrega o gráfico.
         """
         self.abrir_arquivo(recarregar_frame_grafico=True)
 
@@ -259,14 +688,63 @@ class App:
         Limpa a tela atual e exibe o FrameGrafico, passando a lista de dados
         acumulados (`self.dados`) para serem plotados.
         """
-        self.limpar_frame_atual()
-        self.current_frame = FrameGrafico(
+        # Importado só aqui: o matplotlib pesa na abertura da aplicação e o
+        # gráfico é aberto apenas pelo menu (ver inicio.precarregar).
+        from frame_grafico import FrameGrafico
+        self._exibir_tela(None, partial(
+            FrameGrafico,
             self.root,
             self.dados,
             add_command=self.adicionar_veiculo_ao_grafico,
             back_command=self.mostrar_frame_um,
-            save_graphic=self.salvar_grafico
-        )
+            save_graphic=self.salvar_grafico,
+            historico=self.historico
+        ))
+
+    def _grafico_atual(self):
+        """
+        :return: (FrameGrafico) A tela de gráfico, se for a exibida; None
+        caso contrário (sem importar o matplotlib só para a verificação).
+        """
+        modulo = sys.modules.get('frame_grafico')
+        if modulo and isinstance(self.current_frame, modulo.FrameGrafico):
+            return self.current_frame
+        return None
+
+    def atualizar_historico(self, meses_anteriores=0):
+        """
+        Busca em segundo plano os meses de referência que faltam no
+        histórico dos veículos consultados.
+
+        :param meses_anteriores: (int) Além do mês mais recente, quantos
+        meses anteriores buscar. Com 0, só os veículos cujo mês virou são
+        consultados.
+        """
+        atualizador = AtualizadorHistorico(self.historico, self.cliente)
+        janela = JanelaProgresso(self.root, 'Atualizando histórico')
+        self.agendador.agendar(
+            atualizador.atualizar, meses_anteriores,
+            ao_progresso=lambda parcial: janela.atualizar(
+                parcial['concluidas'] / parcial['total'],
+                f"{parcial['concluidas']} de {parcial['total']} consultas"),
+            ao_concluir=partial(self._ao_concluir_historico, janela),
+            ao_falhar=partial(self._ao_falhar_historico, janela))
+
+    def _ao_concluir_historico(self, janela, resumo):
+        """Fecha o progresso, informa o resultado e redesenha o gráfico."""
+        janela.destroy()
+        if self._grafico_atual():
+            self.current_frame.atualizar_grafico()
+        messagebox.showinfo(
+            "Histórico atualizado",
+            f"{resumo['novos']} novo(s) mês(es) guardado(s) em "
+            f"{resumo['consultas']} consulta(s); {resumo['falhas']} falha(s).")
+
+    def _ao_falhar_historico(self, janela, erro):
+        """Fecha o progresso e exibe o erro da atualização."""
+        janela.destroy()
+        messagebox.showerror("Erro de Rede",
+                            f"Não foi possível atualizar o histórico: {erro}")
 
     def salvar_grafico(self):
         """
@@ -278,6 +756,62 @@ class App:
     #https://voiston.com/
     texto = "Scooby Doo!"
 
+    def abrir_diagnostico(self):
+        """Exibe a janela de diagnóstico (ou a traz para a frente)."""
+        if self.janela_diagnostico and self.janela_diagnostico.winfo_exists():
+            self.janela_diagnostico.lift()
+            return
+        self.janela_diagnostico = JanelaDiagnostico(self.root, self.cliente,
+                                                     self.telas, self.memoria,
+                                                     self.dados)
+
+    def _verificar_memoria(self):
+        """Aplica os orçamentos de memória e agenda a próxima verificação.
+        A gravação dos veículos no disco roda no agendador, fora da
+        interface, um lote por verificação."""
+        liberados = self.memoria.verificar(self.agendador)
+        self.root.after(INTERVALO_DESCARGA if any(liberados.values())
+                        else INTERVALO_VERIFICACAO, self._verificar_memoria)
+
+    def alternar_perfil(self, ativo):
+        """
+        Liga ou desliga a captura do cProfile. Ao desligar, oferece gravar
+        a captura em um arquivo .prof e registra no log as funções mais
+        demoradas.
+
+        :param ativo: (bool) True para iniciar a captura.
+        """
+        if ativo:
+            self.perfilador.iniciar()
+            logger.info("Captura de perfil iniciada.")
+            return
+        caminho = filedialog.asksaveasfilename(
+            title='Salvar perfil', defaultextension='.prof',
+            filetypes=[('Perfil do cProfile', '*.prof')])
+        relatorio = self.perfilador.parar(caminho or None)
+        logger.info("Captura de perfil encerrada:\n%s", relatorio)
+        if caminho:
+            messagebox.showinfo(
+                "Perfil", f"Perfil salvo em:\n{caminho}\n\nAbra com "
+                "'python -m pstats' ou snakeviz.")
+
+    def encerrar(self):
+        """
+        Chamado depois que a janela principal é fechada: salva o que ficou
+        pendente em memória, para as tarefas em segundo plano e fecha os
+        arquivos SQLite (cache, histórico, índice de Códigos FIPE e o
+        armazém dos veículos descarregados).
+        """
+        self.prefetcher.encerrar()
+        self.agendador.encerrar()
+        self.dados.fechar()
+        self.codigos_fipe.fechar()
+        self.historico.fechar()
+        self.cliente.fechar()
+        # Grava os acessos ainda pendentes do LRU do cache.
+        if self.cliente.cache is not None:
+            self.cliente.cache.fechar()
+
     def sobre_nos(self):
         """
         Messagebox que exibe um resumo da aplicação e seu desenvolvedor.
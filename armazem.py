@@ -0,0 +1,125 @@
+"""
+Armazém em disco dos veículos descarregados da memória.
+
+Quando a sessão passa do orçamento de memória (ver memoria.py), a
+`ColecaoVeiculos` leva para cá os textos que pesam — o modelo, o Código
+FIPE e os campos extras de cada veículo usado há mais tempo — e os relê
+daqui quando alguém pede o veículo de novo (ex: o rótulo de uma barra do
+gráfico). Por padrão é um banco SQLite temporário, que o próprio SQLite
+apaga ao fechar.
+"""
+import json
+import sqlite3
+import threading
+
+_ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS veiculos (
+    indice INTEGER PRIMARY KEY,
+    campos TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS partes (
+    texto TEXT PRIMARY KEY,
+    id INTEGER NOT NULL) WITHOUT ROWID;
+'''
+# Páginas do SQLite guardadas em memória (KiB): o resto fica no disco.
+CACHE_PAGINAS_KIB = 2048
+# Máximo de parâmetros em um `IN (...)`.
+_LOTE_LEITURA = 500
+
+
+class ArmazemVeiculos:
+    """
+    Campos de veículos, pela posição na coleção, e as partes de chave de
+    repetição que saíram da memória junto com eles.
+    """
+    def __init__(self, caminho=''):
+        """
+        :param caminho: (str, opcional) Arquivo SQLite. Vazio (o padrão)
+        cria um banco temporário, apagado ao fechar.
+        """
+        self.caminho = caminho
+        # Gravado pela interface; lido também pela importação, em outra
+        # thread.
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.execute(f'PRAGMA cache_size = -{CACHE_PAGINAS_KIB}')
+        # Dados só desta sessão: não precisam sobreviver a uma queda.
+        self._conexao.execute('PRAGMA journal_mode = OFF')
+        self._conexao.execute('PRAGMA synchronous = OFF')
+        self._conexao.executescript(_ESQUEMA)
+
+    def __len__(self):
+        """Quantidade de veículos guardados."""
+        with self._lock:
+            return self._conexao.execute(
+                'SELECT COUNT(*) FROM veiculos').fetchone()[0]
+
+    def guardar(self, itens):
+        """
+        Guarda os campos de vários veículos.
+
+        :param itens: (iterable) Tuplas `(indice, campos)`; `campos` é um
+        dict com os valores no formato da API.
+        """
+        linhas = [(indice, json.dumps(campos, ensure_ascii=False))
+                  for indice, campos in itens]
+        with self._lock:
+            self._conexao.executemany(
+                'INSERT OR REPLACE INTO veiculos VALUES (?, ?)', linhas)
+            self._conexao.commit()
+
+    def ler(self, indice):
+        """
+        :param indice: (int) Posição do veículo na coleção.
+        :return: (dict) Campos guardados do veículo (vazio se não houver).
+        """
+        with self._lock:
+            linha = self._conexao.execute(
+                'SELECT campos FROM veiculos WHERE indice = ?',
+                (indice,)).fetchone()
+        return json.loads(linha[0]) if linha else {}
+
+    def ler_varios(self, indices):
+        """
+        Lê os campos de vários veículos de uma vez.
+
+        :param indices: (iterable) Posições dos veículos.
+        :return: (dict) {indice: campos}, só dos que estão guardados.
+        """
+        indices = [int(indice) for indice in indices]
+        resultado = {}
+        with self._lock:
+            for inicio in range(0, len(indices), _LOTE_LEITURA):
+                lote = indices[inicio:inicio + _LOTE_LEITURA]
+                for indice, campos in self._conexao.execute(
+                        'SELECT indice, campos FROM veiculos WHERE indice IN '
+                        f"({', '.join('?' * len(lote))})", lote):
+                    resultado[indice] = json.loads(campos)
+        return resultado
+
+    # --- Partes de chave ---
+    def guardar_partes(self, partes):
+        """
+        Guarda os números das partes de chave (ex: Códigos FIPE) que saíram
+        da memória.
+
+        :param partes: (iterable) Tuplas `(texto, id)`.
+        """
+        with self._lock:
+            self._conexao.executemany(
+                'INSERT OR REPLACE INTO partes VALUES (?, ?)', partes)
+            self._conexao.commit()
+
+    def id_parte(self, texto):
+        """
+        :param texto: (str) Parte de chave.
+        :return: (int) Número da parte, ou None se ela não foi guardada.
+        """
+        with self._lock:
+            linha = self._conexao.execute(
+                'SELECT id FROM partes WHERE texto = ?', (texto,)).fetchone()
+        return linha[0] if linha else None
+
+    def fechar(self):
+        """Fecha (e, se temporário, apaga) o armazém."""
+        with self._lock:
+            self._conexao.close()
@@ -0,0 +1,561 @@
+"""
+Medições de desempenho dos caminhos mais usados da aplicação.
+
+Uso:
+
+    python benchmark.py                  # mede e compara com a baseline
+    python benchmark.py --salvar         # grava os resultados como baseline
+    python benchmark.py -k grafico       # só as medições com 'grafico' no nome
+
+Cada medição é repetida algumas vezes (cada repetição roda a operação
+quantas vezes couberem em `TEMPO_MINIMO`) e o resultado é a mediana do tempo
+por operação. A comparação com a baseline aponta as medições que ficaram
+mais lentas que a `--tolerancia`, e o comando termina com código 1 se houver
+alguma (ou se alguma medição falhar), para poder rodar em integração
+contínua.
+
+As medições de telas precisam do Tk; sem display, rode com
+`xvfb-run python benchmark.py` (sem display, elas são puladas). A consulta
+de ponta a ponta usa o `servidor_mock.py`, sem acessar a rede.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from fontes import gerar_opcoes, gerar_veiculos
+
+CAMINHO_BASELINE = 'benchmark_baseline.json'
+# Variação aceita em relação à baseline antes de apontar uma regressão.
+TOLERANCIA = 0.25
+REPETICOES = 5
+# Tempo mínimo, em segundos, de cada repetição.
+TEMPO_MINIMO = 0.2
+TAMANHOS_LISTA = (100, 1_000, 10_000)
+TAMANHOS_GRAFICO = (10, 100, 1_000, 10_000)
+TAMANHO_ARQUIVO = 10_000
+# Latência simulada da API na consulta de ponta a ponta (média, desvio).
+LATENCIA_MOCK = (0.010, 0.002)
+# Texto digitado, letra por letra, nas medições de busca.
+DIGITADO = 'modelo 12 1.6 flex'
+
+_MEDICOES = []
+
+
+def medicao(nome, precisa_tk=False):
+    """
+    Registra uma medição.
+
+    A função decorada recebe o `Contexto` e prepara os dados; ela retorna a
+    operação a medir (sem argumentos) ou uma tupla `(operacao, unidades)`
+    quando cada chamada faz várias operações (ex: uma por tecla digitada).
+    """
+    def registrar(preparar):
+        _MEDICOES.append((nome, preparar, precisa_tk))
+        return preparar
+    return registrar
+
+
+class Contexto:
+    """Recursos compartilhados pelas medições (Tk, pasta temporária)."""
+    def __init__(self):
+        self.pasta = tempfile.mkdtemp(prefix='fipe_benchmark_')
+        # Servidor simulado e passagens pelo assistente, criados pela
+        # primeira medição que precisar (ver `_servidor_mock`).
+        self.mock = None
+        self.caminhos = []
+        self.raiz = None
+        try:
+            import tkinter as tk
+            self.raiz = tk.Tk()
+            self.raiz.withdraw()
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Sem display (ou sem Tk): as medições de tela são puladas.
+            self.raiz = None
+
+    def limpar_raiz(self):
+        """Destrói os widgets criados por uma medição de tela."""
+        for filho in self.raiz.winfo_children():
+            filho.destroy()
+
+    def fechar(self):
+        """Para o servidor simulado e apaga a janela e a pasta temporária."""
+        if self.mock is not None:
+            self.mock.shutdown()
+            self.mock.server_close()
+        if self.raiz is not None:
+            self.raiz.destroy()
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+
+def cronometrar(operacao, repeticoes=REPETICOES, tempo_minimo=TEMPO_MINIMO,
+                unidades=1):
+    """
+    Mede o tempo de uma operação.
+
+    :param operacao: (function) Operação sem argumentos.
+    :param repeticoes: (int) Quantas repetições medir.
+    :param tempo_minimo: (float) Duração mínima de cada repetição.
+    :param unidades: (int) Operações feitas a cada chamada.
+    :return: (dict) `mediana`, `minimo` e `desvio` do tempo por operação,
+    em segundos, e `chamadas` por repetição.
+    """
+    # Calibra quantas chamadas cabem em `tempo_minimo` (como o timeit).
+    chamadas = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            operacao()
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= tempo_minimo:
+            break
+        chamadas = max(chamadas * 2,
+                       int(chamadas * tempo_minimo / max(decorrido, 1e-9)))
+
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            operacao()
+        tempos.append((time.perf_counter() - inicio) / (chamadas * unidades))
+    return {'mediana': statistics.median(tempos), 'minimo': min(tempos),
+            'desvio': statistics.pstdev(tempos), 'chamadas': chamadas}
+
+
+# --- Dados sintéticos ---
+def _prefixos(texto):
+    """Cada estado da caixa de busca enquanto `texto` é digitado."""
+    return [texto[:i] for i in range(1, len(texto) + 1)]
+
+
+# --- Seleção e busca ---
+def _lista(contexto, n):
+    from frame_selecao import FrameSelecao
+    frame = FrameSelecao(contexto.raiz)
+    itens = gerar_opcoes(n)
+
+    def operacao():
+        frame.atualizar_lista_radio(itens)
+        contexto.raiz.update_idletasks()
+    return operacao
+
+
+def _filtro(contexto, n):
+    from frame_selecao import FrameSelecao
+    from indice_busca import IndiceBusca
+    frame = FrameSelecao(contexto.raiz)
+    frame.all_items = gerar_opcoes(n)
+    frame.indice = IndiceBusca(frame.all_items)
+    prefixos = _prefixos(DIGITADO)
+
+    def operacao():
+        for prefixo in prefixos:
+            frame.var_entry_busca.set(prefixo)
+            frame.filtrar_lista()
+            contexto.raiz.update_idletasks()
+    return operacao, len(prefixos)
+
+
+def _indice(_contexto, n):
+    from indice_busca import IndiceBusca
+    indice = IndiceBusca(gerar_opcoes(n))
+    prefixos = _prefixos(DIGITADO)
+
+    def operacao():
+        for prefixo in prefixos:
+            indice.buscar(prefixo)
+    return operacao, len(prefixos)
+
+
+# Uma medição por tamanho; `partial` fixa o tamanho de cada uma.
+for _n in TAMANHOS_LISTA:
+    medicao(f'selecao.atualizar_lista_radio[{_n}]',
+            precisa_tk=True)(partial(_lista, n=_n))
+    medicao(f'selecao.filtrar_lista[{_n}]',
+            precisa_tk=True)(partial(_filtro, n=_n))
+    medicao(f'busca.indice_por_tecla[{_n}]')(partial(_indice, n=_n))
+
+
+@medicao('busca.catalogo_por_tecla')
+def _catalogo(_contexto):
+    from catalogo import CatalogoModelos
+    from fontes import FixtureFipe
+    # 90 marcas por tipo com 40 modelos cada: ~10 mil modelos no índice.
+    catalogo = CatalogoModelos(FixtureFipe.sintetica(marcas=90, modelos=40,
+                                                     anos=1)).construir()
+    prefixos = _prefixos('modelo 104 1.6')
+
+    def operacao():
+        for prefixo in prefixos:
+            catalogo.buscar(prefixo)
+    return operacao, len(prefixos)
+
+
+# --- Gráfico ---
+def _grafico(contexto, n):
+    from colecao import ColecaoVeiculos
+    from frame_grafico import FrameGrafico
+    frame = FrameGrafico(contexto.raiz, ColecaoVeiculos(gerar_veiculos(n)))
+
+    def operacao():
+        frame.atualizar_grafico()
+        # `atualizar_grafico` só agenda o desenho; mede-se o desenho
+        # completo.
+        frame.canvas.draw()
+    return operacao
+
+
+def _agrupar(_contexto, n):
+    from colecao import ColecaoVeiculos
+    colecao = ColecaoVeiculos(gerar_veiculos(n))
+    return lambda: colecao.estatisticas_por('Marca')
+
+
+for _n in TAMANHOS_GRAFICO:
+    medicao(f'grafico.atualizar_grafico[{_n}]',
+            precisa_tk=True)(partial(_grafico, n=_n))
+    medicao(f'grafico.agrupar_por_marca[{_n}]')(partial(_agrupar, n=_n))
+
+
+# --- Abrir e salvar arquivos ---
+def _arquivo_sessao(contexto, extensao):
+    """Grava os veículos de teste em um arquivo do formato indicado."""
+    from colecao import ColecaoVeiculos
+    caminho = os.path.join(contexto.pasta, f'sessao{extensao}')
+    if not os.path.exists(caminho):
+        veiculos = gerar_veiculos(TAMANHO_ARQUIVO)
+        if extensao == '.json':
+            with open(caminho, 'w', encoding='utf-8') as f:
+                json.dump(veiculos, f, ensure_ascii=False)
+        else:
+            from exportacao import exportar
+            exportar(ColecaoVeiculos(veiculos).para_colunas(), caminho)
+    return caminho
+
+
+def _abrir(contexto, extensao):
+    from colecao import ColecaoVeiculos
+    from exportacao import carregar_colunar
+    from importacao import Importador
+    caminho = _arquivo_sessao(contexto, extensao)
+
+    def operacao():
+        # O mesmo caminho de `App.importar_arquivos`.
+        if extensao == '.fipecol':
+            return carregar_colunar(caminho)
+        colecao = ColecaoVeiculos()
+        Importador(colecao).importar(
+            [caminho], lambda parcial: colecao.extend(parcial['registros']))
+        return colecao
+    return operacao, TAMANHO_ARQUIVO
+
+
+def _salvar(contexto, extensao):
+    from colecao import ColecaoVeiculos
+    from exportacao import exportar
+    colecao = ColecaoVeiculos(gerar_veiculos(TAMANHO_ARQUIVO))
+    caminho = os.path.join(contexto.pasta, f'salvo{extensao}')
+    return (lambda: exportar(colecao.para_colunas(), caminho),
+            TAMANHO_ARQUIVO)
+
+
+for _extensao in ('.json', '.jsonl', '.csv', '.fipecol'):
+    medicao(f'arquivo.abrir_por_veiculo[{_extensao[1:]}]')(
+        partial(_abrir, extensao=_extensao))
+    if _extensao != '.json':
+        medicao(f'arquivo.salvar_por_veiculo[{_extensao[1:]}]')(
+            partial(_salvar, extensao=_extensao))
+
+
+# --- Consulta de ponta a ponta (assistente) ---
+def _caminhos_assistente(fixture, quantidade):
+    """Sequências (tipo, marca, modelo, ano) existentes na fixture."""
+    from consulta import ConsultaFipe
+    consulta = ConsultaFipe(fixture)
+    caminhos = []
+    for marca in consulta.marcas('carros'):
+        for modelo in consulta.modelos('carros', marca['codigo']):
+            ano = consulta.anos('carros', marca['codigo'],
+                                modelo['codigo'])[0]
+            caminhos.append(('carros', marca['codigo'], modelo['codigo'],
+                             ano['codigo']))
+            if len(caminhos) == quantidade:
+                return caminhos
+    return caminhos
+
+
+def _servidor_mock(contexto):
+    """Sobe (uma vez) o servidor simulado com a latência de `LATENCIA_MOCK`."""
+    if contexto.mock is None:
+        from fontes import FixtureFipe
+        from servidor_mock import ConfiguracaoMock, ServidorMock
+        fixture = FixtureFipe.sintetica()
+        contexto.mock = ServidorMock(fixture,
+                                     ConfiguracaoMock(*LATENCIA_MOCK))
+        contexto.mock.iniciar()
+        contexto.caminhos = _caminhos_assistente(fixture, 200)
+    return contexto.mock
+
+
+def _novo_cliente(servidor, cache):
+    """Cliente apontado para o servidor simulado."""
+    from cliente_fipe import ClienteFipe
+    from gateway import GatewayFipe, LimitadorTaxa
+    # Sem limite de taxa efetivo: mede-se a latência do caminho, não a
+    # espera imposta à API pública.
+    return ClienteFipe(base_url=servidor.url, base_url_v2=servidor.url + 'v2/',
+                       cache=cache,
+                       gateway=GatewayFipe(LimitadorTaxa(1_000_000)))
+
+
+def _percorrer(consulta, caminho):
+    """As quatro consultas de uma passagem completa pelo assistente."""
+    tipo, marca, modelo, ano = caminho
+    consulta.marcas(tipo)
+    consulta.modelos(tipo, marca)
+    consulta.anos(tipo, marca, modelo)
+    return consulta.valor(tipo, marca, modelo, ano)
+
+
+@medicao('assistente.consulta_fria')
+def _assistente_frio(contexto):
+    from cache import CacheRespostas
+    from consulta import ConsultaFipe
+    servidor = _servidor_mock(contexto)
+    contador = iter(range(10 ** 9))
+
+    def operacao():
+        # Cache vazio e conexão nova a cada passagem.
+        cliente = _novo_cliente(servidor, CacheRespostas(':memory:'))
+        caminho = contexto.caminhos[next(contador) % len(contexto.caminhos)]
+        _percorrer(ConsultaFipe(cliente), caminho)
+        cliente.fechar()
+    return operacao
+
+
+@medicao('assistente.consulta_em_cache')
+def _assistente_quente(contexto):
+    from cache import CacheRespostas
+    from consulta import ConsultaFipe
+    servidor = _servidor_mock(contexto)
+    consulta = ConsultaFipe(_novo_cliente(
+        servidor, CacheRespostas(os.path.join(contexto.pasta,
+                                              'cache.sqlite3'))))
+    for caminho in contexto.caminhos:
+        _percorrer(consulta, caminho)
+    contador = iter(range(10 ** 9))
+    return lambda: _percorrer(
+        consulta, contexto.caminhos[next(contador) % len(contexto.caminhos)])
+
+
+@medicao('assistente.concorrente_por_usuario[8]')
+def _assistente_concorrente(contexto):
+    from cache import CacheRespostas
+    from consulta import ConsultaFipe
+    servidor = _servidor_mock(contexto)
+    usuarios = 8
+    lock = threading.Lock()
+    contador = iter(range(10 ** 9))
+
+    def proximo():
+        with lock:
+            return contexto.caminhos[next(contador) % len(contexto.caminhos)]
+
+    def operacao():
+        # Um cliente compartilhado, como na aplicação, com cache vazio.
+        cliente = _novo_cliente(servidor, CacheRespostas(':memory:'))
+        consulta = ConsultaFipe(cliente)
+        with ThreadPoolExecutor(max_workers=usuarios) as executor:
+            list(executor.map(lambda _: _percorrer(consulta, proximo()),
+                              range(usuarios)))
+        cliente.fechar()
+    return operacao, usuarios
+
+
+@medicao('comparacao.buscar_em_paralelo[8]')
+def _comparacao(contexto):
+    from cache import CacheRespostas
+    import comparacao
+    servidor = _servidor_mock(contexto)
+    veiculos = 8
+    contador = iter(range(10 ** 9))
+
+    def operacao():
+        # Cache vazio: cada modelo custa a lista de anos e o valor.
+        cliente = _novo_cliente(servidor, CacheRespostas(':memory:'))
+        inicio = next(contador) * veiculos
+        caminhos = [contexto.caminhos[(inicio + i) % len(contexto.caminhos)]
+                    for i in range(veiculos)]
+        consultas = [consulta for tipo, marca, modelo, _ in caminhos
+                     for consulta in comparacao.consultas_de_modelos(
+                         cliente, tipo, marca, [modelo])]
+        comparacao.buscar_em_paralelo(consultas)
+        cliente.fechar()
+    return operacao, veiculos
+
+
+@medicao('inicio.importar_app')
+def _inicio_importar_app(_contexto):
+    # Processo novo a cada vez: mede a abertura a frio, antes da janela. Roda
+    # na pasta do projeto para achar o `app` de qualquer diretório atual.
+    pasta = os.path.dirname(os.path.abspath(__file__))
+    return lambda: subprocess.run([sys.executable, '-c', 'import app'],
+                                  check=True, cwd=pasta)
+
+
+# --- Execução ---
+def executar(filtro=None, repeticoes=REPETICOES, tempo_minimo=TEMPO_MINIMO,
+             saida=print):
+    """
+    Roda as medições registradas. Uma medição que falha é relatada e não
+    interrompe as demais.
+
+    :param filtro: (str, opcional) Só as medições com este texto no nome.
+    :param saida: (function) Recebe cada linha do relatório parcial.
+    :return: (tuple) `(resultados, falhas)`: {nome: resultado de
+    `cronometrar`} e {nome: mensagem do erro}; medições puladas não
+    aparecem em nenhum dos dois.
+    """
+    contexto = Contexto()
+    resultados = {}
+    falhas = {}
+    try:
+        for nome, preparar, precisa_tk in _MEDICOES:
+            if filtro and filtro not in nome:
+                continue
+            if precisa_tk and contexto.raiz is None:
+                saida(f'{nome:<40} pulada (sem display)')
+                continue
+            try:
+                preparado = preparar(contexto)
+                operacao, unidades = (preparado
+                                      if isinstance(preparado, tuple)
+                                      else (preparado, 1))
+                resultados[nome] = cronometrar(operacao, repeticoes,
+                                               tempo_minimo, unidades)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                falhas[nome] = f'{type(e).__name__}: {e}'
+                saida(f'{nome:<40} FALHOU ({falhas[nome]})')
+                continue
+            finally:
+                if precisa_tk:
+                    contexto.limpar_raiz()
+            saida(f'{nome:<40} {_formatar_tempo(resultados[nome]["mediana"])}')
+    finally:
+        contexto.fechar()
+    return resultados, falhas
+
+
+def _formatar_tempo(segundos):
+    """Ex: 0.00123 -> '1.23 ms'."""
+    for unidade, fator in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if segundos >= fator:
+            return f'{segundos / fator:8.2f} {unidade}'
+    return f'{segundos / 1e-9:8.2f} ns'
+
+
+def ler_baseline(caminho=CAMINHO_BASELINE):
+    """:return: (dict) Resultados da baseline ({} se não houver)."""
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f).get('resultados', {})
+
+
+def salvar_baseline(resultados, caminho=CAMINHO_BASELINE):
+    """Grava os resultados (mesclados aos já guardados) como baseline."""
+    todos = ler_baseline(caminho)
+    todos.update(resultados)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({'maquina': {'python': platform.python_version(),
+                               'sistema': platform.platform(),
+                               'processador': platform.processor()},
+                   'gravada_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'resultados': todos}, f, indent=2, ensure_ascii=False)
+
+
+def comparar(resultados, baseline, tolerancia=TOLERANCIA):
+    """
+    Compara as medianas com a baseline.
+
+    :return: (list) Tuplas `(nome, atual, baseline, variacao, regrediu)`;
+    `baseline` e `variacao` são None para medições sem baseline.
+    """
+    comparacao = []
+    for nome, resultado in resultados.items():
+        anterior = baseline.get(nome, {}).get('mediana')
+        if not anterior:
+            comparacao.append((nome, resultado['mediana'], None, None, False))
+            continue
+        variacao = resultado['mediana'] / anterior - 1
+        comparacao.append((nome, resultado['mediana'], anterior, variacao,
+                           variacao > tolerancia))
+    return comparacao
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description='Mede o desempenho da aplicação e compara com a '
+        'baseline.')
+    parser.add_argument('-k', dest='filtro',
+                        help='só as medições com este texto no nome')
+    parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+    parser.add_argument('--tempo-minimo', type=float, default=TEMPO_MINIMO,
+                        help='duração mínima, em segundos, de cada repetição')
+    parser.add_argument('--baseline', default=CAMINHO_BASELINE,
+                        help='arquivo JSON da baseline')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help='piora aceita (0.25 = 25%%)')
+    parser.add_argument('--salvar', action='store_true',
+                        help='grava os resultados como nova baseline')
+    parser.add_argument('--listar', action='store_true',
+                        help='só lista as medições disponíveis')
+    args = parser.parse_args(argv)
+
+    if args.listar:
+        for nome, _, precisa_tk in _MEDICOES:
+            print(nome + (' (Tk)' if precisa_tk else ''))
+        return 0
+
+    resultados, falhas = executar(args.filtro, args.repeticoes,
+                                  args.tempo_minimo)
+    if falhas:
+        print(f'\n{len(falhas)} medição(ões) falharam: '
+              f"{', '.join(falhas)}.")
+    if args.salvar:
+        salvar_baseline(resultados, args.baseline)
+        print(f'Baseline gravada em {args.baseline}.')
+        return 1 if falhas else 0
+
+    baseline = ler_baseline(args.baseline)
+    if not baseline:
+        print(f'Sem baseline em {args.baseline}; use --salvar para criar.')
+        return 1 if falhas else 0
+    print(f'\n{"medição":<40} {"atual":>11} {"baseline":>11} {"variação":>9}')
+    regressoes = 0
+    for nome, atual, anterior, variacao, regrediu in comparar(
+            resultados, baseline, args.tolerancia):
+        if anterior is None:
+            print(f'{nome:<40} {_formatar_tempo(atual)} {"-":>11}')
+            continue
+        marca = '  REGRESSÃO' if regrediu else ''
+        print(f'{nome:<40} {_formatar_tempo(atual)} '
+              f'{_formatar_tempo(anterior)} {variacao:+8.0%}{marca}')
+        regressoes += regrediu
+    if regressoes:
+        print(f'\n{regressoes} medição(ões) acima da tolerância de '
+              f'{args.tolerancia:.0%}.')
+    return 1 if regressoes or falhas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,429 @@
+"""
+Cache persistente (SQLite) das respostas da API FIPE.
+
+Cada resposta é guardada pela URL completa, com um tempo de validade que
+depende do tipo de endpoint (marcas, modelos, anos ou valor). Entradas
+vencidas continuam sendo servidas enquanto uma nova cópia é buscada em
+segundo plano (stale-while-revalidate), e o arquivo tem tamanho limitado,
+descartando primeiro as respostas usadas há mais tempo (LRU). O ETag e o
+Last-Modified de cada resposta também são guardados, para que a
+revalidação possa ser feita com uma requisição condicional.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from diagnostico import medir
+
+DIA = 24 * 60 * 60
+
+# Retornado pela função de busca quando o servidor responde 304 (a cópia
+# guardada continua válida).
+NAO_MODIFICADO = object()
+
+# Diretório onde a aplicação guarda seus arquivos locais (cache, índices...).
+DIRETORIO_DADOS = os.path.join(os.path.expanduser('~'), '.tabela_fipe')
+
+# Tempo de validade de cada tipo de endpoint, em segundos.
+# `None` significa "até a virada do mês", já que a tabela FIPE publica
+# novos preços uma vez por mês de referência.
+TTL_PADRAO = {
+    'marcas': 30 * DIA,
+    'modelos': 7 * DIA,
+    'anos': 7 * DIA,
+    'valor': None,
+    'outro': DIA,
+}
+
+# Padrões de URL (na ordem em que devem ser testados) para cada endpoint.
+_PADROES_ENDPOINT = [
+    ('valor', re.compile(r'/marcas/[^/]+/modelos/[^/]+/anos/[^/]+/?$')),
+    ('anos', re.compile(r'/marcas/[^/]+/modelos/[^/]+/anos/?$')),
+    ('modelos', re.compile(r'/marcas/[^/]+/modelos/?$')),
+    ('marcas', re.compile(r'/marcas/?$')),
+]
+
+# Acessos (para o LRU) acumulados em memória antes de irem para o disco
+# numa única transação.
+LIMITE_ACESSOS_PENDENTES = 256
+
+
+def classificar_endpoint(url):
+    """
+    Identifica a qual endpoint da API FIPE uma URL pertence.
+
+    :param url: (str) URL completa da requisição.
+    :return: (str) 'marcas', 'modelos', 'anos', 'valor' ou 'outro'.
+    """
+    caminho = url.split('?', 1)[0]
+    for endpoint, padrao in _PADROES_ENDPOINT:
+        if padrao.search(caminho):
+            return endpoint
+    return 'outro'
+
+
+def inicio_proximo_mes(instante):
+    """
+    Retorna o timestamp da meia-noite do primeiro dia do mês seguinte.
+
+    :param instante: (float) Timestamp de referência.
+    """
+    data = datetime.fromtimestamp(instante)
+    if data.month == 12:
+        proximo = data.replace(year=data.year + 1, month=1, day=1, hour=0,
+                               minute=0, second=0, microsecond=0)
+    else:
+        proximo = data.replace(month=data.month + 1, day=1, hour=0,
+                               minute=0, second=0, microsecond=0)
+    return proximo.timestamp()
+
+
+class CacheRespostas:
+    """
+    Guarda em disco as respostas JSON da API, indexadas pela URL.
+    """
+    def __init__(self, caminho=None, tamanho_maximo=50 * 1024 * 1024,
+                 ttls=None, janela_obsoleta=30 * DIA):
+        """
+        Construtor do cache.
+
+        :param caminho: (str, opcional) Arquivo SQLite do cache. Por padrão
+        fica em `DIRETORIO_DADOS`. Use ':memory:' para um cache temporário.
+        :param tamanho_maximo: (int) Limite, em bytes, da soma dos corpos
+        das respostas guardadas.
+        :param ttls: (dict, opcional) Sobrescreve os valores de `TTL_PADRAO`.
+        :param janela_obsoleta: (int) Por quanto tempo após vencer uma
+        entrada ainda pode ser servida enquanto é revalidada em segundo plano.
+        """
+        if caminho is None:
+            os.makedirs(DIRETORIO_DADOS, exist_ok=True)
+            caminho = os.path.join(DIRETORIO_DADOS, 'cache.sqlite3')
+        self.caminho = caminho
+        self.tamanho_maximo = tamanho_maximo
+        self.ttls = dict(TTL_PADRAO)
+        if ttls:
+            self.ttls.update(ttls)
+        self.janela_obsoleta = janela_obsoleta
+
+        # A conexão é compartilhada com as threads de revalidação, por isso
+        # todo acesso passa pelo lock.
+        self._lock = threading.Lock()
+        self._revalidando = set()
+        # Último acesso de cada URL lida e ainda não gravado: ler não
+        # precisa de uma transação por acerto.
+        self._acessos = {}
+        # Como cada `obter` foi atendido: entrada fresca, entrada vencida
+        # (servida e revalidada) ou busca na origem.
+        self.contadores = {'acertos': 0, 'obsoletos': 0, 'faltas': 0}
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        # Com WAL, cada commit só acrescenta ao log, e NORMAL dispensa o
+        # fsync por transação (um cache pode perder as últimas gravações).
+        self._conexao.execute('PRAGMA journal_mode = WAL')
+        self._conexao.execute('PRAGMA synchronous = NORMAL')
+        self._conexao.execute(
+            'CREATE TABLE IF NOT EXISTS respostas ('
+            ' url TEXT PRIMARY KEY,'
+            ' endpoint TEXT NOT NULL,'
+            ' corpo TEXT NOT NULL,'
+            ' tamanho INTEGER NOT NULL,'
+            ' criado_em REAL NOT NULL,'
+            ' expira_em REAL NOT NULL,'
+            ' acessado_em REAL NOT NULL,'
+            ' etag TEXT,'
+            ' ultima_modificacao TEXT)')
+        # Caches criados antes das requisições condicionais não têm as
+        # colunas dos validadores.
+        colunas = {linha[1] for linha in self._conexao.execute(
+            'PRAGMA table_info(respostas)')}
+        for coluna in ('etag', 'ultima_modificacao'):
+            if coluna not in colunas:
+                self._conexao.execute(
+                    f'ALTER TABLE respostas ADD COLUMN {coluna} TEXT')
+        self._conexao.execute(
+            'CREATE INDEX IF NOT EXISTS idx_respostas_acesso '
+            'ON respostas (acessado_em)')
+        self._conexao.commit()
+        self._tamanho_total = self._conexao.execute(
+            'SELECT COALESCE(SUM(tamanho), 0) FROM respostas').fetchone()[0]
+
+    def _calcular_expiracao(self, endpoint, agora):
+        """Calcula até quando uma resposta do endpoint é considerada fresca."""
+        ttl = self.ttls.get(endpoint, self.ttls['outro'])
+        if ttl is None:
+            return inicio_proximo_mes(agora)
+        return agora + ttl
+
+    def ler(self, url):
+        """
+        Lê uma resposta do cache sem acessar a rede.
+
+        :param url: (str) URL da requisição.
+        :return: (tuple | None) `(dados, fresco)` ou None se a URL não estiver
+        no cache. `fresco` é False quando a entrada já venceu.
+        """
+        entrada = self._ler_com_idade(url)
+        if entrada is None:
+            return None
+        dados, expira_em, _ = entrada
+        return dados, time.time() < expira_em
+
+    def fresco(self, url):
+        """
+        Diz se a URL tem uma entrada ainda válida, sem ler o corpo nem
+        contar o acesso (ex: para decidir se vale buscá-la antecipadamente).
+
+        :param url: (str) URL da requisição.
+        :return: (bool)
+        """
+        with self._lock:
+            linha = self._conexao.execute(
+                'SELECT expira_em FROM respostas WHERE url = ?',
+                (url,)).fetchone()
+        return linha is not None and time.time() < linha[0]
+
+    def gravar(self, url, dados, validadores=None):
+        """
+        Guarda (ou substitui) a resposta de uma URL e aplica o limite de
+        tamanho do cache.
+
+        :param url: (str) URL da requisição.
+        :param dados: Objeto JSON já decodificado.
+        :param validadores: (dict, opcional) 'etag' e 'ultima_modificacao'
+        recebidos nos cabeçalhos da resposta.
+        """
+        self.gravar_varias([(url, dados, validadores)])
+
+    def gravar_varias(self, respostas):
+        """
+        Guarda várias respostas em uma única transação (ex: ao importar um
+        catálogo exportado), muito mais rápido que chamar `gravar` para
+        cada uma.
+
+        :param respostas: (iterable) Tuplas `(url, dados, validadores)`;
+        `validadores` pode ser None.
+        """
+        agora = time.time()
+        with self._lock:
+            self._gravar_acessos()
+            for url, dados, validadores in respostas:
+                validadores = validadores or {}
+                endpoint = classificar_endpoint(url)
+                corpo = json.dumps(dados, ensure_ascii=False,
+                                   separators=(',', ':'))
+                tamanho = len(corpo.encode('utf-8'))
+                anterior = self._conexao.execute(
+                    'SELECT tamanho FROM respostas WHERE url = ?',
+                    (url,)).fetchone()
+                if anterior:
+                    self._tamanho_total -= anterior[0]
+                self._conexao.execute(
+                    'INSERT OR REPLACE INTO respostas '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (url, endpoint, corpo, tamanho, agora,
+                     self._calcular_expiracao(endpoint, agora), agora,
+                     validadores.get('etag'),
+                     validadores.get('ultima_modificacao')))
+                self._tamanho_total += tamanho
+            self._aplicar_limite()
+            self._conexao.commit()
+
+    def entradas(self, endpoints=None, tamanho_pagina=500):
+        """
+        Percorre as respostas guardadas, em páginas, sem segurar o lock
+        durante toda a leitura.
+
+        :param endpoints: (iterable, opcional) Apenas estes endpoints
+        (ex: ('marcas', 'modelos')). Por padrão, todos.
+        :param tamanho_pagina: (int) Linhas lidas por consulta.
+        :return: Gerador de tuplas `(url, dados)`.
+        """
+        filtro, parametros = '', []
+        if endpoints:
+            endpoints = list(endpoints)
+            filtro = (' AND endpoint IN (' + ', '.join('?' * len(endpoints))
+                      + ')')
+            parametros = endpoints
+        ultima_url = ''
+        while True:
+            with self._lock:
+                linhas = self._conexao.execute(
+                    'SELECT url, corpo FROM respostas WHERE url > ?' + filtro
+                    + ' ORDER BY url LIMIT ?',
+                    [ultima_url, *parametros, tamanho_pagina]).fetchall()
+            for url, corpo in linhas:
+                yield url, json.loads(corpo)
+            if len(linhas) < tamanho_pagina:
+                return
+            ultima_url = linhas[-1][0]
+
+    def renovar(self, url):
+        """
+        Renova a validade de uma entrada sem alterar o conteúdo (usado quando
+        o servidor confirma, com 304, que a cópia guardada não mudou).
+
+        :param url: (str) URL da requisição.
+        """
+        agora = time.time()
+        expira_em = self._calcular_expiracao(classificar_endpoint(url), agora)
+        with self._lock:
+            self._acessos.pop(url, None)
+            self._conexao.execute(
+                'UPDATE respostas SET expira_em = ?, acessado_em = ? '
+                'WHERE url = ?', (expira_em, agora, url))
+            self._conexao.commit()
+
+    def _gravar_acessos(self, confirmar=False):
+        """Leva ao disco os acessos acumulados por `_ler_com_idade`. Deve
+        ser chamado com o lock adquirido; com `confirmar`, faz o commit."""
+        if not self._acessos:
+            return
+        self._conexao.executemany(
+            'UPDATE respostas SET acessado_em = ? WHERE url = ?',
+            [(acessado_em, url) for url, acessado_em in self._acessos.items()])
+        self._acessos.clear()
+        if confirmar:
+            self._conexao.commit()
+
+    def _aplicar_limite(self):
+        """Remove as entradas acessadas há mais tempo até caber no limite.
+        Deve ser chamado com o lock adquirido."""
+        while self._tamanho_total > self.tamanho_maximo:
+            linhas = self._conexao.execute(
+                'SELECT url, tamanho FROM respostas '
+                'ORDER BY acessado_em LIMIT 32').fetchall()
+            if not linhas:
+                self._tamanho_total = 0
+                return
+            for url, tamanho in linhas:
+                self._conexao.execute(
+                    'DELETE FROM respostas WHERE url = ?', (url,))
+                self._tamanho_total -= tamanho
+                if self._tamanho_total <= self.tamanho_maximo:
+                    return
+
+    def obter(self, url, buscar):
+        """
+        Retorna a resposta de uma URL, usando o cache sempre que possível.
+
+        - Entrada fresca: retornada direto do disco.
+        - Entrada vencida dentro da `janela_obsoleta`: retornada na hora e
+          revalidada em segundo plano.
+        - Sem entrada (ou muito antiga): `buscar` é chamado e o resultado
+          é guardado. Se a busca falhar e houver uma cópia antiga, ela é
+          usada no lugar, para a aplicação continuar funcionando quando a
+          API estiver lenta ou limitando as requisições.
+
+        :param url: (str) URL da requisição.
+        :param buscar: (function) Recebe a URL e os validadores da cópia
+        guardada (ou None) e retorna `(dados, validadores)` da nova resposta,
+        ou `NAO_MODIFICADO` se a cópia guardada ainda vale.
+        """
+        with medir('cache', f'ler {classificar_endpoint(url)}'):
+            entrada = self._ler_com_idade(url)
+        if entrada is not None:
+            dados, expira_em, validadores = entrada
+            agora = time.time()
+            if agora < expira_em:
+                self._contar('acertos')
+                return dados
+            if agora - expira_em < self.janela_obsoleta:
+                self._contar('obsoletos')
+                self._revalidar_em_segundo_plano(url, buscar, dados,
+                                                 validadores)
+                return dados
+            self._contar('faltas')
+            try:
+                return self._buscar_e_gravar(url, buscar, dados, validadores)
+            except Exception:  # pylint: disable=broad-exception-caught
+                return dados
+        self._contar('faltas')
+        return self._buscar_e_gravar(url, buscar)
+
+    def _contar(self, contador):
+        with self._lock:
+            self.contadores[contador] += 1
+
+    def resumo(self):
+        """
+        :return: (dict) Contadores de `obter`, a `taxa_acertos` (respostas
+        servidas sem esperar a origem, de 0 a 1) e o tamanho guardado.
+        """
+        with self._lock:
+            resumo = dict(self.contadores)
+            resumo['bytes'] = self._tamanho_total
+        total = resumo['acertos'] + resumo['obsoletos'] + resumo['faltas']
+        resumo['taxa_acertos'] = ((resumo['acertos'] + resumo['obsoletos'])
+                                  / total if total else 0.0)
+        return resumo
+
+    def _ler_com_idade(self, url):
+        """Como `ler`, mas retorna `(dados, expira_em, validadores)`."""
+        with self._lock:
+            linha = self._conexao.execute(
+                'SELECT corpo, expira_em, etag, ultima_modificacao '
+                'FROM respostas WHERE url = ?',
+                (url,)).fetchone()
+            if linha is None:
+                return None
+            # O acesso só vai ao disco junto com a próxima gravação (que
+            # também aplica o limite) ou ao acumular muitos acessos.
+            self._acessos[url] = time.time()
+            if len(self._acessos) >= LIMITE_ACESSOS_PENDENTES:
+                self._gravar_acessos(confirmar=True)
+        corpo, expira_em, etag, ultima_modificacao = linha
+        validadores = None
+        if etag or ultima_modificacao:
+            validadores = {'etag': etag,
+                           'ultima_modificacao': ultima_modificacao}
+        return json.loads(corpo), expira_em, validadores
+
+    def _buscar_e_gravar(self, url, buscar, dados_antigos=None,
+                         validadores=None):
+        """Busca a URL na origem e atualiza o cache."""
+        resultado = buscar(url, validadores)
+        if resultado is NAO_MODIFICADO:
+            self.renovar(url)
+            return dados_antigos
+        dados, novos_validadores = resultado
+        self.gravar(url, dados, novos_validadores)
+        return dados
+
+    def _revalidar_em_segundo_plano(self, url, buscar, dados_antigos,
+                                    validadores):
+        """Dispara (uma única vez por URL) a atualização de uma entrada
+        vencida em uma thread separada."""
+        with self._lock:
+            if url in self._revalidando:
+                return
+            self._revalidando.add(url)
+
+        def revalidar():
+            try:
+                self._buscar_e_gravar(url, buscar, dados_antigos,
+                                      validadores)
+            except Exception:  # pylint: disable=broad-exception-caught
+                # A cópia antiga continua valendo até a próxima tentativa.
+                pass
+            finally:
+                with self._lock:
+                    self._revalidando.discard(url)
+
+        threading.Thread(target=revalidar, daemon=True).start()
+
+    def limpar(self):
+        """Remove todas as entradas do cache."""
+        with self._lock:
+            self._acessos.clear()
+            self._conexao.execute('DELETE FROM respostas')
+            self._conexao.commit()
+            self._tamanho_total = 0
+
+    def fechar(self):
+        """Grava os acessos pendentes e fecha a conexão com o arquivo do
+        cache."""
+        with self._lock:
+            self._gravar_acessos(confirmar=True)
+            self._conexao.close()
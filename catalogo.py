@@ -0,0 +1,183 @@
+"""
+Busca de modelos em todo o catálogo, sem escolher a marca antes.
+
+O índice reúne todos os modelos de todas as marcas e tipos que a fonte de
+dados já conhece: as listas guardadas no cache (para a API) ou o catálogo
+inteiro (para um snapshot ou uma fixture). Ele é montado uma única vez, em
+segundo plano, sobre o `IndiceBusca` (índice invertido de n-gramas), e cada
+busca devolve os modelos mais relevantes em poucos milissegundos:
+
+    catalogo = CatalogoModelos(cliente)
+    catalogo.construir()
+    catalogo.buscar('hilux 2.8 diesel')
+"""
+import threading
+from cache import classificar_endpoint
+from cliente_fipe import ClienteFipe
+from consulta import TIPOS, extrair_itens
+from indice_busca import IndiceBusca, normalizar
+
+# Máximo de modelos retornados por busca.
+LIMITE_RESULTADOS = 200
+# Bytes aproximados de cada modelo no índice (item, nome normalizado e
+# n-gramas; conferidos com tracemalloc: `python memoria.py`).
+BYTES_MODELO = 5700
+NOMES_TIPOS = {'carros': 'Carro', 'motos': 'Moto', 'caminhoes': 'Caminhão'}
+
+
+def respostas_catalogo(cliente):
+    """
+    Listas de marcas e de modelos que a fonte tem à mão, sem acessar a rede.
+
+    :param cliente: (ClienteFipe | SnapshotFipe | FixtureFipe) Fonte dos
+    dados.
+    :return: Gerador de tuplas `(url, dados)`.
+    """
+    cache = getattr(cliente, 'cache', None)
+    if cache is not None:
+        for url, dados in cache.entradas(('marcas', 'modelos')):
+            # Respostas de outra base (ex: o servidor simulado) têm outros
+            # códigos; ficam de fora.
+            if url.startswith(cliente.base_url):
+                yield url, dados
+        return
+    if isinstance(cliente, ClienteFipe):
+        # Cliente da API sem cache: percorrer o catálogo seria ir à rede.
+        return
+    # Fontes locais (snapshot, fixture): o catálogo inteiro.
+    for tipo in TIPOS:
+        url = cliente.url_marcas(tipo)
+        try:
+            marcas = cliente.obter_json(url)
+        except LookupError:
+            continue
+        yield url, marcas
+        for marca in marcas:
+            url = cliente.url_modelos(tipo, marca['codigo'])
+            try:
+                yield url, cliente.obter_json(url)
+            except LookupError:
+                continue
+
+
+class CatalogoModelos:
+    """
+    Índice de todos os modelos conhecidos, com o tipo e a marca de cada um.
+    """
+    def __init__(self, cliente, limite=LIMITE_RESULTADOS):
+        """
+        :param cliente: Fonte dos dados (ver `respostas_catalogo`).
+        :param limite: (int) Máximo de modelos retornados por busca.
+        """
+        self.cliente = cliente
+        self.limite = limite
+        self._lock = threading.Lock()
+        self._indice = None
+        # Nome normalizado de cada modelo, pelo 'codigo', para a relevância.
+        self._nomes = {}
+        self.marcas = 0
+
+    @property
+    def pronto(self):
+        """Indica se o índice já foi montado."""
+        return self._indice is not None
+
+    def __len__(self):
+        return len(self._indice.itens) if self._indice else 0
+
+    def construir(self, recriar=False):
+        """
+        Monta o índice (só na primeira chamada, a menos que `recriar`).
+        Demorado: rode em segundo plano.
+
+        :return: (CatalogoModelos) O próprio catálogo.
+        """
+        with self._lock:
+            if self._indice is not None and not recriar:
+                return self
+            nomes_marcas = {}
+            modelos = {}
+            for url, dados in respostas_catalogo(self.cliente):
+                p = self.cliente.decompor_url(url)
+                if classificar_endpoint(url) == 'marcas':
+                    for marca in dados:
+                        nomes_marcas[(p['tipo'], str(marca['codigo']))] = \
+                            marca['nome']
+                else:
+                    modelos[(p['tipo'], p['marca'])] = extrair_itens(
+                        dados, 'modelos')
+            itens = []
+            for (tipo, marca), lista in modelos.items():
+                nome_marca = nomes_marcas.get((tipo, marca), marca)
+                for modelo in lista:
+                    itens.append({
+                        'nome': f"{modelo['nome']} — {nome_marca} "
+                                f"({NOMES_TIPOS.get(tipo, tipo)})",
+                        'codigo': f"{tipo}/{marca}/{modelo['codigo']}",
+                        'tipo': tipo, 'marca': marca,
+                        'modelo': str(modelo['codigo'])})
+            # Nomes curtos primeiro: entre resultados igualmente relevantes,
+            # o nome mais curto é o mais próximo do que foi digitado.
+            itens.sort(key=lambda item: len(item['nome']))
+            # Com um espaço à frente, ' palavra' encontra início de palavra.
+            self._nomes = {item['codigo']: ' ' + normalizar(item['nome'])
+                           for item in itens}
+            self._indice = IndiceBusca(itens, limite_aproximado=self.limite)
+            self.marcas = len(modelos)
+        return self
+
+    def buscar(self, texto):
+        """
+        Modelos que correspondem ao texto, do mais para o menos relevante:
+        primeiro aqueles em que cada palavra digitada é o início de uma
+        palavra do nome, e, entre eles, os nomes mais curtos.
+
+        :param texto: (str) Texto digitado. Ex: 'gol 1.0 flex'
+        :return: (list) Até `limite` itens com 'nome', 'codigo', 'tipo',
+        'marca' e 'modelo'.
+        """
+        if self._indice is None:
+            return []
+        consulta = normalizar(texto)
+        encontrados = self._indice.buscar(consulta)
+        if not consulta:
+            return encontrados[:self.limite]
+        palavras = consulta.split()
+        if encontrados and not all(palavra in self._nomes[
+                encontrados[0]['codigo']] for palavra in palavras):
+            # Busca aproximada: já vem do mais para o menos parecido.
+            return encontrados[:self.limite]
+        inicios, demais = [], []
+        for item in encontrados:
+            nome = self._nomes[item['codigo']]
+            if all(f' {palavra}' in nome for palavra in palavras):
+                inicios.append(item)
+                if len(inicios) == self.limite:
+                    break
+            elif len(demais) < self.limite:
+                demais.append(item)
+        return (inicios + demais)[:self.limite]
+
+    # --- Memória ---
+    def memoria_estimada(self):
+        """:return: (int) Bytes aproximados ocupados pelo índice."""
+        return len(self) * BYTES_MODELO
+
+    def liberar(self, quantidade_bytes):
+        """
+        Esquece o índice inteiro para liberar memória (chamado pelo
+        `memoria.GerenciadorMemoria`); a próxima busca o monta de novo.
+
+        :return: (int) Bytes liberados, pela estimativa.
+        """
+        # Com o índice sendo montado em segundo plano, não espera.
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            liberados = self.memoria_estimada()
+            self._indice = None
+            self._nomes = {}
+            self.marcas = 0
+        finally:
+            self._lock.release()
+        return liberados
@@ -0,0 +1,322 @@
+"""
+Cliente HTTP da API FIPE (Parallelum).
+
+Concentra em um só lugar a montagem das URLs, a sessão HTTP reaproveitada
+entre as requisições (keep-alive e compressão gzip), as requisições
+condicionais (ETag / If-Modified-Since) e os contadores de tráfego. O
+acesso à rede passa pelo `GatewayFipe` (junção de requisições idênticas,
+limite de taxa e concorrência adaptativa).
+
+O `requests` só é importado na primeira requisição: ele pesa na abertura da
+aplicação e a primeira tela (tipos de veículo) não precisa da rede.
+"""
+import threading
+import time
+from collections import deque
+from cache import NAO_MODIFICADO, classificar_endpoint
+from diagnostico import medir
+from gateway import GatewayFipe
+
+URL_BASE = 'https://parallelum.com.br/fipe/api/v1/'
+# A versão 2 da API expõe as tabelas de referência (meses) e aceita consultar
+# o valor de um mês passado; a v1 só responde o mês atual.
+URL_BASE_V2 = 'https://fipe.parallelum.com.br/api/v2/'
+TIPOS_V2 = {'carros': 'cars', 'motos': 'motorcycles', 'caminhoes': 'trucks'}
+# Campos da resposta de valor da v2 e os equivalentes da v1.
+CAMPOS_V2 = {'vehicleType': 'TipoVeiculo', 'price': 'Valor', 'brand': 'Marca',
+             'model': 'Modelo', 'modelYear': 'AnoModelo', 'fuel': 'Combustivel',
+             'codeFipe': 'CodigoFipe', 'referenceMonth': 'MesReferencia',
+             'fuelAcronym': 'SiglaCombustivel'}
+# Timeouts (conexão, leitura) em segundos para toda requisição à API.
+TIMEOUT = (3.05, 15)
+# Códigos HTTP que indicam falha temporária e valem uma nova tentativa.
+STATUS_REPETIVEIS = {429, 500, 502, 503, 504}
+
+
+def _deve_repetir(erro):
+    """Indica se uma falha de requisição é temporária."""
+    import requests
+    if isinstance(erro, (requests.exceptions.ConnectionError,
+                         requests.exceptions.Timeout)):
+        return True
+    if isinstance(erro, requests.exceptions.HTTPError):
+        return erro.response is not None and \
+            erro.response.status_code in STATUS_REPETIVEIS
+    return False
+
+
+def _criar_sessao(tamanho_pool):
+    """Sessão HTTP com `tamanho_pool` conexões por host e gzip."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=tamanho_pool,
+                            pool_maxsize=tamanho_pool)
+    sessao.mount('https://', adaptador)
+    sessao.mount('http://', adaptador)
+    sessao.headers.update({
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate',
+    })
+    return sessao
+
+
+class Estatisticas:
+    """
+    Contadores de uso da rede: número de requisições, latência e bytes
+    transferidos. Pode ser atualizado por várias threads ao mesmo tempo.
+    """
+    def __init__(self, historico=500):
+        """
+        :param historico: (int) Quantas requisições recentes guardar
+        individualmente em `recentes`.
+        """
+        self._lock = threading.Lock()
+        self.requisicoes = 0
+        self.nao_modificadas = 0
+        self.falhas = 0
+        self.bytes_transferidos = 0
+        self.bytes_decodificados = 0
+        self.latencia_total = 0.0
+        # Cada item: (url, status, latência em segundos, bytes transferidos).
+        self.recentes = deque(maxlen=historico)
+
+    def registrar(self, url, status, latencia, transferidos=0,
+                  decodificados=0):
+        """Registra uma requisição concluída (status None indica falha)."""
+        with self._lock:
+            self.requisicoes += 1
+            self.latencia_total += latencia
+            self.bytes_transferidos += transferidos
+            self.bytes_decodificados += decodificados
+            if status is None:
+                self.falhas += 1
+            elif status == 304:
+                self.nao_modificadas += 1
+            self.recentes.append((url, status, latencia, transferidos))
+
+    def resumo(self):
+        """Retorna um dicionário com os totais acumulados."""
+        with self._lock:
+            media = (self.latencia_total / self.requisicoes
+                     if self.requisicoes else 0.0)
+            return {
+                'requisicoes': self.requisicoes,
+                'nao_modificadas': self.nao_modificadas,
+                'falhas': self.falhas,
+                'bytes_transferidos': self.bytes_transferidos,
+                'bytes_decodificados': self.bytes_decodificados,
+                'latencia_media': media,
+            }
+
+
+def valor_v2_para_v1(dados):
+    """
+    Converte uma resposta de valor da API v2 para os campos da v1.
+
+    :param dados: (dict) Ex: {'price': 'R$ 10.000,00', 'brand': ...}
+    :return: (dict) Ex: {'Valor': 'R$ 10.000,00', 'Marca': ...}
+    """
+    return {CAMPOS_V2.get(campo, campo): valor
+            for campo, valor in dados.items()}
+
+
+class UrlsFipe:
+    """
+    Montagem e decomposição das URLs no formato da API FIPE. Compartilhada
+    pelo cliente HTTP e pelas fontes locais que respondem às mesmas URLs.
+    """
+    base_url = URL_BASE
+    base_url_v2 = URL_BASE_V2
+
+    def url_marcas(self, tipo):
+        """URL da lista de marcas de um tipo de veículo (ex: 'carros')."""
+        return f'{self.base_url}{tipo}/marcas/'
+
+    def url_modelos(self, tipo, marca):
+        """URL da lista de modelos de uma marca."""
+        return f'{self.url_marcas(tipo)}{marca}/modelos/'
+
+    def url_anos(self, tipo, marca, modelo):
+        """URL da lista de anos-modelo de um modelo."""
+        return f'{self.url_modelos(tipo, marca)}{modelo}/anos/'
+
+    def url_valor(self, tipo, marca, modelo, ano):
+        """URL com o valor FIPE de um veículo."""
+        return f'{self.url_anos(tipo, marca, modelo)}{ano}/'
+
+    def url_referencias(self):
+        """URL da lista de meses de referência (API v2), mais recente antes."""
+        return f'{self.base_url_v2}references'
+
+    def url_valor_referencia(self, tipo, marca, modelo, ano, referencia):
+        """
+        URL do valor de um veículo em um mês de referência (API v2). Os
+        códigos de marca, modelo e ano são os mesmos da v1.
+
+        :param referencia: (str) Código do mês, de `url_referencias`.
+        """
+        return (f'{self.base_url_v2}{TIPOS_V2.get(tipo, tipo)}/brands/{marca}'
+                f'/models/{modelo}/years/{ano}?reference={referencia}')
+
+    def decompor_url(self, url):
+        """
+        Extrai os parâmetros de uma URL montada pelos métodos acima.
+
+        :param url: (str) Ex: '.../carros/marcas/59/modelos/5940/anos/'
+        :return: (dict) Com as chaves presentes entre 'tipo', 'marca',
+        'modelo' e 'ano'. Ex: {'tipo': 'carros', 'marca': '59',
+        'modelo': '5940'}
+        """
+        caminho = url[len(self.base_url):] if url.startswith(
+            self.base_url) else url
+        partes = [parte for parte in caminho.split('?', 1)[0].split('/')
+                  if parte]
+        parametros = {}
+        if partes:
+            parametros['tipo'] = partes[0]
+        for nome, chave in (('marcas', 'marca'), ('modelos', 'modelo'),
+                            ('anos', 'ano')):
+            if nome in partes:
+                posicao = partes.index(nome)
+                if posicao + 1 < len(partes):
+                    parametros[chave] = partes[posicao + 1]
+        return parametros
+
+
+class ClienteFipe(UrlsFipe):
+    """
+    Cliente da API FIPE, compartilhado por todas as telas da aplicação.
+    """
+    def __init__(self, base_url=URL_BASE, cache=None, tamanho_pool=8,
+                 tentativas=3, espera_inicial=0.5, limitador=None,
+                 gateway=None, base_url_v2=URL_BASE_V2):
+        """
+        Construtor do cliente.
+
+        :param base_url: (str) Endereço base da API, terminado em '/'.
+        :param cache: (CacheRespostas, opcional) Cache das respostas.
+        :param tamanho_pool: (int) Conexões mantidas abertas por host.
+        :param tentativas: (int) Número máximo de tentativas por requisição.
+        :param espera_inicial: (float) Espera, em segundos, antes da 2ª
+        tentativa; dobra a cada nova falha.
+        :param limitador: (LimitadorTaxa, opcional) Limita a taxa de
+        requisições que chegam à API (respostas do cache não contam).
+        :param gateway: (GatewayFipe, opcional) Controle de acesso à API
+        (junção de requisições, taxa e concorrência). Por padrão, um novo
+        gateway com o `limitador` informado.
+        :param base_url_v2: (str) Endereço base da API v2, terminado em '/'.
+        """
+        self.base_url = base_url
+        self.base_url_v2 = base_url_v2
+        self.gateway = gateway or GatewayFipe(limitador)
+        self.cache = cache
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self.estatisticas = Estatisticas()
+        self.tamanho_pool = tamanho_pool
+        self._sessao = None
+        self._lock_sessao = threading.Lock()
+
+    @property
+    def sessao(self):
+        """
+        Uma única sessão mantém as conexões TCP/TLS abertas (keep-alive)
+        entre uma tela e outra do assistente. É criada na primeira
+        requisição.
+        """
+        if self._sessao is None:
+            with self._lock_sessao:
+                if self._sessao is None:
+                    self._sessao = _criar_sessao(self.tamanho_pool)
+        return self._sessao
+
+    # --- Requisições ---
+    def obter_json(self, url):
+        """
+        Retorna o JSON de uma URL, passando pelo cache quando houver.
+
+        :param url: (str) URL da requisição.
+        """
+        if self.cache:
+            return self.cache.obter(url, self.baixar_json)
+        dados, _ = self.baixar_json(url)
+        return dados
+
+    def baixar_json(self, url, validadores=None):
+        """
+        Faz a requisição à API, repetindo falhas temporárias (timeout,
+        conexão recusada, 429 e 5xx) com espera exponencial.
+
+        :param url: (str) URL da requisição.
+        :param validadores: (dict, opcional) 'etag' e/ou 'ultima_modificacao'
+        de uma cópia já guardada, enviados como requisição condicional.
+        :return: `(dados, validadores)` da nova resposta, ou `NAO_MODIFICADO`
+        se o servidor respondeu 304.
+        """
+        cabecalhos = {}
+        if validadores:
+            if validadores.get('etag'):
+                cabecalhos['If-None-Match'] = validadores['etag']
+            if validadores.get('ultima_modificacao'):
+                cabecalhos['If-Modified-Since'] = \
+                    validadores['ultima_modificacao']
+
+        # Threads que pedem a mesma URL ao mesmo tempo (ex: a tela e o
+        # prefetch) compartilham uma única busca, com as tentativas.
+        chave = (url, tuple(sorted(cabecalhos.items())))
+        return self.gateway.juntar(
+            chave, lambda: self._baixar_com_tentativas(url, cabecalhos))
+
+    def _baixar_com_tentativas(self, url, cabecalhos):
+        """Repete as falhas temporárias com espera exponencial. Cada
+        tentativa passa pelo gateway (vaga, taxa e pausa por sobrecarga)."""
+        import requests
+        espera = self.espera_inicial
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                return self.gateway.executar(self._requisitar, url,
+                                             cabecalhos)
+            except requests.exceptions.RequestException as e:
+                if tentativa == self.tentativas or not _deve_repetir(e):
+                    raise
+                time.sleep(espera)
+                espera *= 2
+        return None
+
+    def _requisitar(self, url, cabecalhos):
+        """Executa uma única requisição e registra suas estatísticas."""
+        import requests
+        endpoint = classificar_endpoint(url)
+        inicio = time.perf_counter()
+        try:
+            with medir('rede', f'GET {endpoint}', url=url):
+                response = self.sessao.get(url, headers=cabecalhos,
+                                           timeout=TIMEOUT)
+        except requests.exceptions.RequestException:
+            self.estatisticas.registrar(url, None,
+                                        time.perf_counter() - inicio)
+            raise
+        latencia = time.perf_counter() - inicio
+        decodificados = len(response.content)
+        # Com gzip, Content-Length é o tamanho comprimido que trafegou na rede.
+        transferidos = int(response.headers.get('Content-Length',
+                                                decodificados))
+        self.estatisticas.registrar(url, response.status_code, latencia,
+                                    transferidos, decodificados)
+
+        if response.status_code == 304:
+            return NAO_MODIFICADO
+        response.raise_for_status()
+        novos_validadores = {
+            'etag': response.headers.get('ETag'),
+            'ultima_modificacao': response.headers.get('Last-Modified'),
+        }
+        with medir('json', endpoint, bytes=decodificados):
+            dados = response.json()
+        return dados, novos_validadores
+
+    def fechar(self):
+        """Encerra as conexões abertas da sessão."""
+        if self._sessao is not None:
+            self._sessao.close()
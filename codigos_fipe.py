@@ -0,0 +1,318 @@
+"""
+Índice reverso: do Código FIPE aos códigos da API.
+
+Os registros de frota trazem o Código FIPE (ex: '005340-6'), mas a API só
+é consultada por tipo, marca, modelo e ano. O `IndiceCodigosFipe` guarda,
+para cada Código FIPE, os veículos (um por ano-modelo) em que ele já
+apareceu, e responde a busca por código direto da memória:
+
+    indice = IndiceCodigosFipe()
+    indice.localizar_codigo_fipe('005340-6')
+    # [{'tipo': 'carros', 'marca': '59', 'modelo': '5940', 'ano': '2014-1',
+    #   ...}]
+
+O índice cresce a cada valor consultado (pela aplicação ou pelo `lote.py`)
+e fica gravado em disco. Também pode ser preenchido de uma vez a partir das
+respostas no cache ou de um snapshot:
+
+    python codigos_fipe.py importar-cache
+    python codigos_fipe.py importar-snapshot fipe.sqlite3
+    python codigos_fipe.py buscar 005340-6
+"""
+import argparse
+from collections import OrderedDict
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from cache import DIRETORIO_DADOS
+
+_ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS veiculos (
+    codigo_fipe TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    marca TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    ano TEXT NOT NULL,
+    nome_marca TEXT,
+    nome_modelo TEXT,
+    ano_modelo INTEGER,
+    combustivel TEXT,
+    PRIMARY KEY (tipo, marca, modelo, ano));
+CREATE INDEX IF NOT EXISTS idx_veiculos_codigo ON veiculos (codigo_fipe);
+'''
+_COLUNAS = ('tipo', 'marca', 'modelo', 'ano', 'nome_marca', 'nome_modelo',
+            'ano_modelo', 'combustivel')
+# Bytes aproximados de cada veículo e de cada código guardados em memória
+# (conferidos com tracemalloc: `python memoria.py`).
+BYTES_VEICULO = 650
+BYTES_CODIGO = 250
+
+
+def normalizar_codigo(texto):
+    """
+    Padroniza um Código FIPE digitado de várias formas.
+
+    :param texto: (str) Ex: '005340-6', '0053406' ou ' 005340 6 '.
+    :return: (str) Ex: '005340-6'; vazio se não houver dígitos.
+    """
+    digitos = re.sub(r'\D', '', str(texto or ''))
+    if len(digitos) == 7:
+        return f'{digitos[:6]}-{digitos[6]}'
+    return digitos
+
+
+class IndiceCodigosFipe:
+    """
+    Código FIPE -> veículos (tipo, marca, modelo e ano da API), em disco e
+    em memória.
+    """
+    def __init__(self, caminho=None):
+        """
+        :param caminho: (str, opcional) Arquivo SQLite. Por padrão, fica em
+        `DIRETORIO_DADOS`. Use ':memory:' para um índice temporário.
+        """
+        if caminho is None:
+            os.makedirs(DIRETORIO_DADOS, exist_ok=True)
+            caminho = os.path.join(DIRETORIO_DADOS, 'codigos_fipe.sqlite3')
+        self.caminho = caminho
+        # Gravado pela interface, pelo lote e pelas importações.
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.executescript(_ESQUEMA)
+        self._conexao.commit()
+        # Código FIPE -> {(tipo, marca, modelo, ano): veículo}, carregado
+        # uma vez para que a busca não precise ir ao disco. Do menos para o
+        # mais usado: `liberar` esquece primeiro os códigos usados há mais
+        # tempo, e aí `completo` fica False e os que faltam são relidos do
+        # disco quando buscados.
+        self._por_codigo = OrderedDict()
+        self._veiculos_em_memoria = 0
+        self.completo = True
+        for linha in self._conexao.execute(
+                'SELECT codigo_fipe, ' + ', '.join(_COLUNAS) +
+                ' FROM veiculos'):
+            self._guardar(linha[0], dict(zip(_COLUNAS, linha[1:])))
+
+    def __len__(self):
+        """Quantidade de Códigos FIPE conhecidos."""
+        if self.completo:
+            return len(self._por_codigo)
+        with self._lock:
+            return self._conexao.execute('SELECT COUNT(DISTINCT codigo_fipe) '
+                                         'FROM veiculos').fetchone()[0]
+
+    def _guardar(self, codigo_fipe, veiculo):
+        veiculos = self._por_codigo.get(codigo_fipe)
+        if veiculos is None:
+            if not self.completo:
+                # O código está só no disco: é lido inteiro quando buscado.
+                return
+            veiculos = self._por_codigo[codigo_fipe] = {}
+        chave = (veiculo['tipo'], veiculo['marca'], veiculo['modelo'],
+                 veiculo['ano'])
+        if chave not in veiculos:
+            self._veiculos_em_memoria += 1
+        veiculos[chave] = veiculo
+
+    def registrar(self, codigos, dados):
+        """
+        Guarda o veículo de uma resposta de valor.
+
+        :param codigos: (dict) Códigos da API: 'tipo', 'marca', 'modelo' e
+        'ano'.
+        :param dados: (dict) Resposta de valor, com 'CodigoFipe'.
+        :return: (bool) True se a resposta tinha Código FIPE e códigos.
+        """
+        return self.registrar_varios([(codigos, dados)]) == 1
+
+    def registrar_varios(self, itens):
+        """
+        Guarda vários veículos em uma única transação.
+
+        :param itens: (iterable) Tuplas `(codigos, dados)` como em
+        `registrar`.
+        :return: (int) Quantidade de veículos guardados.
+        """
+        linhas = []
+        for codigos, dados in itens:
+            codigo_fipe = normalizar_codigo(dados.get('CodigoFipe'))
+            chave = [str(codigos.get(campo) or '')
+                     for campo in ('tipo', 'marca', 'modelo', 'ano')]
+            if not codigo_fipe or not all(chave):
+                continue
+            linhas.append((codigo_fipe, *chave, dados.get('Marca'),
+                           dados.get('Modelo'), dados.get('AnoModelo'),
+                           dados.get('Combustivel')))
+        if not linhas:
+            return 0
+        with self._lock:
+            self._conexao.executemany(
+                'INSERT OR REPLACE INTO veiculos VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?)', linhas)
+            self._conexao.commit()
+            for linha in linhas:
+                self._guardar(linha[0], dict(zip(_COLUNAS, linha[1:])))
+        return len(linhas)
+
+    def localizar_codigo_fipe(self, codigo_fipe):
+        """
+        Lista os veículos (um por ano-modelo) com um determinado Código FIPE,
+        do ano mais recente para o mais antigo. Mesma interface do
+        `SnapshotFipe.localizar_codigo_fipe`.
+
+        :param codigo_fipe: (str) Ex: '005340-6'
+        :return: (list) Dicionários com 'tipo', 'marca', 'modelo', 'ano',
+        'nome_marca', 'nome_modelo', 'ano_modelo' e 'combustivel'.
+        """
+        codigo_fipe = normalizar_codigo(codigo_fipe)
+        with self._lock:
+            veiculos = self._por_codigo.get(codigo_fipe)
+            if veiculos is not None:
+                self._por_codigo.move_to_end(codigo_fipe)
+            elif not self.completo:
+                veiculos = self._ler_codigo(codigo_fipe)
+            veiculos = list((veiculos or {}).values())
+        return sorted((dict(v) for v in veiculos), key=lambda v: v['ano'],
+                      reverse=True)
+
+    def _ler_codigo(self, codigo_fipe):
+        """Traz de volta do disco para a memória os veículos de um código."""
+        linhas = self._conexao.execute(
+            'SELECT ' + ', '.join(_COLUNAS) + ' FROM veiculos '
+            'WHERE codigo_fipe = ?', (codigo_fipe,)).fetchall()
+        if not linhas:
+            return None
+        self._por_codigo[codigo_fipe] = {}
+        for linha in linhas:
+            self._guardar(codigo_fipe, dict(zip(_COLUNAS, linha)))
+        return self._por_codigo[codigo_fipe]
+
+    # --- Memória ---
+    def memoria_estimada(self):
+        """:return: (int) Bytes aproximados dos códigos em memória."""
+        return (self._veiculos_em_memoria * BYTES_VEICULO
+                + len(self._por_codigo) * BYTES_CODIGO)
+
+    def liberar(self, quantidade_bytes):
+        """
+        Esquece os códigos usados há mais tempo até liberar cerca de
+        `quantidade_bytes` (chamado pelo `memoria.GerenciadorMemoria`). Eles
+        continuam no disco.
+
+        :return: (int) Bytes liberados, pela estimativa.
+        """
+        antes = self.memoria_estimada()
+        with self._lock:
+            while (self._por_codigo and
+                   antes - self.memoria_estimada() < quantidade_bytes):
+                _, veiculos = self._por_codigo.popitem(last=False)
+                self._veiculos_em_memoria -= len(veiculos)
+                self.completo = False
+        return antes - self.memoria_estimada()
+
+    def consultar(self, cliente, codigo_fipe, ano=None):
+        """
+        Valores FIPE de um Código FIPE, sem percorrer marcas e modelos.
+
+        :param cliente: (ClienteFipe | SnapshotFipe) Fonte dos valores.
+        :param codigo_fipe: (str) Ex: '005340-6'
+        :param ano: (str, opcional) Só este ano-modelo ('2014-1' ou '2014').
+        :return: (list) Respostas de valor, uma por ano-modelo.
+        :raises LookupError: Se o código (ou o ano) não está no índice.
+        """
+        veiculos = self.localizar_codigo_fipe(codigo_fipe)
+        if ano:
+            veiculos = [v for v in veiculos if v['ano'] == ano or
+                        v['ano'].split('-')[0] == str(ano)]
+        if not veiculos:
+            raise LookupError(f'Código FIPE {codigo_fipe} não encontrado.')
+        return [cliente.obter_json(cliente.url_valor(
+            v['tipo'], v['marca'], v['modelo'], v['ano'])) for v in veiculos]
+
+    # --- Importação ---
+    def importar_cache(self, cliente):
+        """
+        Indexa as respostas de valor guardadas no cache do cliente.
+
+        :param cliente: (ClienteFipe) Cliente com `cache`.
+        :return: (int) Quantidade de veículos guardados.
+        """
+        if getattr(cliente, 'cache', None) is None:
+            return 0
+        return self.registrar_varios(
+            (cliente.decompor_url(url), dados)
+            for url, dados in cliente.cache.entradas(('valor',))
+            if url.startswith(cliente.base_url) and isinstance(dados, dict))
+
+    def importar_snapshot(self, caminho):
+        """
+        Indexa todos os valores de um snapshot (ver snapshot.py).
+
+        :param caminho: (str) Arquivo do snapshot.
+        :return: (int) Quantidade de veículos guardados.
+        """
+        conexao = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True)
+        try:
+            linhas = conexao.execute(
+                'SELECT tipo, marca, modelo, ano, codigo_fipe, marca_nome, '
+                'modelo_nome, ano_modelo, combustivel FROM valores').fetchall()
+        finally:
+            conexao.close()
+        return self.registrar_varios(
+            ({'tipo': tipo, 'marca': marca, 'modelo': modelo, 'ano': ano},
+             {'CodigoFipe': codigo, 'Marca': nome_marca,
+              'Modelo': nome_modelo, 'AnoModelo': ano_modelo,
+              'Combustivel': combustivel})
+            for (tipo, marca, modelo, ano, codigo, nome_marca, nome_modelo,
+                 ano_modelo, combustivel) in linhas)
+
+    def fechar(self):
+        """Fecha o arquivo do índice."""
+        with self._lock:
+            self._conexao.close()
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description='Índice de Códigos FIPE para consultas por código.')
+    parser.add_argument('--indice', metavar='ARQUIVO',
+                        help='arquivo do índice (padrão: ~/.tabela_fipe)')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    comandos.add_parser('importar-cache',
+                        help='indexa os valores guardados no cache')
+    snapshot = comandos.add_parser('importar-snapshot',
+                                   help='indexa todos os valores de um '
+                                   'snapshot')
+    snapshot.add_argument('snapshot', help='arquivo gerado por snapshot.py')
+    buscar = comandos.add_parser('buscar', help='lista os veículos de um '
+                                 'Código FIPE')
+    buscar.add_argument('codigo_fipe')
+    args = parser.parse_args(argv)
+
+    indice = IndiceCodigosFipe(args.indice)
+    try:
+        if args.comando == 'importar-cache':
+            from cache import CacheRespostas
+            from cliente_fipe import ClienteFipe
+            quantidade = indice.importar_cache(
+                ClienteFipe(cache=CacheRespostas()))
+        elif args.comando == 'importar-snapshot':
+            quantidade = indice.importar_snapshot(args.snapshot)
+        else:
+            veiculos = indice.localizar_codigo_fipe(args.codigo_fipe)
+            for veiculo in veiculos:
+                print(json.dumps(veiculo, ensure_ascii=False))
+            return 0 if veiculos else 1
+        print(f'{quantidade} veículo(s) indexado(s); {len(indice)} Códigos '
+              f'FIPE no índice.', file=sys.stderr)
+    finally:
+        indice.fechar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,874 @@
+"""
+Coleção compacta, em colunas, dos veículos carregados na sessão.
+
+Em vez de um dicionário completo por veículo, cada campo vira uma coluna:
+os textos que se repetem muito (marca, modelo, combustível, mês de
+referência...) são guardados uma única vez em uma tabela de categorias e a
+coluna só guarda o código inteiro; ano e tipo ficam em arrays de inteiros e
+o valor já convertido em um array de floats. Os dicionários no formato da
+API são remontados apenas quando alguém os pede (iteração, índice).
+
+Em sessões longas, os textos que quase nunca se repetem (modelo e Código
+FIPE) e os campos extras dos veículos usados há mais tempo podem ser
+descarregados para um armazém em disco (ver `descarregar` e memoria.py):
+as colunas numéricas e de poucas categorias continuam em memória, então
+os agrupamentos e o histograma do gráfico não mudam, e os textos são
+relidos do disco só quando o veículo é pedido.
+"""
+import logging
+from array import array
+import numpy as np
+from precos import converter_valor, estatisticas_agrupadas, formatar_valor
+
+# Ordem dos campos na resposta da API, mantida ao remontar os registros.
+ORDEM_CAMPOS = ('TipoVeiculo', 'Valor', 'Marca', 'Modelo', 'AnoModelo',
+                'Combustivel', 'CodigoFipe', 'MesReferencia',
+                'SiglaCombustivel')
+CAMPOS_TEXTO = ('Marca', 'Modelo', 'Combustivel', 'CodigoFipe',
+                'MesReferencia', 'SiglaCombustivel')
+CAMPOS_INTEIROS = ('TipoVeiculo', 'AnoModelo')
+# Marca a ausência do campo nas colunas de códigos e de inteiros.
+AUSENTE = -1
+INTEIRO_AUSENTE = -2 ** 31
+# Campos de texto com um valor (quase) diferente por veículo: os que pesam
+# na memória e vão para o disco ao descarregar a coleção.
+CAMPOS_DESCARREGAVEIS = ('Modelo', 'CodigoFipe')
+# Bytes aproximados de cada entrada das estruturas da coleção, além dos
+# caracteres de cada texto (conferidos com tracemalloc: `python memoria.py`).
+BYTES_TEXTO = 90
+BYTES_CHAVE = 110
+BYTES_EXTRAS = 400
+# Bits de cada parte (Código FIPE, ano, mês) na chave compacta: os números
+# das partes vão de 0 a 2 ** BITS_PARTE - 1.
+BITS_PARTE = 21
+# Veículos remontados por leitura do disco ao percorrer a coleção.
+LOTE_LEITURA = 1000
+# Máximo de veículos por descarga em segundo plano: limita o trabalho que
+# sobra para a thread da interface (escolher e aplicar a descarga).
+LOTE_DESCARGA = 10_000
+
+logger = logging.getLogger(__name__)
+
+
+def chave_registro(registro):
+    """
+    Chave que identifica um mesmo preço em arquivos diferentes.
+
+    :param registro: (dict) Veículo no formato da API.
+    :return: (tuple) (CodigoFipe, AnoModelo, MesReferencia).
+    """
+    return (str(registro.get('CodigoFipe', '')).strip(),
+            str(registro.get('AnoModelo', '')).strip(),
+            str(registro.get('MesReferencia', '')).strip().lower())
+
+
+class Descarga:
+    """
+    Veículos escolhidos por `ColecaoVeiculos.preparar_descarga`. Guarda só
+    referências e códigos: os dicionários a gravar são montados em `gravar`,
+    que pode rodar em outra thread.
+    """
+    def __init__(self, armazem, indices, textos, extras, ids_chave):
+        """
+        :param armazem: (ArmazemVeiculos) Destino da gravação.
+        :param indices: (np.ndarray) Posições dos veículos na coleção.
+        :param textos: (dict) {campo: (categorias, códigos)} dos campos
+        descarregáveis. A lista de categorias só é compactada depois que a
+        descarga é concluída, e até lá só ganha itens no fim.
+        :param extras: (list) Campos extras de cada veículo (ou None).
+        :param ids_chave: (dict) Números das partes de chave da coleção.
+        """
+        self.armazem = armazem
+        self.indices = indices
+        self.textos = textos
+        self.extras = extras
+        self.ids_chave = ids_chave
+        # Preenchidos por `gravar`.
+        self.partes = []
+        self.campos = set()
+        self.com_extras = []
+
+    def gravar(self):
+        """
+        Monta os campos de cada veículo e os grava no armazém, junto com as
+        partes de chave (Códigos FIPE) que eles usam.
+
+        :return: (Descarga) A própria descarga.
+        """
+        itens = []
+        codigos_fipe = set()
+        colunas = [(campo, categorias, codigos.tolist()) for campo,
+                   (categorias, codigos) in self.textos.items()]
+        for posicao, indice in enumerate(self.indices.tolist()):
+            extras = self.extras[posicao]
+            campos = dict(extras) if extras else {}
+            if extras:
+                self.com_extras.append(indice)
+            for campo, categorias, codigos in colunas:
+                if codigos[posicao] != AUSENTE:
+                    campos[campo] = categorias[codigos[posicao]]
+            if isinstance(campos.get('CodigoFipe'), str):
+                codigos_fipe.add(campos['CodigoFipe'].strip())
+            self.campos.update(campos)
+            itens.append((indice, campos))
+        self.partes = [(parte, self.ids_chave[parte]) for parte in codigos_fipe
+                       if parte in self.ids_chave]
+        self.armazem.guardar(itens)
+        self.armazem.guardar_partes(self.partes)
+        return self
+
+
+class ColecaoVeiculos:
+    """
+    Lista de veículos guardada em colunas tipadas, sem repetições.
+
+    Se comporta como a lista de dicionários que substitui (`append`,
+    `extend`, `len`, iteração, índices), e oferece operações vetorizadas
+    (`valores`, `coluna`, `filtrar`, `ordenar`, `estatisticas_por`) que não
+    precisam remontar os dicionários.
+    """
+    # Os atributos são criados em `_reiniciar`, não no construtor.
+    # pylint: disable=attribute-defined-outside-init
+    def __init__(self, registros=()):
+        """
+        Construtor da ColecaoVeiculos.
+
+        :param registros: (iterable, opcional) Veículos iniciais, no formato
+        da API.
+        """
+        self._reiniciar()
+        self.extend(registros)
+
+    def _reiniciar(self):
+        """Deixa a coleção vazia, sem nenhum veículo nem armazém. Cria todos
+        os atributos: chamado pelo construtor e por `limpar`."""
+        self._categorias = {campo: [] for campo in CAMPOS_TEXTO}
+        self._codigos_categoria = {campo: {} for campo in CAMPOS_TEXTO}
+        self._textos = {campo: array('i') for campo in CAMPOS_TEXTO}
+        self._inteiros = {campo: array('i') for campo in CAMPOS_INTEIROS}
+        self._valores = array('d')
+        # Campos que não cabem nas colunas (tipos inesperados, campos extras
+        # ou valores em outro formato), guardados só para os veículos que os
+        # têm: {indice: {campo: valor}}.
+        self._extras = {}
+        # Chaves (CodigoFipe, AnoModelo, MesReferencia) já presentes,
+        # compactadas em um único inteiro.
+        self._chaves = set()
+        self._ids_chave = {}
+        self._proximo_id_chave = 0
+        # Partes tiradas de `_ids_chave` desde a última cópia dele.
+        self._ids_esquecidos = 0
+        # Bytes dos textos guardados nas categorias e nas partes de chave,
+        # para a estimativa de `memoria_estimada`.
+        self._bytes_textos = 0
+        # Momento do último uso de cada veículo (um contador), para
+        # descarregar primeiro os usados há mais tempo.
+        self._uso = array('q')
+        self._relogio = 0
+        # 1 para os veículos cujos textos estão no armazém em disco.
+        self._no_disco = bytearray()
+        self._descarregados = 0
+        # Campos com algum valor no armazém (além das colunas).
+        self._campos_no_disco = set()
+        self._armazem = None
+        # Descarga sendo gravada em outra thread; só uma por vez.
+        self._descarga = None
+
+    # --- Inclusão ---
+    def _chave_compacta(self, registro, criar=True):
+        """
+        Chave do registro como um único inteiro, ou None se não houver
+        Código FIPE (ou, com `criar=False`, se alguma parte nunca foi vista).
+        """
+        partes = chave_registro(registro)
+        if not partes[0]:
+            return None
+        ids = []
+        for parte in partes:
+            identificador = self._buscar_id(parte)
+            if identificador is None:
+                if not criar:
+                    return None
+                identificador = self._id_parte(parte)
+            ids.append(identificador)
+        return (ids[0] << 2 * BITS_PARTE) | (ids[1] << BITS_PARTE) | ids[2]
+
+    def _buscar_id(self, parte):
+        """Número de uma parte de chave já vista (em memória ou no disco)."""
+        identificador = self._ids_chave.get(parte)
+        if identificador is None and self._armazem is not None:
+            identificador = self._armazem.id_parte(parte)
+        return identificador
+
+    def _id_parte(self, parte):
+        """Número curto e estável de uma parte de chave (texto)."""
+        identificador = self._ids_chave.get(parte)
+        if identificador is None:
+            # Uma parte que foi para o disco volta com o mesmo número.
+            if self._armazem is not None:
+                identificador = self._armazem.id_parte(parte)
+            if identificador is None:
+                identificador = self._proximo_id_chave
+                if identificador >= 1 << BITS_PARTE:
+                    # Passando do limite, as partes invadiriam as vizinhas
+                    # na chave e veículos diferentes pareceriam repetidos.
+                    raise OverflowError(
+                        f'Mais de {1 << BITS_PARTE} partes de chave '
+                        'distintas na coleção.')
+                self._proximo_id_chave += 1
+            self._ids_chave[parte] = identificador
+            self._bytes_textos += len(parte) + BYTES_TEXTO
+        return identificador
+
+    def contem(self, registro):
+        """
+        Informa se um veículo com a mesma chave já está na coleção. Não
+        altera a coleção, podendo ser chamado de outra thread.
+
+        :param registro: (dict) Veículo no formato da API.
+        """
+        chave = self._chave_compacta(registro, criar=False)
+        return chave is not None and chave in self._chaves
+
+    def append(self, registro):
+        """
+        Acrescenta um veículo, a menos que ele já esteja na coleção.
+
+        :param registro: (dict) Veículo no formato da API.
+        :return: (bool) True se o veículo foi acrescentado.
+        """
+        chave = self._chave_compacta(registro)
+        if chave is not None:
+            if chave in self._chaves:
+                return False
+            self._chaves.add(chave)
+
+        indice = len(self._valores)
+        extras = {campo: valor for campo, valor in registro.items()
+                  if campo not in ORDEM_CAMPOS}
+        for campo in CAMPOS_TEXTO:
+            valor = registro.get(campo)
+            if isinstance(valor, str):
+                codigos = self._codigos_categoria[campo]
+                codigo = codigos.get(valor)
+                if codigo is None:
+                    codigo = codigos[valor] = len(codigos)
+                    self._categorias[campo].append(valor)
+                    self._bytes_textos += len(valor) + BYTES_TEXTO
+                self._textos[campo].append(codigo)
+            else:
+                self._textos[campo].append(AUSENTE)
+                if campo in registro:
+                    extras[campo] = valor
+        for campo in CAMPOS_INTEIROS:
+            valor = registro.get(campo)
+            if (isinstance(valor, int) and not isinstance(valor, bool)
+                    and INTEIRO_AUSENTE < valor < 2 ** 31):
+                self._inteiros[campo].append(valor)
+            else:
+                self._inteiros[campo].append(INTEIRO_AUSENTE)
+                if campo in registro:
+                    extras[campo] = valor
+        valor = registro.get('Valor')
+        convertido = converter_valor(valor)
+        self._valores.append(convertido)
+        # Guarda o texto original se ele não puder ser remontado igual.
+        if 'Valor' in registro and formatar_valor(convertido) != valor:
+            extras['Valor'] = valor
+        if extras:
+            self._extras[indice] = extras
+        self._relogio += 1
+        self._uso.append(self._relogio)
+        self._no_disco.append(0)
+        return True
+
+    def extend(self, registros):
+        """
+        Acrescenta vários veículos, ignorando os repetidos.
+
+        :param registros: (iterable) Veículos no formato da API.
+        :return: (int) Quantidade de veículos acrescentados.
+        """
+        return sum(self.append(registro) for registro in registros)
+
+    def limpar(self):
+        """Remove todos os veículos da coleção."""
+        self.fechar()
+        self._reiniciar()
+
+    def fechar(self):
+        """Apaga o armazém em disco dos veículos descarregados, se houver."""
+        if self._armazem is not None:
+            self._armazem.fechar()
+            self._armazem = None
+
+    # --- Colunas ---
+    def para_colunas(self):
+        """
+        Cópia das colunas da coleção, para gravação em arquivo (ex: em outra
+        thread, sem ser afetada por veículos acrescentados depois).
+
+        :return: (dict) `quantidade`, `categorias` {campo: [textos]},
+        `textos` e `inteiros` {campo: np.ndarray int32}, `valores`
+        (np.ndarray float64) e `extras` {indice: {campo: valor}}. Os
+        veículos descarregados são relidos do disco.
+        """
+        colunas = {
+            'quantidade': len(self),
+            'categorias': {campo: list(categorias) for campo, categorias
+                           in self._categorias.items()},
+            'textos': {campo: np.array(codigos, dtype=np.int32)
+                       for campo, codigos in self._textos.items()},
+            'inteiros': {campo: np.array(numeros, dtype=np.int32)
+                         for campo, numeros in self._inteiros.items()},
+            'valores': self.valores(),
+            'extras': {indice: dict(extras)
+                       for indice, extras in self._extras.items()},
+        }
+        # Textos que voltam do disco: os que não estão mais nas categorias
+        # ganham códigos novos, no fim delas.
+        novos = {campo: {} for campo in CAMPOS_DESCARREGAVEIS}
+        for indice, campos in self._ler_do_disco().items():
+            for campo in CAMPOS_DESCARREGAVEIS:
+                valor = campos.get(campo)
+                if not isinstance(valor, str):
+                    continue
+                del campos[campo]
+                codigo = self._codigos_categoria[campo].get(valor)
+                if codigo is None:
+                    codigo = novos[campo].get(valor)
+                if codigo is None:
+                    categorias = colunas['categorias'][campo]
+                    codigo = novos[campo][valor] = len(categorias)
+                    categorias.append(valor)
+                colunas['textos'][campo][indice] = codigo
+            if campos:
+                colunas['extras'][indice] = campos
+        return colunas
+
+    @classmethod
+    def de_colunas(cls, colunas, indexar=True):
+        """
+        Monta uma coleção a partir de colunas no formato de `para_colunas`,
+        sem passar pelos dicionários.
+
+        :param colunas: (dict) Colunas, como as lidas de um arquivo
+        colunar. Campos ausentes ficam vazios.
+        :param indexar: (bool) Calcula as chaves de repetição. Dispensável
+        quando a coleção só será lida (ex: exportação).
+        :return: (ColecaoVeiculos)
+        """
+        colecao = cls()
+        quantidade = int(colunas['quantidade'])
+        for campo in CAMPOS_TEXTO:
+            categorias = list(colunas['categorias'].get(campo, []))
+            colecao._categorias[campo] = categorias
+            colecao._codigos_categoria[campo] = {
+                texto: codigo for codigo, texto in enumerate(categorias)}
+            codigos = colunas['textos'].get(campo)
+            if codigos is None:
+                codigos = np.full(quantidade, AUSENTE)
+            colecao._textos[campo] = array(
+                'i', np.asarray(codigos, dtype=np.int32).tobytes())
+        for campo in CAMPOS_INTEIROS:
+            numeros = colunas['inteiros'].get(campo)
+            if numeros is None:
+                numeros = np.full(quantidade, INTEIRO_AUSENTE)
+            colecao._inteiros[campo] = array(
+                'i', np.asarray(numeros, dtype=np.int32).tobytes())
+        colecao._valores = array(
+            'd', np.asarray(colunas['valores'], dtype=np.float64).tobytes())
+        colecao._extras = {int(indice): dict(extras) for indice, extras
+                           in colunas.get('extras', {}).items()}
+        colecao._uso = array('q', bytes(8 * quantidade))
+        colecao._no_disco = bytearray(quantidade)
+        colecao._bytes_textos = sum(
+            sum(map(len, categorias)) + len(categorias) * BYTES_TEXTO
+            for categorias in colecao._categorias.values())
+        if indexar:
+            colecao._indexar_chaves()
+        return colecao
+
+    def _indexar_chaves(self):
+        """
+        Recalcula, de uma vez, as chaves de repetição de todos os veículos:
+        cada categoria é normalizada uma única vez e as chaves saem por
+        indexação nas colunas.
+        """
+        def ids_por_codigo(campo, normalizar):
+            # O último elemento atende aos códigos AUSENTE (-1).
+            return np.array([self._id_parte(normalizar(texto))
+                             for texto in self._categorias[campo]]
+                            + [self._id_parte('')], dtype=np.int64)
+
+        ids_codigo = ids_por_codigo('CodigoFipe', str.strip)
+        ids_mes = ids_por_codigo('MesReferencia',
+                                 lambda texto: texto.strip().lower())
+        codigos = np.array(self._textos['CodigoFipe'], dtype=np.int64)
+        anos = np.array(self._inteiros['AnoModelo'], dtype=np.int64)
+        anos_unicos, inverso = np.unique(anos, return_inverse=True)
+        ids_ano = np.array([self._id_parte('' if ano == INTEIRO_AUSENTE
+                                           else str(ano))
+                            for ano in anos_unicos.tolist()], dtype=np.int64)
+        chaves = ((ids_codigo[codigos] << 2 * BITS_PARTE)
+                  | (ids_ano[inverso] << BITS_PARTE)
+                  | ids_mes[np.array(self._textos['MesReferencia'],
+                                     dtype=np.int64)])
+        # Sem Código FIPE não há chave; veículos com campos fora das colunas
+        # são calculados um a um.
+        validos = codigos != AUSENTE
+        validos[list(self._extras)] = False
+        self._chaves.update(chaves[validos].tolist())
+        for indice in self._extras:
+            chave = self._chave_compacta(self.registro(indice))
+            if chave is not None:
+                self._chaves.add(chave)
+
+    # --- Acesso como lista ---
+    def __len__(self):
+        return len(self._valores)
+
+    def __iter__(self):
+        if not self._descarregados:
+            for indice in range(len(self)):
+                yield self.registro(indice)
+            return
+        # Os descarregados são lidos do disco em lotes, não um a um.
+        for inicio in range(0, len(self), LOTE_LEITURA):
+            yield from self.registros(range(inicio, min(inicio + LOTE_LEITURA,
+                                                        len(self))))
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return self.registros(range(*indice.indices(len(self))))
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError('índice fora da coleção')
+        return self.registro(indice)
+
+    def registro(self, indice):
+        """
+        Remonta o dicionário de um veículo no formato da API.
+
+        :param indice: (int) Posição do veículo na coleção.
+        :return: (dict)
+        """
+        if self._no_disco[indice]:
+            return self._remontar(indice, self._armazem.ler(indice))
+        return self._remontar(indice, self._extras.get(indice, {}))
+
+    def registros(self, indices):
+        """
+        Remonta vários veículos, lendo os descarregados do disco de uma vez
+        (ex: os rótulos de uma página do gráfico).
+
+        :param indices: (iterable) Posições dos veículos.
+        :return: (list) Dicionários no formato da API, na mesma ordem.
+        """
+        indices = [int(indice) for indice in indices]
+        no_disco = {}
+        if self._descarregados:
+            no_disco = self._armazem.ler_varios(
+                [indice for indice in indices if self._no_disco[indice]])
+        return [self._remontar(indice, no_disco[indice])
+                if indice in no_disco
+                else self._remontar(indice, self._extras.get(indice, {}))
+                for indice in indices]
+
+    def _remontar(self, indice, extras):
+        """
+        Dicionário de um veículo a partir das colunas e dos extras. Os
+        textos descarregados chegam como extras: têm precedência sobre as
+        colunas, onde ficaram ausentes.
+        """
+        self._relogio += 1
+        self._uso[indice] = self._relogio
+        resultado = {}
+        for campo in ORDEM_CAMPOS:
+            if campo in extras:
+                resultado[campo] = extras[campo]
+            elif campo in self._textos:
+                codigo = self._textos[campo][indice]
+                if codigo != AUSENTE:
+                    resultado[campo] = self._categorias[campo][codigo]
+            elif campo in self._inteiros:
+                valor = self._inteiros[campo][indice]
+                if valor != INTEIRO_AUSENTE:
+                    resultado[campo] = valor
+            elif not np.isnan(self._valores[indice]):
+                resultado[campo] = formatar_valor(self._valores[indice])
+        for campo, valor in extras.items():
+            resultado.setdefault(campo, valor)
+        return resultado
+
+    def campos_extras(self):
+        """
+        :return: (list) Campos fora do formato da API presentes em algum
+        veículo, em ordem alfabética.
+        """
+        return sorted(({campo for extras in self._extras.values()
+                        for campo in extras} | self._campos_no_disco)
+                      - set(ORDEM_CAMPOS))
+
+    def incorporar(self, outra):
+        """
+        Acrescenta os veículos de outra coleção. Se esta estiver vazia,
+        passa a usar as colunas da outra diretamente, sem remontar os
+        registros (ex: ao abrir uma sessão exportada).
+
+        :param outra: (ColecaoVeiculos) Coleção de origem, que não deve mais
+        ser usada depois.
+        :return: (int) Quantidade de veículos acrescentados.
+        """
+        if not self:
+            self.fechar()
+            self.__dict__.update(outra.__dict__)
+            return len(self)
+        return self.extend(outra)
+
+    # --- Memória ---
+    @property
+    def descarregados(self):
+        """Quantidade de veículos com os textos no armazém em disco."""
+        return self._descarregados
+
+    def memoria_estimada(self):
+        """
+        Bytes aproximados ocupados em memória (colunas, textos e chaves de
+        repetição), calculados sem percorrer os veículos.
+
+        :return: (int)
+        """
+        colunas = sum(len(coluna) * coluna.itemsize for coluna in (
+            *self._textos.values(), *self._inteiros.values(), self._valores,
+            self._uso))
+        return (colunas + len(self._no_disco) + self._bytes_textos
+                + len(self._chaves) * BYTES_CHAVE
+                + len(self._extras) * BYTES_EXTRAS)
+
+    def _bytes_por_veiculo(self):
+        """Bytes que saem da memória, em média, com cada veículo
+        descarregado: textos e extras."""
+        em_memoria = max(1, len(self) - self._descarregados)
+        return max(1, (self._bytes_textos + len(self._extras) * BYTES_EXTRAS)
+                   // em_memoria)
+
+    def liberar(self, quantidade_bytes):
+        """
+        Descarrega os veículos usados há mais tempo até liberar cerca de
+        `quantidade_bytes` (chamado pelo `memoria.GerenciadorMemoria`).
+
+        :return: (int) Bytes liberados, pela estimativa.
+        """
+        antes = self.memoria_estimada()
+        self.descarregar(-(-quantidade_bytes // self._bytes_por_veiculo()))
+        return antes - self.memoria_estimada()
+
+    def liberar_em_segundo_plano(self, quantidade_bytes, agendador,
+                                 ao_concluir):
+        """
+        Como `liberar`, mas grava no disco em outra thread: na thread da
+        interface ficam só a escolha dos veículos e a troca das colunas, no
+        máximo `LOTE_DESCARGA` veículos por vez.
+
+        :param agendador: (Agendador) Executa a gravação.
+        :param ao_concluir: (function) Recebe, na thread da interface, os
+        bytes liberados (pela estimativa).
+        :return: (int) Bytes que a descarga agendada deve liberar (0 se
+        nada foi agendado, ex: outra descarga ainda em andamento).
+        """
+        por_veiculo = self._bytes_por_veiculo()
+        descarga = self.preparar_descarga(
+            min(-(-quantidade_bytes // por_veiculo), LOTE_DESCARGA))
+        if descarga is None:
+            return 0
+
+        def concluir(descarga):
+            antes = self.memoria_estimada()
+            self.concluir_descarga(descarga)
+            ao_concluir(antes - self.memoria_estimada())
+
+        def falhar(erro):
+            # Os veículos continuam em memória; a próxima verificação tenta
+            # de novo.
+            logger.warning('Falha ao descarregar veículos para o disco: %s',
+                           erro)
+            self.cancelar_descarga(descarga)
+
+        agendador.agendar(descarga.gravar, ao_concluir=concluir,
+                          ao_falhar=falhar)
+        return min(quantidade_bytes, len(descarga.indices) * por_veiculo)
+
+    def descarregar(self, quantidade, armazem=None):
+        """
+        Leva para o armazém em disco os textos (modelo e Código FIPE) e os
+        campos extras dos veículos usados há mais tempo. Os veículos
+        continuam na coleção e são relidos do disco quando pedidos.
+
+        :param quantidade: (int) Máximo de veículos a descarregar.
+        :param armazem: (ArmazemVeiculos, opcional) Onde guardar os textos
+        na primeira vez. Por padrão, um banco temporário.
+        :return: (int) Quantidade de veículos descarregados.
+        """
+        descarga = self.preparar_descarga(quantidade, armazem)
+        if descarga is None:
+            return 0
+        try:
+            descarga.gravar()
+        except Exception:
+            self.cancelar_descarga(descarga)
+            raise
+        return self.concluir_descarga(descarga)
+
+    def preparar_descarga(self, quantidade, armazem=None):
+        """
+        Escolhe os veículos usados há mais tempo, sem alterar a coleção. A
+        gravação (`gravar` da descarga) pode rodar em outra thread; depois,
+        `concluir_descarga` tira os textos da memória.
+
+        :param quantidade: (int) Máximo de veículos a descarregar.
+        :param armazem: (ArmazemVeiculos, opcional) Ver `descarregar`.
+        :return: (Descarga) Ou None se não há o que descarregar ou outra
+        descarga está em andamento.
+        """
+        if self._descarga is not None:
+            return None
+        em_memoria = np.flatnonzero(
+            np.frombuffer(self._no_disco, dtype=np.uint8) == 0)
+        if quantidade <= 0 or not em_memoria.size:
+            return None
+        if quantidade < em_memoria.size:
+            uso = np.frombuffer(self._uso, dtype=np.int64)[em_memoria]
+            em_memoria = em_memoria[np.argpartition(uso, quantidade)
+                                    [:quantidade]]
+        if self._armazem is None:
+            from armazem import ArmazemVeiculos
+            self._armazem = armazem or ArmazemVeiculos()
+        textos = {campo: (self._categorias[campo],
+                          np.frombuffer(self._textos[campo],
+                                        dtype=np.int32)[em_memoria])
+                  for campo in CAMPOS_DESCARREGAVEIS}
+        extras = [self._extras.get(indice) for indice in em_memoria.tolist()]
+        self._descarga = Descarga(self._armazem, em_memoria, textos, extras,
+                                  self._ids_chave)
+        return self._descarga
+
+    def concluir_descarga(self, descarga):
+        """
+        Tira da memória os textos de uma descarga já gravada. Deve rodar na
+        thread da interface, como as demais alterações da coleção.
+
+        :param descarga: (Descarga) Retornada por `preparar_descarga`.
+        :return: (int) Quantidade de veículos descarregados (0 se a coleção
+        foi limpa ou substituída enquanto a descarga era gravada).
+        """
+        if descarga is not self._descarga:
+            return 0
+        self._descarga = None
+        np.frombuffer(self._no_disco, dtype=np.uint8)[descarga.indices] = 1
+        for campo in CAMPOS_DESCARREGAVEIS:
+            np.frombuffer(self._textos[campo],
+                          dtype=np.int32)[descarga.indices] = AUSENTE
+        for indice in descarga.com_extras:
+            self._extras.pop(indice, None)
+        self._campos_no_disco.update(descarga.campos)
+        self._descarregados += len(descarga.indices)
+        self._compactar_categorias()
+        self._esquecer_partes(parte for parte, _ in descarga.partes)
+        return len(descarga.indices)
+
+    def cancelar_descarga(self, descarga):
+        """Desiste de uma descarga que falhou ao gravar; os veículos
+        continuam em memória."""
+        if descarga is self._descarga:
+            self._descarga = None
+
+    def _compactar_categorias(self):
+        """
+        Tira das categorias os textos que nenhum veículo em memória usa. Os
+        buracos são ocupados pelos textos do fim da lista, então só os
+        códigos movidos mudam: o custo em Python é proporcional aos textos
+        removidos, não a todos.
+        """
+        for campo in CAMPOS_DESCARREGAVEIS:
+            categorias = self._categorias[campo]
+            codigos = np.frombuffer(self._textos[campo], dtype=np.int32)
+            em_uso = np.bincount(codigos[codigos != AUSENTE],
+                                 minlength=len(categorias)) > 0
+            livres = np.flatnonzero(~em_uso)
+            if not livres.size:
+                continue
+            restantes = len(categorias) - livres.size
+            buracos = livres[livres < restantes]
+            movidos = np.flatnonzero(em_uso[restantes:]) + restantes
+            # O último elemento atende aos códigos AUSENTE (-1).
+            mapa = np.arange(len(categorias) + 1, dtype=np.int32)
+            mapa[-1] = AUSENTE
+            mapa[movidos] = buracos
+            self._textos[campo] = array('i', mapa[codigos].tobytes())
+            codigos_categoria = self._codigos_categoria[campo]
+            for codigo in livres.tolist():
+                texto = categorias[codigo]
+                del codigos_categoria[texto]
+                self._bytes_textos -= len(texto) + BYTES_TEXTO
+            for origem, destino in zip(movidos.tolist(), buracos.tolist()):
+                categorias[destino] = categorias[origem]
+                codigos_categoria[categorias[destino]] = destino
+            del categorias[restantes:]
+
+    def _esquecer_partes(self, partes):
+        """
+        Tira da memória as partes de chave (Códigos FIPE) já guardadas no
+        armazém que só os veículos descarregados usavam; `append` continua
+        reconhecendo as repetições pelo número guardado no disco.
+        """
+        # Uma parte ainda em uso com outros espaços em volta também sai: só
+        # passa a ser lida do disco, com o mesmo número.
+        em_uso = self._codigos_categoria['CodigoFipe']
+        for parte in partes:
+            if parte not in em_uso and parte in self._ids_chave:
+                del self._ids_chave[parte]
+                self._bytes_textos -= len(parte) + BYTES_TEXTO
+                self._ids_esquecidos += 1
+        if self._ids_esquecidos > len(self._ids_chave):
+            # Um dicionário não encolhe ao perder entradas; a cópia, sim.
+            # Copiado só depois de perder metade, o custo se dilui entre as
+            # descargas.
+            self._ids_chave = dict(self._ids_chave)
+            self._ids_esquecidos = 0
+
+    def _ler_do_disco(self):
+        """:return: (dict) {indice: campos} dos veículos descarregados."""
+        if not self._descarregados:
+            return {}
+        return self._armazem.ler_varios(np.flatnonzero(
+            np.frombuffer(bytes(self._no_disco), dtype=np.uint8)))
+
+    # --- Operações vetorizadas ---
+    def valores(self):
+        """
+        :return: (np.ndarray) Valores de todos os veículos, em reais (NaN
+        onde o valor é inválido).
+        """
+        return np.array(self._valores, dtype=float)
+
+    def coluna(self, campo):
+        """
+        Todos os valores de um campo, na ordem da coleção.
+
+        :param campo: (str) Ex: 'Marca', 'AnoModelo'.
+        :return: (np.ndarray) Array de objetos (None onde o campo falta).
+        """
+        if campo == 'Valor':
+            return self.valores()
+        resultado = np.full(len(self), None, dtype=object)
+        if campo in self._textos:
+            codigos = np.array(self._textos[campo], dtype=np.int64)
+            presentes = codigos != AUSENTE
+            categorias = np.array(self._categorias[campo] + [None],
+                                  dtype=object)
+            resultado[presentes] = categorias[codigos[presentes]]
+        elif campo in self._inteiros:
+            numeros = np.array(self._inteiros[campo], dtype=np.int64)
+            presentes = numeros != INTEIRO_AUSENTE
+            resultado[presentes] = numeros[presentes]
+        for indice, extras in self._extras.items():
+            if campo in extras:
+                resultado[indice] = extras[campo]
+        if campo in self._campos_no_disco:
+            for indice, campos in self._ler_do_disco().items():
+                if campo in campos:
+                    resultado[indice] = campos[campo]
+        return resultado
+
+    def _em_memoria(self, campo):
+        """Indica se a coluna de códigos do campo está toda em memória."""
+        return campo in self._textos and not (
+            self._descarregados and campo in CAMPOS_DESCARREGAVEIS)
+
+    def _codigos_grupo(self, campo):
+        """
+        Códigos inteiros de agrupamento de um campo e o nome de cada código.
+
+        :return: (tuple) `(codigos, nomes)`; `nomes` mapeia código -> texto.
+        """
+        if self._em_memoria(campo):
+            codigos = np.array(self._textos[campo], dtype=np.int64)
+            nomes = dict(enumerate(self._categorias[campo]))
+        elif campo in self._inteiros:
+            codigos = np.array(self._inteiros[campo], dtype=np.int64)
+            nomes = {int(c): str(c) for c in np.unique(codigos)}
+        else:
+            coluna = np.array([str(v) for v in self.coluna(campo)])
+            nomes_unicos, codigos = np.unique(coluna, return_inverse=True)
+            return codigos, dict(enumerate(nomes_unicos.tolist()))
+        nomes[AUSENTE] = nomes[INTEIRO_AUSENTE] = 'N/A'
+        return codigos, nomes
+
+    def filtrar(self, **criterios):
+        """
+        Posições dos veículos cujos campos têm os valores informados.
+
+        Ex: `colecao.filtrar(Marca='Fiat', AnoModelo=2014)`
+
+        :return: (np.ndarray) Índices, em ordem crescente.
+        """
+        selecionados = np.ones(len(self), dtype=bool)
+        for campo, valor in criterios.items():
+            if self._em_memoria(campo):
+                codigo = self._codigos_categoria[campo].get(valor)
+                if codigo is None:
+                    return np.empty(0, dtype=np.int64)
+                selecionados &= (np.array(self._textos[campo], dtype=np.int64)
+                                 == codigo)
+            elif campo in self._inteiros:
+                selecionados &= (np.array(self._inteiros[campo],
+                                          dtype=np.int64) == valor)
+            else:
+                selecionados &= self.coluna(campo) == valor
+        return np.flatnonzero(selecionados)
+
+    def ordenar(self, campo='Valor', decrescente=False, indices=None):
+        """
+        Posições dos veículos ordenadas por um campo (ordenação estável).
+
+        :param campo: (str) Campo usado na ordenação.
+        :param decrescente: (bool) Maiores primeiro.
+        :param indices: (np.ndarray, opcional) Ordena só estes veículos
+        (ex: o resultado de `filtrar`).
+        :return: (np.ndarray) Índices.
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        if campo == 'Valor':
+            chaves = self.valores()[indices]
+        elif campo in self._inteiros:
+            chaves = np.array(self._inteiros[campo],
+                              dtype=np.float64)[indices]
+            chaves[chaves == INTEIRO_AUSENTE] = np.nan
+        else:
+            chaves = np.array([str(v) for v in self.coluna(campo)[indices]])
+            if decrescente:
+                # Textos não podem ser negados: ordena a sequência invertida
+                # e desfaz a inversão, mantendo os empates na ordem original.
+                ordem = np.argsort(chaves[::-1], kind='stable')[::-1]
+                return indices[len(chaves) - 1 - ordem]
+        # Números negados para a ordem decrescente; NaN fica sempre no fim.
+        ordem = np.argsort(-chaves if decrescente else chaves, kind='stable')
+        return indices[ordem]
+
+    def estatisticas_por(self, campo, **kwargs):
+        """
+        Estatísticas dos valores agrupados por um campo, direto das colunas.
+        Mesmo resultado de `precos.estatisticas_por` sobre os dicionários.
+
+        :param campo: (str) Ex: 'Marca', 'AnoModelo'.
+        :return: (dict) {grupo: {contagem, minimo, maximo, media, ...}}.
+        """
+        codigos, nomes = self._codigos_grupo(campo)
+        por_codigo = estatisticas_agrupadas(codigos, self.valores(), **kwargs)
+        resultado = {}
+        for codigo, resumo in por_codigo.items():
+            resultado[nomes[codigo]] = resumo
+        return dict(sorted(resultado.items()))
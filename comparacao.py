@@ -0,0 +1,84 @@
+"""
+Busca em paralelo dos valores de vários veículos, para comparação.
+
+Em vez de refazer o assistente uma vez por ano (ou por modelo), as
+consultas de valor escolhidas são feitas ao mesmo tempo — o gateway do
+cliente continua limitando a taxa e a concorrência na API — e cada
+resultado é entregue assim que fica pronto, para o gráfico crescer
+enquanto os demais ainda chegam. As respostas passam pelo cache do cliente
+como qualquer outra consulta.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from consulta import ConsultaFipe
+
+# Consultas simultâneas de uma comparação.
+CONCORRENCIA = 8
+# Máximo de veículos em uma comparação.
+MAXIMO_VEICULOS = 40
+
+
+def consultas_de_anos(cliente, tipo, marca, modelo, anos):
+    """
+    Uma consulta por ano-modelo de um mesmo modelo.
+
+    :param anos: (list) Códigos dos anos-modelo. Ex: ['2014-1', '2015-1']
+    :return: (list) Funções sem argumentos que retornam `(codigos, dados)`.
+    """
+    return [partial(_valor, ConsultaFipe(cliente), tipo, marca, modelo, ano)
+            for ano in anos[:MAXIMO_VEICULOS]]
+
+
+def consultas_de_modelos(cliente, tipo, marca, modelos):
+    """
+    Uma consulta por modelo, no ano-modelo mais recente de cada um.
+
+    :param modelos: (list) Códigos dos modelos. Ex: ['5940', '5941']
+    :return: (list) Funções sem argumentos que retornam `(codigos, dados)`.
+    """
+    return [partial(_valor_mais_recente, ConsultaFipe(cliente), tipo, marca,
+                    modelo) for modelo in modelos[:MAXIMO_VEICULOS]]
+
+
+def _valor(consulta, tipo, marca, modelo, ano):
+    codigos = {'tipo': tipo, 'marca': marca, 'modelo': modelo, 'ano': ano}
+    return codigos, consulta.valor(tipo, marca, modelo, ano)
+
+
+def _valor_mais_recente(consulta, tipo, marca, modelo):
+    # A API lista os anos-modelo do mais novo para o mais antigo.
+    anos = consulta.anos(tipo, marca, modelo)
+    if not anos:
+        raise LookupError(f'O modelo {modelo} não tem anos-modelo.')
+    return _valor(consulta, tipo, marca, modelo, str(anos[0]['codigo']))
+
+
+def buscar_em_paralelo(consultas, concorrencia=CONCORRENCIA, progresso=None):
+    """
+    Executa as consultas ao mesmo tempo.
+
+    :param consultas: (list) Funções de `consultas_de_anos` ou
+    `consultas_de_modelos`.
+    :param concorrencia: (int) Consultas simultâneas.
+    :param progresso: (function, opcional) Recebe, a cada consulta
+    concluída, um dict com 'codigos' e 'dados' (ou 'erro'), 'concluidas'
+    e 'total'.
+    :return: (dict) `total`, `sucessos` e `falhas`.
+    """
+    progresso = progresso or (lambda parcial: None)
+    sucessos = falhas = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(concorrencia,
+                                                   len(consultas)))) \
+            as executor:
+        futuros = [executor.submit(consulta) for consulta in consultas]
+        for concluidas, futuro in enumerate(as_completed(futuros), start=1):
+            parcial = {'concluidas': concluidas, 'total': len(futuros)}
+            try:
+                parcial['codigos'], parcial['dados'] = futuro.result()
+                sucessos += 1
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # Uma consulta que falha não interrompe as demais.
+                parcial['erro'] = e
+                falhas += 1
+            progresso(parcial)
+    return {'total': len(consultas), 'sucessos': sucessos, 'falhas': falhas}
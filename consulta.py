@@ -0,0 +1,79 @@
+"""
+Consultas à tabela FIPE sem dependência da interface gráfica.
+
+Reúne o que as telas fazem a cada passo do assistente (montar a URL, buscar
+pelo cliente com cache e extrair a lista da resposta) em funções que podem
+ser usadas pela aplicação Tkinter, pelo modo servidor ou por scripts.
+"""
+
+TIPOS = ('carros', 'motos', 'caminhoes')
+
+
+class ErroConsulta(ValueError):
+    """Parâmetros de consulta inválidos (ex: tipo de veículo desconhecido)."""
+
+
+def extrair_itens(dados, chave_json=None):
+    """
+    Extrai a lista de opções de uma resposta da API.
+
+    :param dados: Resposta já decodificada.
+    :param chave_json: (str, opcional) Chave onde a lista está (ex:
+    'modelos', já que a resposta de modelos também traz os anos). Sem ela,
+    a própria resposta é a lista.
+    :return: (list) Itens {'nome': ..., 'codigo': ...}.
+    """
+    if chave_json:
+        return dados.get(chave_json, [])
+    return dados
+
+
+class ConsultaFipe:
+    """
+    Os quatro níveis da consulta FIPE (marcas, modelos, anos e valor) sobre
+    qualquer fonte com a interface do ClienteFipe.
+    """
+    def __init__(self, cliente):
+        """
+        :param cliente: (ClienteFipe | SnapshotFipe) Fonte das respostas.
+        """
+        self.cliente = cliente
+
+    @staticmethod
+    def tipos():
+        """:return: (list) Tipos de veículo aceitos."""
+        return list(TIPOS)
+
+    @staticmethod
+    def _validar(tipo, *codigos):
+        """Rejeita tipos desconhecidos e códigos vazios ou com '/'."""
+        if tipo not in TIPOS:
+            raise ErroConsulta(f"Tipo de veículo inválido: '{tipo}'. "
+                               f"Use {', '.join(TIPOS)}.")
+        for codigo in codigos:
+            if not str(codigo).strip() or '/' in str(codigo):
+                raise ErroConsulta(f"Código inválido: '{codigo}'.")
+
+    def marcas(self, tipo):
+        """:return: (list) Marcas de um tipo de veículo."""
+        self._validar(tipo)
+        return extrair_itens(self.cliente.obter_json(
+            self.cliente.url_marcas(tipo)))
+
+    def modelos(self, tipo, marca):
+        """:return: (list) Modelos de uma marca."""
+        self._validar(tipo, marca)
+        return extrair_itens(self.cliente.obter_json(
+            self.cliente.url_modelos(tipo, marca)), 'modelos')
+
+    def anos(self, tipo, marca, modelo):
+        """:return: (list) Anos-modelo de um modelo."""
+        self._validar(tipo, marca, modelo)
+        return extrair_itens(self.cliente.obter_json(
+            self.cliente.url_anos(tipo, marca, modelo)))
+
+    def valor(self, tipo, marca, modelo, ano):
+        """:return: (dict) Dados completos do veículo, com o valor FIPE."""
+        self._validar(tipo, marca, modelo, ano)
+        return self.cliente.obter_json(
+            self.cliente.url_valor(tipo, marca, modelo, ano))
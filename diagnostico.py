@@ -0,0 +1,226 @@
+"""
+Medição de tempos e perfil de execução da aplicação.
+
+Cada trecho interessante (requisição, decodificação do JSON, leitura do
+cache, construção de uma tela, desenho do gráfico) é envolvido por um
+intervalo de tempo:
+
+    with medir('rede', 'GET marcas'):
+        ...
+
+    @cronometrado('tela')
+    def __init__(self, ...):
+        ...
+
+Os intervalos ficam nos últimos `MAXIMO_INTERVALOS` registros de
+`intervalos` (compartilhado por todas as threads), são enviados ao logger
+'fipe.tempos' em nível DEBUG e podem ser exportados como JSONL ou no formato
+de trace do Chrome (abra em chrome://tracing ou https://ui.perfetto.dev).
+A janela de diagnóstico mostra os percentis de cada trecho.
+
+O `Perfilador` liga e desliga uma captura do cProfile, para investigar um
+trecho lento em detalhe.
+"""
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+MAXIMO_INTERVALOS = 20_000
+# Linhas do relatório do cProfile.
+LINHAS_PERFIL = 40
+
+logger = logging.getLogger('fipe.tempos')
+
+
+class RegistroIntervalos:
+    """
+    Intervalos de tempo recentes, registrados por qualquer thread.
+    """
+    def __init__(self, maximo=MAXIMO_INTERVALOS):
+        """
+        :param maximo: (int) Quantos intervalos guardar; os mais antigos
+        são descartados.
+        """
+        self._lock = threading.Lock()
+        # Cada item: (categoria, nome, início, duração, thread, detalhes),
+        # com início e duração em segundos (`time.perf_counter`).
+        self._intervalos = deque(maxlen=maximo)
+        self._origem = time.perf_counter()
+        self._origem_relogio = time.time()
+
+    def registrar(self, categoria, nome, inicio, duracao, detalhes=None):
+        """Guarda um intervalo já medido."""
+        item = (categoria, nome, inicio, duracao, threading.get_ident(),
+                detalhes)
+        with self._lock:
+            self._intervalos.append(item)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({
+                'categoria': categoria, 'nome': nome,
+                'duracao_ms': round(duracao * 1000, 3),
+                'detalhes': detalhes}, ensure_ascii=False, default=str))
+
+    def copiar(self):
+        """:return: (list) Os intervalos guardados, do mais antigo ao mais
+        recente."""
+        with self._lock:
+            return list(self._intervalos)
+
+    def limpar(self):
+        with self._lock:
+            self._intervalos.clear()
+
+    def percentis(self):
+        """
+        Resumo dos tempos de cada trecho.
+
+        :return: (list) Dicts com categoria, nome, quantidade, p50, p95 e
+        maximo (em segundos), ordenados pela soma dos tempos, do maior para
+        o menor.
+        """
+        por_trecho = {}
+        for categoria, nome, _, duracao, _, _ in self.copiar():
+            por_trecho.setdefault((categoria, nome), []).append(duracao)
+        resumo = []
+        for (categoria, nome), duracoes in por_trecho.items():
+            duracoes = np.asarray(duracoes)
+            p50, p95 = np.percentile(duracoes, [50, 95])
+            resumo.append({'categoria': categoria, 'nome': nome,
+                           'quantidade': len(duracoes), 'p50': float(p50),
+                           'p95': float(p95),
+                           'maximo': float(duracoes.max()),
+                           'total': float(duracoes.sum())})
+        resumo.sort(key=lambda r: r['total'], reverse=True)
+        return resumo
+
+    def exportar_jsonl(self, caminho):
+        """
+        Grava um intervalo por linha, com o início em horário Unix.
+
+        :return: (int) Quantidade de intervalos gravados.
+        """
+        copia = self.copiar()
+        with open(caminho, 'w', encoding='utf-8') as f:
+            for categoria, nome, inicio, duracao, thread, detalhes in copia:
+                f.write(json.dumps({
+                    'inicio': self._origem_relogio + inicio - self._origem,
+                    'duracao': duracao, 'categoria': categoria, 'nome': nome,
+                    'thread': thread, 'detalhes': detalhes},
+                    ensure_ascii=False, default=str) + '\n')
+        return len(copia)
+
+    def exportar_chrome_trace(self, caminho):
+        """
+        Grava os intervalos no formato de trace do Chrome (eventos 'X').
+
+        :return: (int) Quantidade de intervalos gravados.
+        """
+        copia = self.copiar()
+        pid = os.getpid()
+        eventos = [{'name': nome, 'cat': categoria, 'ph': 'X',
+                    'ts': (inicio - self._origem) * 1e6,
+                    'dur': duracao * 1e6, 'pid': pid, 'tid': thread,
+                    'args': detalhes or {}}
+                   for categoria, nome, inicio, duracao, thread, detalhes
+                   in copia]
+        # Nomes das threads, para o visualizador agrupar as linhas.
+        for thread in threading.enumerate():
+            eventos.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                            'tid': thread.ident,
+                            'args': {'name': thread.name}})
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': eventos, 'displayTimeUnit': 'ms'}, f,
+                      ensure_ascii=False, default=str)
+        return len(copia)
+
+
+# Registro único da aplicação.
+intervalos = RegistroIntervalos()
+
+
+@contextmanager
+def medir(categoria, nome, **detalhes):
+    """
+    Mede o trecho dentro do `with` e o guarda em `intervalos`, mesmo que
+    ele termine com uma exceção.
+
+    :param categoria: (str) Ex: 'rede', 'json', 'cache', 'tela', 'desenho'.
+    :param nome: (str) Ex: 'GET marcas', 'FrameSelecao.__init__'.
+    :param detalhes: Valores extras guardados com o intervalo (ex: url).
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        intervalos.registrar(categoria, nome, inicio,
+                             time.perf_counter() - inicio, detalhes or None)
+
+
+def cronometrado(categoria, nome=None):
+    """
+    Decorador que mede cada chamada da função.
+
+    :param categoria: (str) Categoria do intervalo.
+    :param nome: (str, opcional) Nome do intervalo; por padrão, o nome
+    qualificado da função (ex: 'FrameGrafico.__init__').
+    """
+    def decorar(funcao):
+        rotulo = nome or funcao.__qualname__
+
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir(categoria, rotulo):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorar
+
+
+class Perfilador:
+    """
+    Captura opcional do cProfile, ligada e desligada pelo usuário.
+
+    O cProfile mede só a thread em que foi ligado (a da interface), que é
+    onde ficam a construção das telas e o desenho do gráfico.
+    """
+    def __init__(self):
+        self._perfil = None
+
+    @property
+    def ativo(self):
+        """Indica se há uma captura em andamento."""
+        return self._perfil is not None
+
+    def iniciar(self):
+        """Começa uma nova captura (se já houver uma, nada muda)."""
+        if self._perfil is None:
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+
+    def parar(self, caminho=None):
+        """
+        Encerra a captura.
+
+        :param caminho: (str, opcional) Arquivo .prof onde gravar a captura
+        (abre com `python -m pstats` ou snakeviz).
+        :return: (str) As funções mais demoradas, por tempo acumulado; vazio
+        se não havia captura.
+        """
+        if self._perfil is None:
+            return ''
+        self._perfil.disable()
+        perfil, self._perfil = self._perfil, None
+        if caminho:
+            perfil.dump_stats(caminho)
+        texto = io.StringIO()
+        pstats.Stats(perfil, stream=texto).sort_stats(
+            'cumulative').print_stats(LINHAS_PERFIL)
+        return texto.getvalue()
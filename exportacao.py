@@ -0,0 +1,235 @@
+"""
+Exportação da sessão (todos os veículos carregados) e do catálogo em cache.
+
+Formatos, escolhidos pela extensão do arquivo:
+
+- `.jsonl` / `.ndjson`: um veículo por linha, no formato da API.
+- `.csv`: uma coluna por campo, para planilhas.
+- `.fipecol`: formato binário colunar da própria aplicação. Guarda as
+  colunas da `ColecaoVeiculos` como estão na memória (códigos inteiros,
+  anos e valores em arrays), precedidas de um cabeçalho JSON com as
+  categorias. A leitura mapeia as colunas do arquivo direto para arrays,
+  sem decodificar um registro por vez.
+
+As funções de gravação recebem a cópia das colunas feita por
+`ColecaoVeiculos.para_colunas`, para poderem rodar fora da thread da
+interface, e gravam em um arquivo temporário substituído ao final.
+"""
+import csv
+import json
+import os
+import struct
+import numpy as np
+from colecao import (ColecaoVeiculos, ORDEM_CAMPOS, CAMPOS_TEXTO,
+                     CAMPOS_INTEIROS)
+
+EXTENSAO_COLUNAR = '.fipecol'
+FORMATOS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv',
+            EXTENSAO_COLUNAR: 'colunar'}
+MAGICA = b'FIPECOL\x01'
+VERSAO_COLUNAR = 1
+# Alinhamento, em bytes, de cada coluna no arquivo colunar.
+ALINHAMENTO = 8
+# De quantos em quantos registros o progresso é publicado.
+INTERVALO_PROGRESSO = 5000
+
+
+class ErroExportacao(ValueError):
+    """Arquivo em formato desconhecido ou corrompido."""
+
+
+def formato_do_arquivo(caminho):
+    """
+    :param caminho: (str) Nome do arquivo.
+    :return: (str) 'jsonl', 'csv' ou 'colunar'.
+    :raises ErroExportacao: Se a extensão não for suportada.
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in FORMATOS:
+        raise ErroExportacao(f'Formato não suportado: {extensao or caminho}')
+    return FORMATOS[extensao]
+
+
+def exportar(colunas, caminho, progresso=None):
+    """
+    Grava os veículos no formato indicado pela extensão do arquivo.
+
+    Feito para rodar em segundo plano (ex: `Agendador.agendar`, com
+    `ao_progresso`).
+
+    :param colunas: (dict) Cópia das colunas (`ColecaoVeiculos.para_colunas`).
+    :param caminho: (str) Arquivo de destino.
+    :param progresso: (function, opcional) Recebe dicts com `gravados` e
+    `total`.
+    :return: (dict) `caminho`, `registros` e `bytes` gravados.
+    """
+    formato = formato_do_arquivo(caminho)
+    progresso = progresso or (lambda parcial: None)
+    temporario = caminho + '.tmp'
+    try:
+        if formato == 'colunar':
+            with open(temporario, 'wb') as f:
+                _escrever_colunar(colunas, f)
+        else:
+            colecao = ColecaoVeiculos.de_colunas(colunas, indexar=False)
+            with open(temporario, 'w', encoding='utf-8', newline='') as f:
+                escrever = (_escrever_jsonl if formato == 'jsonl'
+                            else _escrever_csv)
+                escrever(colecao, f, progresso)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    progresso({'gravados': colunas['quantidade'],
+               'total': colunas['quantidade']})
+    return {'caminho': caminho, 'registros': colunas['quantidade'],
+            'bytes': os.path.getsize(caminho)}
+
+
+def _publicar(progresso, gravados, total):
+    """Publica o progresso a cada `INTERVALO_PROGRESSO` registros."""
+    if gravados % INTERVALO_PROGRESSO == 0:
+        progresso({'gravados': gravados, 'total': total})
+
+
+def _escrever_jsonl(colecao, arquivo, progresso):
+    """Grava um veículo por linha, no formato da API."""
+    for gravados, registro in enumerate(colecao, 1):
+        arquivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        _publicar(progresso, gravados, len(colecao))
+
+
+def _escrever_csv(colecao, arquivo, progresso):
+    """Grava uma linha por veículo; campos extras viram colunas no fim."""
+    campos = list(ORDEM_CAMPOS) + colecao.campos_extras()
+    escritor = csv.DictWriter(arquivo, fieldnames=campos)
+    escritor.writeheader()
+    for gravados, registro in enumerate(colecao, 1):
+        escritor.writerow(registro)
+        _publicar(progresso, gravados, len(colecao))
+
+
+# --- Formato colunar ---
+def _escrever_colunar(colunas, arquivo):
+    """
+    Grava: a assinatura `MAGICA`, o tamanho do cabeçalho (uint64), o
+    cabeçalho JSON e, em seguida, os bytes de cada coluna, alinhados.
+    """
+    blocos = [('texto', campo, colunas['textos'][campo])
+              for campo in CAMPOS_TEXTO]
+    blocos += [('inteiro', campo, colunas['inteiros'][campo])
+               for campo in CAMPOS_INTEIROS]
+    blocos.append(('valor', 'Valor', colunas['valores']))
+
+    descricoes, deslocamento = [], 0
+    for tipo, campo, dados in blocos:
+        dados = np.ascontiguousarray(dados)
+        descricoes.append({'tipo': tipo, 'campo': campo,
+                           'dtype': dados.dtype.newbyteorder('<').str,
+                           'deslocamento': deslocamento})
+        deslocamento += _alinhar(dados.nbytes)
+    cabecalho = json.dumps({
+        'versao': VERSAO_COLUNAR,
+        'quantidade': colunas['quantidade'],
+        'colunas': descricoes,
+        'categorias': colunas['categorias'],
+        'extras': {str(i): e for i, e in colunas['extras'].items()},
+    }, ensure_ascii=False).encode('utf-8')
+    cabecalho += b' ' * (_alinhar(len(cabecalho)) - len(cabecalho))
+
+    arquivo.write(MAGICA)
+    arquivo.write(struct.pack('<Q', len(cabecalho)))
+    arquivo.write(cabecalho)
+    for _, _, dados in blocos:
+        bruto = np.ascontiguousarray(dados).astype(
+            dados.dtype.newbyteorder('<'), copy=False).tobytes()
+        arquivo.write(bruto)
+        arquivo.write(b'\0' * (_alinhar(len(bruto)) - len(bruto)))
+
+
+def _alinhar(tamanho):
+    """Arredonda um tamanho para o próximo múltiplo de `ALINHAMENTO`."""
+    return -(-tamanho // ALINHAMENTO) * ALINHAMENTO
+
+
+def carregar_colunar(caminho, indexar=True):
+    """
+    Lê um arquivo `.fipecol` mapeando cada coluna direto do disco.
+
+    :param caminho: (str) Arquivo gravado por `exportar`.
+    :param indexar: (bool) Calcula as chaves de repetição da coleção.
+    :return: (ColecaoVeiculos)
+    :raises ErroExportacao: Se o arquivo não estiver no formato esperado.
+    """
+    with open(caminho, 'rb') as f:
+        if f.read(len(MAGICA)) != MAGICA:
+            raise ErroExportacao(f'{caminho} não é um arquivo colunar FIPE.')
+        tamanho_cabecalho, = struct.unpack('<Q', f.read(8))
+        try:
+            cabecalho = json.loads(f.read(tamanho_cabecalho))
+        except ValueError as e:
+            raise ErroExportacao(f'Cabeçalho inválido: {e}') from e
+    if cabecalho.get('versao') != VERSAO_COLUNAR:
+        raise ErroExportacao('Versão do arquivo colunar não suportada.')
+
+    quantidade = cabecalho['quantidade']
+    inicio = len(MAGICA) + 8 + tamanho_cabecalho
+    colunas = {'quantidade': quantidade, 'categorias': cabecalho['categorias'],
+               'textos': {}, 'inteiros': {}, 'extras': cabecalho['extras']}
+    for descricao in cabecalho['colunas']:
+        if quantidade == 0:
+            dados = np.empty(0, dtype=descricao['dtype'])
+        else:
+            dados = np.memmap(caminho, dtype=descricao['dtype'], mode='r',
+                              offset=inicio + descricao['deslocamento'],
+                              shape=(quantidade,))
+        if descricao['tipo'] == 'texto':
+            colunas['textos'][descricao['campo']] = dados
+        elif descricao['tipo'] == 'inteiro':
+            colunas['inteiros'][descricao['campo']] = dados
+        else:
+            colunas['valores'] = dados
+    return ColecaoVeiculos.de_colunas(colunas, indexar=indexar)
+
+
+# --- Catálogo em cache ---
+def exportar_catalogo(cache, caminho, progresso=None):
+    """
+    Grava em JSONL as listas de marcas, modelos e anos guardadas no cache,
+    uma resposta por linha (`{"url": ..., "dados": ...}`).
+
+    :param cache: (CacheRespostas) Cache de onde as respostas são lidas.
+    :param caminho: (str) Arquivo de destino.
+    :param progresso: (function, opcional) Recebe dicts com `gravados`.
+    :return: (dict) `caminho`, `registros` e `bytes` gravados.
+    """
+    progresso = progresso or (lambda parcial: None)
+    temporario = caminho + '.tmp'
+    gravados = 0
+    try:
+        with open(temporario, 'w', encoding='utf-8') as f:
+            for url, dados in cache.entradas(('marcas', 'modelos', 'anos')):
+                f.write(json.dumps({'url': url, 'dados': dados},
+                                   ensure_ascii=False) + '\n')
+                gravados += 1
+                _publicar(progresso, gravados, None)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return {'caminho': caminho, 'registros': gravados,
+            'bytes': os.path.getsize(caminho)}
+
+
+def importar_catalogo(cache, caminho):
+    """
+    Carrega no cache as respostas gravadas por `exportar_catalogo`.
+
+    :param cache: (CacheRespostas) Cache que recebe as respostas.
+    :param caminho: (str) Arquivo JSONL.
+    :return: (int) Quantidade de respostas carregadas.
+    """
+    with open(caminho, 'r', encoding='utf-8') as f:
+        entradas = [json.loads(linha) for linha in f if linha.strip()]
+    cache.gravar_varias((e['url'], e['dados'], None) for e in entradas)
+    return len(entradas)
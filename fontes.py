@@ -0,0 +1,305 @@
+"""
+Fontes de dados da tabela FIPE, escolhidas na inicialização.
+
+Toda fonte responde às mesmas URLs do `ClienteFipe` (`url_marcas`,
+`obter_json`...), então a aplicação, o modo servidor e o lote funcionam
+com qualquer uma:
+
+- `api` ou `api:URL`: a API (ou um servidor compatível, como o
+  `servidor_mock.py`), com cache em disco;
+- `snapshot:ARQUIVO`: um snapshot SQLite gerado por `snapshot.py`;
+- `fixture:ARQUIVO`: respostas gravadas em JSONL, mantidas em memória;
+- `fixture:sintetica`: um catálogo gerado, sempre igual, para testes e
+  medições sem rede.
+
+Para gravar uma fixture com as respostas guardadas no cache:
+
+    python fontes.py gravar respostas.jsonl
+"""
+import argparse
+import json
+import random
+import sys
+from urllib.parse import urlsplit
+from cliente_fipe import URL_BASE, URL_BASE_V2, UrlsFipe
+from precos import formatar_valor
+
+TIPOS_FONTE = ('api', 'snapshot', 'fixture')
+COMBUSTIVEIS = (('Gasolina', 'G', 1), ('Diesel', 'D', 3), ('Flex', 'F', 1))
+MES_SINTETICO = 'outubro de 2026'
+
+
+class ErroFonte(ValueError):
+    """Especificação de fonte inválida."""
+
+
+class ErroFixture(LookupError):
+    """URL sem resposta gravada na fixture."""
+
+
+def caminho_relativo(url, bases=(URL_BASE,), bases_v2=(URL_BASE_V2,)):
+    """
+    Caminho de uma URL da API sem o endereço base, usado como chave das
+    respostas gravadas (as da API v2 recebem o prefixo 'v2/').
+
+    :param url: (str) Ex: 'https://parallelum.com.br/fipe/api/v1/carros/marcas/'
+    :param bases: (tuple) Endereços base da v1 a remover.
+    :param bases_v2: (tuple) Endereços base da v2 a remover.
+    :return: (str) Ex: 'carros/marcas/'
+    """
+    for base in bases_v2:
+        if url.startswith(base):
+            return 'v2/' + url[len(base):]
+    for base in bases:
+        if url.startswith(base):
+            return url[len(base):]
+    partes = urlsplit(url)
+    caminho = partes.path.lstrip('/')
+    return f'{caminho}?{partes.query}' if partes.query else caminho
+
+
+def url_absoluta(caminho):
+    """Inverso de `caminho_relativo`: a URL da API de um caminho."""
+    if caminho.startswith('v2/'):
+        return URL_BASE_V2 + caminho[len('v2/'):]
+    return URL_BASE + caminho
+
+
+class FixtureFipe(UrlsFipe):
+    """
+    Fonte em memória que devolve respostas gravadas, sem rede nem disco.
+    """
+    base_url = 'fixture:///'
+    base_url_v2 = 'fixture:///v2/'
+    # Não há cache: toda consulta já é local.
+    cache = None
+
+    def __init__(self, respostas=None):
+        """
+        :param respostas: (dict, opcional) {caminho relativo: dados}, com
+        caminhos como os de `caminho_relativo`.
+        """
+        self.respostas = dict(respostas or {})
+
+    @classmethod
+    def de_arquivo(cls, caminho):
+        """
+        Lê uma fixture em JSONL, uma resposta por linha
+        (`{"url": ..., "dados": ...}`), como as gravadas por `gravar_fixture`
+        ou por **Arquivo > Exportar catálogo**.
+
+        :param caminho: (str) Arquivo JSONL.
+        :return: (FixtureFipe)
+        """
+        respostas = {}
+        with open(caminho, 'r', encoding='utf-8') as f:
+            for linha in f:
+                if linha.strip():
+                    entrada = json.loads(linha)
+                    respostas[caminho_relativo(entrada['url'])] = \
+                        entrada['dados']
+        return cls(respostas)
+
+    @classmethod
+    def sintetica(cls, marcas=20, modelos=10, anos=5, semente=0):
+        """
+        Gera um catálogo completo e determinístico para os três tipos de
+        veículo: `marcas` marcas, `modelos` modelos por marca e `anos`
+        anos-modelo por modelo, com valores.
+
+        :param semente: (int) A mesma semente gera sempre o mesmo catálogo.
+        :return: (FixtureFipe)
+        """
+        sorteio = random.Random(semente)
+        respostas = {}
+        codigo_modelo = 1000
+        for tipo_veiculo, tipo in enumerate(('carros', 'motos',
+                                             'caminhoes'), 1):
+            lista_marcas = [{'nome': f'Marca {tipo[:3].upper()} {m:03d}',
+                             'codigo': str(m)} for m in range(1, marcas + 1)]
+            respostas[f'{tipo}/marcas/'] = lista_marcas
+            for marca in lista_marcas:
+                lista_modelos, anos_marca = [], {}
+                for _ in range(modelos):
+                    codigo_modelo += 1
+                    nome_modelo = (f"Modelo {codigo_modelo} "
+                                   f"{sorteio.choice(('1.0', '1.6', '2.0'))}")
+                    lista_modelos.append({'nome': nome_modelo,
+                                          'codigo': codigo_modelo})
+                    base = sorteio.uniform(20_000, 300_000)
+                    combustivel, sigla, codigo = sorteio.choice(COMBUSTIVEIS)
+                    lista_anos = []
+                    for i in range(anos):
+                        ano = 2026 - i
+                        ano_api = {'nome': f'{ano} {combustivel}',
+                                   'codigo': f'{ano}-{codigo}'}
+                        lista_anos.append(ano_api)
+                        anos_marca[ano_api['codigo']] = ano_api
+                        valor = base * 0.9 ** i
+                        respostas[(f"{tipo}/marcas/{marca['codigo']}/modelos/"
+                                   f"{codigo_modelo}/anos/"
+                                   f"{ano_api['codigo']}/")] = {
+                            'TipoVeiculo': tipo_veiculo,
+                            'Valor': formatar_valor(valor),
+                            'Marca': marca['nome'],
+                            'Modelo': nome_modelo,
+                            'AnoModelo': ano,
+                            'Combustivel': combustivel,
+                            'CodigoFipe': f'{codigo_modelo:06d}-{i}',
+                            'MesReferencia': f'{MES_SINTETICO} ',
+                            'SiglaCombustivel': sigla,
+                        }
+                    respostas[(f"{tipo}/marcas/{marca['codigo']}/modelos/"
+                               f"{codigo_modelo}/anos/")] = lista_anos
+                respostas[f"{tipo}/marcas/{marca['codigo']}/modelos/"] = {
+                    'modelos': lista_modelos,
+                    'anos': sorted(anos_marca.values(),
+                                   key=lambda a: a['codigo'], reverse=True)}
+        return cls(respostas)
+
+    def chave(self, url):
+        """Caminho relativo de uma URL desta fonte (ou da API)."""
+        return caminho_relativo(url, (self.base_url, URL_BASE),
+                                (self.base_url_v2, URL_BASE_V2))
+
+    def obter_json(self, url):
+        """
+        Retorna a resposta gravada para a URL.
+
+        :raises ErroFixture: Se a URL não estiver na fixture.
+        """
+        try:
+            return self.respostas[self.chave(url)]
+        except KeyError:
+            raise ErroFixture(
+                f'{self.chave(url)} não está na fixture.') from None
+
+    def fechar(self):
+        """Nada a fechar; existe para ter a mesma interface das outras."""
+
+
+def gerar_veiculos(quantidade, semente=0):
+    """
+    Gera veículos avulsos no formato da resposta de valor da API, sempre
+    iguais para a mesma semente (para medições e conferências de memória).
+
+    :param quantidade: (int) Quantos veículos gerar.
+    :param semente: (int) A mesma semente gera sempre os mesmos veículos.
+    :return: (list) Dicts com os campos da resposta de valor.
+    """
+    sorteio = random.Random(semente)
+    combustiveis = [(nome, sigla) for nome, sigla, _ in COMBUSTIVEIS]
+    veiculos = []
+    for i in range(quantidade):
+        combustivel, sigla = sorteio.choice(combustiveis)
+        veiculos.append({
+            'TipoVeiculo': 1,
+            'Valor': formatar_valor(sorteio.uniform(15_000, 400_000)),
+            'Marca': f'Marca {sorteio.randrange(60):02d}',
+            'Modelo': f'Modelo {i} {sorteio.choice(("1.0", "1.6", "2.0"))} '
+                      f'{combustivel}',
+            'AnoModelo': sorteio.randrange(2000, 2027),
+            'Combustivel': combustivel,
+            'CodigoFipe': f'{i:06d}-{i % 10}',
+            'MesReferencia': f'{MES_SINTETICO} ',
+            'SiglaCombustivel': sigla,
+        })
+    return veiculos
+
+
+def gerar_opcoes(quantidade, semente=0):
+    """Opções {'nome', 'codigo'} como as listas de modelos da API."""
+    return [{'nome': v['Modelo'], 'codigo': i}
+            for i, v in enumerate(gerar_veiculos(quantidade, semente))]
+
+
+def abrir_fonte(especificacao='api', **opcoes):
+    """
+    Cria a fonte de dados descrita por uma especificação.
+
+    :param especificacao: (str) 'api', 'api:URL', 'snapshot:ARQUIVO',
+    'fixture:ARQUIVO' ou 'fixture:sintetica'.
+    :param opcoes: Repassadas ao `ClienteFipe` nas fontes 'api' (ex:
+    `gateway`, `tamanho_pool`); ignoradas nas locais.
+    :return: Objeto com a interface do `ClienteFipe`.
+    :raises ErroFonte: Se a especificação não for reconhecida.
+    """
+    tipo, _, argumento = especificacao.partition(':')
+    if tipo not in TIPOS_FONTE:
+        raise ErroFonte(f"Fonte desconhecida: '{tipo}'. "
+                        f"Use {', '.join(TIPOS_FONTE)}.")
+    if tipo == 'api':
+        from cache import CacheRespostas
+        from cliente_fipe import ClienteFipe
+        if not argumento:
+            return ClienteFipe(cache=CacheRespostas(), **opcoes)
+        base = argumento.rstrip('/') + '/'
+        return ClienteFipe(base_url=base, base_url_v2=base + 'v2/',
+                           cache=CacheRespostas(), **opcoes)
+    if not argumento:
+        raise ErroFonte(f"Informe o arquivo: '{tipo}:ARQUIVO'.")
+    if tipo == 'snapshot':
+        from snapshot import SnapshotFipe
+        return SnapshotFipe(argumento)
+    if argumento == 'sintetica':
+        return FixtureFipe.sintetica()
+    return FixtureFipe.de_arquivo(argumento)
+
+
+def gravar_fixture(cache, caminho):
+    """
+    Grava em JSONL todas as respostas guardadas no cache (inclusive os
+    valores), no formato lido por `FixtureFipe.de_arquivo`.
+
+    :param cache: (CacheRespostas) Cache de onde as respostas são lidas.
+    :param caminho: (str) Arquivo de destino.
+    :return: (int) Quantidade de respostas gravadas.
+    """
+    gravadas = 0
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for url, dados in cache.entradas():
+            f.write(json.dumps({'url': url, 'dados': dados},
+                               ensure_ascii=False) + '\n')
+            gravadas += 1
+    return gravadas
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description='Grava fixtures da tabela FIPE para uso sem rede.')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    gravar = comandos.add_parser(
+        'gravar', help='grava as respostas do cache em disco')
+    gravar.add_argument('saida', help='arquivo JSONL de saída')
+    sintetica = comandos.add_parser(
+        'sintetica', help='grava um catálogo sintético')
+    sintetica.add_argument('saida', help='arquivo JSONL de saída')
+    sintetica.add_argument('--marcas', type=int, default=20)
+    sintetica.add_argument('--modelos', type=int, default=10)
+    sintetica.add_argument('--anos', type=int, default=5)
+    sintetica.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.comando == 'gravar':
+        from cache import CacheRespostas
+        cache = CacheRespostas()
+        try:
+            gravadas = gravar_fixture(cache, args.saida)
+        finally:
+            cache.fechar()
+    else:
+        fixture = FixtureFipe.sintetica(args.marcas, args.modelos, args.anos,
+                                        args.semente)
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            for caminho, dados in fixture.respostas.items():
+                f.write(json.dumps({'url': url_absoluta(caminho),
+                                    'dados': dados},
+                                   ensure_ascii=False) + '\n')
+        gravadas = len(fixture.respostas)
+    print(f'{gravadas} respostas gravadas em {args.saida}.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import tkinter as tk
+from tkinter import messagebox
+from lista_virtual import ListaVirtual
+from diagnostico import cronometrado, medir
+
+# Tempo (ms) sem digitar antes de refazer a busca.
+ATRASO_BUSCA_MS = 120
+
+
+class FrameBuscaCatalogo(tk.Frame):
+    """
+    Busca de modelos em todo o catálogo (todas as marcas e tipos). Ao
+    escolher um modelo, o assistente segue direto para a lista de anos.
+    """
+    @cronometrado('tela')
+    def __init__(self, parent, catalogo, command=None, agendador=None):
+        """
+        Construtor do FrameBuscaCatalogo.
+
+        :param parent: O widget pai.
+        :param catalogo: (CatalogoModelos) Índice do catálogo; é montado em
+        segundo plano na primeira vez.
+        :param command: (function) Chamada com o item escolhido (dict com
+        'tipo', 'marca' e 'modelo').
+        :param agendador: (Agendador, opcional) Monta o índice em segundo
+        plano. Sem ele, o índice é montado de forma síncrona.
+        """
+        super().__init__(parent)
+        self.grid(row=0, column=0, sticky='nsew')
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(1, weight=1)
+
+        self.catalogo = catalogo
+        self.command_callback = command
+        self.agendador = agendador
+        self._resultados = {}
+        self._id_filtro = None
+        self._tarefa = None
+
+        self.var_selecao = tk.StringVar()
+        self.var_entry_busca = tk.StringVar()
+        self.var_situacao = tk.StringVar()
+        tk.Label(self, text='Buscar Modelo (todas as marcas):').grid(
+            row=0, column=0, sticky='w', padx=5)
+        self.entry = tk.Entry(self, textvariable=self.var_entry_busca)
+        self.entry.grid(row=0, column=1, sticky='ew', padx=5, pady=5)
+        self.entry.bind('<KeyRelease>', self._agendar_filtro)
+        self.entry.focus_set()
+        self.lista = ListaVirtual(self, self.var_selecao,
+                                  command=self.ao_clicar)
+        self.lista.grid(row=1, column=0, columnspan=2, sticky='nsew')
+        tk.Label(self, textvariable=self.var_situacao, anchor='w').grid(
+            row=2, column=0, columnspan=2, sticky='ew', padx=5)
+
+        if catalogo.pronto:
+            self._ao_construir(catalogo)
+        else:
+            self._montar_indice()
+
+    def _montar_indice(self):
+        """Monta o índice do catálogo, em segundo plano se possível."""
+        if self.agendador:
+            self.lista.exibir_mensagem('Montando o índice do catálogo...')
+            self._tarefa = self.agendador.agendar(
+                self.catalogo.construir, ao_concluir=self._ao_construir,
+                ao_falhar=self._ao_falhar)
+        else:
+            self._ao_construir(self.catalogo.construir())
+
+    def _ao_construir(self, catalogo):
+        """Informa o tamanho do índice e aplica a busca já digitada."""
+        self._tarefa = None
+        if not len(catalogo):
+            self.lista.exibir_mensagem(
+                'Nenhum modelo conhecido ainda. Consulte algumas marcas (ou '
+                'importe um catálogo) e tente de novo.')
+            self.var_situacao.set('')
+            return
+        self.var_situacao.set(f'{len(catalogo)} modelos de '
+                              f'{catalogo.marcas} marcas no índice.')
+        self.filtrar_lista()
+
+    def _ao_falhar(self, erro):
+        self._tarefa = None
+        self.lista.exibir_mensagem('Não foi possível montar o índice.')
+        messagebox.showerror('Erro',
+                             f'Não foi possível ler o catálogo: {erro}')
+
+    @property
+    def reutilizavel(self):
+        """Sem modelos no índice, a tela é montada de novo na próxima vez
+        (o cache pode ter recebido marcas nesse meio tempo)."""
+        return self._tarefa is not None or len(self.catalogo) > 0
+
+    def _agendar_filtro(self, event=None):
+        """Adia a busca até o usuário parar de digitar por um instante."""
+        if self._id_filtro:
+            self.after_cancel(self._id_filtro)
+        self._id_filtro = self.after(ATRASO_BUSCA_MS, self.filtrar_lista)
+
+    def filtrar_lista(self):
+        """Busca o texto digitado no catálogo e exibe os modelos."""
+        self._id_filtro = None
+        if not self.catalogo.pronto:
+            # O índice pode ter sido liberado para economizar memória (ver
+            # memoria.py).
+            if self._tarefa is None:
+                self._montar_indice()
+            return
+        texto = self.var_entry_busca.get()
+        with medir('busca', 'catálogo', texto=texto):
+            resultados = self.catalogo.buscar(texto)
+        self._resultados = {item['codigo']: item for item in resultados}
+        self.lista.definir_itens(resultados)
+
+    def ao_clicar(self):
+        """Segue para a lista de anos do modelo escolhido."""
+        item = self._resultados.get(self.var_selecao.get())
+        if item and self.command_callback:
+            self.command_callback(item)
+
+    def destroy(self):
+        """Cancela a montagem do índice e a busca pendente."""
+        if self._tarefa:
+            self._tarefa.cancelar()
+            self._tarefa = None
+        if self._id_filtro:
+            self.after_cancel(self._id_filtro)
+            self._id_filtro = None
+        super().destroy()
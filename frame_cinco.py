@@ -1,6 +1,7 @@
 import tkinter as tk
-import requests
 from tkinter import messagebox
+from cliente_fipe import ClienteFipe
+from diagnostico import cronometrado
 
 fonte = 'Arial 12 bold'
 
@@ -9,8 +10,9 @@ class Frame(tk.Frame):
     Frame que exibe os detalhes completos de um veículo, seja a partir de uma
     consulta via API (URL) ou de dados já carregados (dicionário).
     """
+    @cronometrado('tela', 'Frame_Cinco.__init__')
     def __init__(self, parent, url=None, dados_veiculo=None, back_command=None, 
-                result_callback=None):
+                result_callback=None, cliente=None, agendador=None):
         """
         Construtor do Frame.
 
@@ -21,6 +23,10 @@ class Frame(tk.Frame):
         'Voltar' é clicado.
         :param result_callback: A função (callback) para passar o dicionário de
         dados do resultado.
+        :param cliente: (ClienteFipe, opcional) Cliente compartilhado da API.
+        Sem ele, o frame cria um cliente próprio, sem cache.
+        :param agendador: (Agendador, opcional) Executa a requisição em
+        segundo plano. Sem ele, a busca é feita de forma síncrona.
         """
         super().__init__(parent)
         self.grid(row=0, column=0, sticky='nsew')
@@ -28,6 +34,10 @@ class Frame(tk.Frame):
 
         self.back_command = back_command
         self.result_callback = result_callback
+        self.cliente = cliente or (ClienteFipe() if url else None)
+        self.agendador = agendador
+        self._tarefa = None
+        self._label_carregando = None
 
         if url:
             self._carregar_dados_da_url(url)
@@ -37,19 +47,53 @@ class Frame(tk.Frame):
             tk.Label(self, text="Nenhuma informação para exibir.").pack()
 
     def _carregar_dados_da_url(self, url):
-        """Busca os dados da API e chama a função de exibição."""
-        try:
-            response = requests.get(url)
-            response.raise_for_status()
-            dados_veiculo = response.json()
-            self._exibir_dados(dados_veiculo)
-        except requests.exceptions.RequestException as e:
-            messagebox.showerror("Erro de Rede", 
-                            f"Não foi possível buscar os dados do veículo: {e}")
-            # Mesmo com erro, mostra o botão de voltar
-            if self.back_command:
-                tk.Button(self, text='Voltar', command=self.back_command).grid(
-                    row=0, column=0, columnspan=2, pady=10)
+        """Busca os dados da API sem travar a interface e os exibe."""
+        self._label_carregando = tk.Label(self, text="Carregando...")
+        self._label_carregando.grid(row=0, column=0, columnspan=2, pady=10)
+        if self.agendador:
+            self._tarefa = self.agendador.agendar(
+                self._obter_dados, url,
+                ao_concluir=self._ao_receber_dados,
+                ao_falhar=self._ao_falhar_busca)
+        else:
+            import requests
+            try:
+                self._ao_receber_dados(self._obter_dados(url))
+            except requests.exceptions.RequestException as e:
+                self._ao_falhar_busca(e)
+
+    def _obter_dados(self, url):
+        """Obtém o JSON da URL pelo cliente. Roda em segundo plano."""
+        return self.cliente.obter_json(url)
+
+    def _remover_carregando(self):
+        """Remove o aviso de carregamento da tela."""
+        self._tarefa = None
+        if self._label_carregando:
+            self._label_carregando.destroy()
+            self._label_carregando = None
+
+    def _ao_receber_dados(self, dados_veiculo):
+        """Exibe os dados recebidos da API."""
+        self._remover_carregando()
+        self._exibir_dados(dados_veiculo)
+
+    def _ao_falhar_busca(self, erro):
+        """Exibe o erro da requisição ao usuário."""
+        self._remover_carregando()
+        messagebox.showerror("Erro de Rede", 
+                        f"Não foi possível buscar os dados do veículo: {erro}")
+        # Mesmo com erro, mostra o botão de voltar
+        if self.back_command:
+            tk.Button(self, text='Voltar', command=self.back_command).grid(
+                row=0, column=0, columnspan=2, pady=10)
+
+    def destroy(self):
+        """Cancela a busca pendente antes de destruir o frame."""
+        if self._tarefa:
+            self._tarefa.cancelar()
+            self._tarefa = None
+        super().destroy()
 
     def _exibir_dados(self, dados_veiculo):
         """Cria os labels na tela para exibir os dados do veículo."""
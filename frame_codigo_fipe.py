@@ -0,0 +1,107 @@
+import tkinter as tk
+from lista_virtual import ListaVirtual
+from codigos_fipe import normalizar_codigo
+from diagnostico import cronometrado
+
+
+class FrameCodigoFipe(tk.Frame):
+    """
+    Consulta pelo Código FIPE: lista os anos-modelo do código digitado e,
+    ao escolher um deles, segue direto para o valor do veículo.
+    """
+    @cronometrado('tela')
+    def __init__(self, parent, localizador, command=None, indice=None,
+                 cliente=None, agendador=None):
+        """
+        Construtor do FrameCodigoFipe.
+
+        :param parent: O widget pai.
+        :param localizador: Objeto com `localizar_codigo_fipe` (o
+        IndiceCodigosFipe ou um SnapshotFipe).
+        :param command: (function) Chamada com o veículo escolhido (dict com
+        'tipo', 'marca', 'modelo' e 'ano').
+        :param indice: (IndiceCodigosFipe, opcional) Completado, em segundo
+        plano, com os valores já guardados no cache do `cliente`.
+        :param cliente: (ClienteFipe, opcional) Dono do cache a indexar.
+        :param agendador: (Agendador, opcional) Executa a indexação do
+        cache em segundo plano.
+        """
+        super().__init__(parent)
+        self.grid(row=0, column=0, sticky='nsew')
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(1, weight=1)
+
+        self.localizador = localizador
+        self.command_callback = command
+        self._veiculos = {}
+        self._tarefa = None
+
+        self.var_selecao = tk.StringVar()
+        self.var_codigo = tk.StringVar()
+        self.var_situacao = tk.StringVar()
+        tk.Label(self, text='Código FIPE:').grid(row=0, column=0, sticky='w',
+                                                 padx=5)
+        entry = tk.Entry(self, textvariable=self.var_codigo)
+        entry.grid(row=0, column=1, sticky='ew', padx=5, pady=5)
+        entry.bind('<Return>', self.buscar)
+        entry.focus_set()
+        tk.Button(self, text='Buscar', command=self.buscar).grid(
+            row=0, column=2, padx=5)
+        self.lista = ListaVirtual(self, self.var_selecao,
+                                  command=self.ao_clicar)
+        self.lista.grid(row=1, column=0, columnspan=3, sticky='nsew')
+        tk.Label(self, textvariable=self.var_situacao, anchor='w').grid(
+            row=2, column=0, columnspan=3, sticky='ew', padx=5)
+
+        self.lista.exibir_mensagem('Digite um Código FIPE (ex: 005340-6).')
+        if indice is not None and agendador and getattr(cliente, 'cache',
+                                                         None) is not None:
+            self.var_situacao.set('Indexando os valores do cache...')
+            self._tarefa = agendador.agendar(
+                indice.importar_cache, cliente,
+                ao_concluir=lambda _: self._ao_indexar(indice),
+                ao_falhar=lambda _: self._ao_indexar(indice))
+        elif indice is not None:
+            self._ao_indexar(indice)
+
+    def _ao_indexar(self, indice):
+        self._tarefa = None
+        self.var_situacao.set(f'{len(indice)} Códigos FIPE conhecidos.')
+
+    def buscar(self, event=None):
+        """Lista os anos-modelo do código digitado."""
+        codigo = normalizar_codigo(self.var_codigo.get())
+        if not codigo:
+            return
+        veiculos = self.localizador.localizar_codigo_fipe(codigo)
+        if not veiculos:
+            self.lista.exibir_mensagem(
+                f'Código {codigo} não encontrado. O índice aprende cada '
+                'código consultado pelo assistente ou pelo lote.')
+            return
+        self._veiculos = {}
+        itens = []
+        for veiculo in veiculos:
+            chave = '/'.join((veiculo['tipo'], veiculo['marca'],
+                              veiculo['modelo'], veiculo['ano']))
+            self._veiculos[chave] = veiculo
+            nome = ' — '.join(str(parte) for parte in (
+                veiculo.get('nome_modelo'), veiculo.get('nome_marca'),
+                veiculo.get('ano_modelo'), veiculo.get('combustivel'))
+                if parte)
+            itens.append({'nome': nome or chave, 'codigo': chave})
+        self.lista.definir_itens(itens)
+
+    def ao_clicar(self):
+        """Segue para o valor do ano-modelo escolhido."""
+        veiculo = self._veiculos.get(self.var_selecao.get())
+        if veiculo and self.command_callback:
+            self.command_callback(veiculo)
+
+    def destroy(self):
+        """Cancela o aviso da indexação pendente antes de destruir o frame."""
+        if self._tarefa:
+            self._tarefa.cancelar()
+            self._tarefa = None
+        super().destroy()
+
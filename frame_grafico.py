@@ -1,115 +1,412 @@
+from datetime import date
 import tkinter as tk
+from tkinter import ttk
 import matplotlib
 from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg,
+                                               NavigationToolbar2Tk)
+import numpy as np
+from colecao import ColecaoVeiculos
+from precos import formatar_valor
+from diagnostico import cronometrado
 
 # Garante que o backend do Matplotlib seja compatível com o Tkinter
 matplotlib.use("TkAgg")
 
+# Acima desta quantidade de veículos o gráfico abre agrupado por marca, já
+# que uma barra por veículo deixa de ser legível.
+LIMITE_INDIVIDUAL = 60
+# Máximo de barras desenhadas por página, em qualquer modo.
+BARRAS_POR_PAGINA = 25
+# Número de faixas de preço no modo "Distribuição".
+FAIXAS_DISTRIBUICAO = 30
+# Veículos (curvas) por página no modo "Histórico".
+CURVAS_POR_PAGINA = 8
+
+# Modos de exibição: texto do seletor -> campo de agrupamento (ou modo).
+MODOS = {
+    'Veículos': None,
+    'Por marca': 'Marca',
+    'Por ano': 'AnoModelo',
+    'Por combustível': 'Combustivel',
+    'Distribuição': 'distribuicao',
+    'Histórico': 'historico',
+}
+
 
 class FrameGrafico(tk.Frame):
     """
     Um Frame que exibe um gráfico de barras comparando os valores de veículos
     e permite adicionar mais veículos ao gráfico a partir de arquivos.
+
+    Para coleções grandes, o gráfico pode agrupar os veículos (mediana por
+    marca, ano ou combustível) ou mostrar a distribuição dos preços, e as
+    barras são paginadas. Veículos acrescentados depois são incorporados sem
+    redesenhar a figura inteira sempre que possível.
     """
+    @cronometrado('tela')
     def __init__(self, parent, dados, add_command=None, back_command=None,
-                 save_graphic=None):
+                 save_graphic=None, historico=None):
         """
         Construtor do FrameGrafico.
 
         :param parent: O widget pai.
-        :param dados: (list) Uma lista de dicionários, onde cada dicionário
-                    representa um veículo com suas informações.
+        :param dados: (ColecaoVeiculos) Os veículos a comparar. Uma lista de
+                    dicionários no formato da API também é aceita.
         :param add_command: (function, opcional) Callback para o botão
                             'Adicionar Veículo'.
         :param back_command: (function, opcional) Callback para o botão
                             'Voltar'.
         :para save_command: (function, opcional) Callback para o botão
                             'Salvar Gráfico'.
+        :param historico: (HistoricoPrecos, opcional) Séries de preços
+                        usadas no modo 'Histórico'.
         """
         super().__init__(parent)
         self.grid(row=0, column=0, sticky='nsew')
         parent.grid_rowconfigure(0, weight=1)
         parent.grid_columnconfigure(0, weight=1)
 
+        if not isinstance(dados, ColecaoVeiculos):
+            dados = ColecaoVeiculos(dados)
         self.dados = dados
         self.add_command = add_command
         self.back_command = back_command
         self.save_graphic= save_graphic
+        self.historico = historico
+
+        # Valores de `dados` na última atualização, lidos direto da coluna
+        # já convertida da coleção.
+        self._valores = np.empty(0)
+        self._grupos = {}
+        # Modo 'Histórico': primeiro veículo de cada (CodigoFipe, AnoModelo)
+        # e quantos veículos de `dados` já foram vistos, para que cada
+        # desenho só percorra os acrescentados desde o anterior.
+        self._primeiros = {}
+        self._vistos_historico = 0
+        # Barras e rótulos desenhados na página atual, reaproveitados nas
+        # atualizações incrementais.
+        self._barras = None
+        self._textos = []
+        self._chaves_pagina = []
+        self.pagina = 0
 
         # Configura o grid do frame para o gráfico e os botões
-        self.rowconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
         self.columnconfigure(0, weight=1)
 
+        # --- Controles de Exibição ---
+        controles = tk.Frame(self)
+        controles.grid(row=0, column=0, columnspan=2, sticky='ew', padx=10)
+        tk.Label(controles, text="Exibir:").pack(side=tk.LEFT)
+        modo_inicial = ('Por marca' if len(self.dados) > LIMITE_INDIVIDUAL
+                        else 'Veículos')
+        self.var_modo = tk.StringVar(value=modo_inicial)
+        modos = [m for m in MODOS if historico or MODOS[m] != 'historico']
+        seletor = ttk.Combobox(controles, textvariable=self.var_modo,
+                               values=modos, state='readonly', width=16)
+        seletor.pack(side=tk.LEFT, padx=5)
+        seletor.bind('<<ComboboxSelected>>', lambda e: self._mudar_pagina(0))
+        self.var_ordenar = tk.BooleanVar(value=False)
+        tk.Checkbutton(controles, text="Ordenar por valor",
+                       variable=self.var_ordenar,
+                       command=lambda: self._mudar_pagina(0)).pack(
+                           side=tk.LEFT, padx=5)
+        tk.Button(controles, text="▶",
+                  command=lambda: self._mudar_pagina(self.pagina + 1)).pack(
+                      side=tk.RIGHT)
+        self.label_pagina = tk.Label(controles, text="")
+        self.label_pagina.pack(side=tk.RIGHT, padx=5)
+        tk.Button(controles, text="◀",
+                  command=lambda: self._mudar_pagina(self.pagina - 1)).pack(
+                      side=tk.RIGHT)
+
         # --- Criação do Gráfico Matplotlib ---
         self.figura = Figure(figsize=(10, 5), dpi=100)
         self.ax = self.figura.add_subplot(111)
+        # Margens fixas no lugar de `tight_layout` a cada redesenho.
+        self.figura.subplots_adjust(left=0.1, right=0.98, top=0.92,
+                                    bottom=0.28)
 
         # --- Integração do Gráfico com Tkinter ---
         self.canvas = FigureCanvasTkAgg(self.figura, self)
-        self.canvas.get_tk_widget().grid(row=0, column=0, columnspan=2, 
+        # O desenho de fato acontece depois do `draw_idle`; medir o `draw`
+        # separa o tempo do Matplotlib do tempo de montar as barras.
+        self.canvas.draw = cronometrado(
+            'desenho', 'FrameGrafico.canvas.draw')(self.canvas.draw)
+        self.canvas.get_tk_widget().grid(row=1, column=0, columnspan=2,
                                         sticky='nsew', padx=10, pady=10)
+        # Barra de ferramentas do Matplotlib, com zoom e arraste.
+        barra = NavigationToolbar2Tk(self.canvas, self, pack_toolbar=False)
+        barra.grid(row=2, column=0, columnspan=2, sticky='ew', padx=10)
 
         # --- Botões de Ação ---
         botoes_frame = tk.Frame(self)
-        botoes_frame.grid(row=1, column=0, columnspan=2, pady=10)
+        botoes_frame.grid(row=3, column=0, columnspan=2, pady=10)
 
         if self.add_command:
-            tk.Button(botoes_frame, text="Adicionar Veículo ao Gráfico", 
+            tk.Button(botoes_frame, text="Adicionar Veículo ao Gráfico",
                     command=self.add_command).pack(side=tk.LEFT, padx=5)
-        
+
         if self.back_command:
-            tk.Button(botoes_frame, text="Voltar", 
+            tk.Button(botoes_frame, text="Voltar",
                     command=self.back_command).pack(side=tk.LEFT, padx=5)
 
         if self.save_graphic:
-            tk.Button(botoes_frame, text="Salvar Gráfico", 
+            tk.Button(botoes_frame, text="Salvar Gráfico",
                     command=self.save_graphic).pack(side=tk.LEFT, padx=5)
 
         # Atualiza o gráfico com os dados atuais
         self.atualizar_grafico()
 
+    # --- Dados ---
+    def _sincronizar_dados(self):
+        """
+        Atualiza os valores com os veículos acrescentados a `dados` desde a
+        última chamada.
+
+        :return: (int) Quantidade de veículos novos.
+        """
+        novos = len(self.dados) - len(self._valores)
+        if novos:
+            # Valores em formato inesperado já vêm como NaN e ficam de fora.
+            self._valores = self.dados.valores()
+        return novos
+
+    def _itens_do_modo(self):
+        """
+        Calcula os itens (barras) do modo atual, na ordem de exibição.
+
+        :return: (tuple) `(chaves, alturas)`: posições dos veículos ou nomes
+        dos grupos, e a altura de cada barra.
+        """
+        campo = MODOS[self.var_modo.get()]
+        if campo is None:
+            indices = np.flatnonzero(~np.isnan(self._valores))
+            if self.var_ordenar.get():
+                indices = self.dados.ordenar('Valor', decrescente=True,
+                                             indices=indices)
+            return list(indices), self._valores[indices]
+
+        self._grupos = self.dados.estatisticas_por(campo)
+        chaves = list(self._grupos)
+        if self.var_ordenar.get():
+            chaves.sort(key=lambda g: -self._grupos[g]['mediana'])
+        return chaves, np.array([self._grupos[g]['mediana'] for g in chaves])
+
+    def _rotulos(self, chaves):
+        """
+        Textos do eixo X para os veículos (posições) ou grupos (nomes) de
+        uma página. Os veículos são remontados de uma vez: os que foram
+        descarregados para o disco (ver memoria.py) voltam em uma leitura.
+        """
+        if MODOS[self.var_modo.get()] is None:
+            # Combina Marca, Modelo e Ano do veículo.
+            return [f"{d.get('Marca', 'N/A')} - {d.get('Modelo', 'N/A')}\n"
+                    f"({d.get('AnoModelo', 'N/A')})"
+                    for d in self.dados.registros(chaves)]
+        return [f"{chave}\n(n={self._grupos[chave]['contagem']})"
+                for chave in chaves]
+
+    # --- Desenho ---
+    def _mudar_pagina(self, pagina):
+        """Exibe outra página de barras (ou a primeira, ao mudar de modo)."""
+        self.pagina = pagina
+        self.atualizar_grafico()
+
+    @cronometrado('desenho')
     def atualizar_grafico(self):
         """Limpa e redesenha o gráfico de barras com os dados atuais."""
+        self._sincronizar_dados()
         # Limpa o eixo para o redesenho, evitando sobreposição de gráficos.
         self.ax.clear()
+        self._barras = None
+        self._textos = []
+        self._chaves_pagina = []
 
         # Se não houver dados, exibe uma mensagem e interrompe.
         if not self.dados:
             self.ax.set_title("Nenhum dado para exibir")
-            self.canvas.draw()
+            self.label_pagina.config(text="")
+            self.canvas.draw_idle()
             return
 
-        # --- Preparação dos Dados para o Gráfico ---
-        # Cria os rótulos para o eixo X, combinando Marca, Modelo e Ano.
-        modelos = [f"{d.get('Marca', 'N/A')} - {d.get('Modelo', 'N/A'
-                )}\n({d.get('AnoModelo', 'N/A')})" for d in self.dados]
-        # Extrai os valores como strings formatadas (ex: "R$ 15.342,00").
-        valores_str = [d.get('Valor', 'R$ 0') for d in self.dados]
-        
-        # Converte os valores de string para float para que possam ser plotados.
-        valores_float = []
-        for v_str in valores_str:
-            # Limpa a string, removendo 'R$ ', '.' (milhar) e 
-            # trocando ',' por '.' (decimal).
-            valor_limpo = v_str.replace('R$ ', '').replace('.', ''
-                                                        ).replace(',', '.')
-            valores_float.append(float(valor_limpo))
+        if MODOS[self.var_modo.get()] == 'distribuicao':
+            self._desenhar_distribuicao()
+        elif MODOS[self.var_modo.get()] == 'historico':
+            self._desenhar_historico()
+        else:
+            self._desenhar_barras()
+        # Redesenha o canvas quando o Tkinter estiver ocioso.
+        self.canvas.draw_idle()
 
+    def _paginar(self, quantidade, por_pagina):
+        """
+        Mantém a página atual dentro do total de páginas e atualiza o rótulo
+        da paginação.
+
+        :param quantidade: (int) Itens (barras ou curvas) no gráfico.
+        :param por_pagina: (int) Itens exibidos em cada página.
+        """
+        total_paginas = max(1, -(-quantidade // por_pagina))
+        self.pagina = min(max(self.pagina, 0), total_paginas - 1)
+        self.label_pagina.config(
+            text=f"Página {self.pagina + 1} de {total_paginas}")
+
+    def _desenhar_barras(self):
+        """Desenha a página atual de barras (veículos ou grupos)."""
+        chaves, alturas = self._itens_do_modo()
+        self._paginar(len(chaves), BARRAS_POR_PAGINA)
+        inicio = self.pagina * BARRAS_POR_PAGINA
+        fim = inicio + BARRAS_POR_PAGINA
+
+        self._chaves_pagina = chaves[inicio:fim]
+        posicoes = np.arange(len(self._chaves_pagina))
         # --- Desenho do Gráfico ---
         # Cria as barras do gráfico.
-        self.ax.bar(modelos, valores_float)
+        self._barras = self.ax.bar(posicoes, alturas[inicio:fim])
+        self.ax.set_xticks(posicoes, self._rotulos(self._chaves_pagina),
+                           rotation=15, ha='right')
         self.ax.set_ylabel('Valor (R$)')
-        self.ax.set_title('Comparação de Preços de Veículos (Tabela FIPE)')
+        if MODOS[self.var_modo.get()] is None:
+            self.ax.set_title('Comparação de Preços de Veículos (Tabela FIPE)')
+        else:
+            self.ax.set_title(f'Mediana dos Preços {self.var_modo.get()} '
+                              '(Tabela FIPE)')
 
         # Adiciona rótulos de valor no topo das barras
-        for i, v_float in enumerate(valores_float):
-            self.ax.text(i, v_float, valores_str[i], ha='center', va='bottom')
-
-        # Ajusta a rotação dos rótulos do eixo X para evitar sobreposição.
-        self.figura.autofmt_xdate(rotation=15, ha='right')
-        # Garante que todos os elementos do gráfico (títulos, rótulos) caibam 
-        # na figura.
-        self.figura.tight_layout()
-        # Redesenha o canvas do Tkinter com o gráfico atualizado.
-        self.canvas.draw()
\ No newline at end of file
+        self._textos = [
+            self.ax.text(i, altura, formatar_valor(altura), ha='center',
+                         va='bottom')
+            for i, altura in enumerate(alturas[inicio:fim])]
+
+    def _desenhar_distribuicao(self):
+        """Desenha o histograma dos preços de todos os veículos."""
+        validos = self._valores[~np.isnan(self._valores)]
+        self.label_pagina.config(text=f"{validos.size} veículos")
+        self.ax.hist(validos, bins=FAIXAS_DISTRIBUICAO)
+        self.ax.set_xlabel('Valor (R$)')
+        self.ax.set_ylabel('Quantidade de veículos')
+        self.ax.set_title('Distribuição dos Preços (Tabela FIPE)')
+
+    def _desenhar_historico(self):
+        """
+        Desenha a evolução do preço de cada veículo ao longo dos meses de
+        referência guardados no histórico, com a variação no período.
+        """
+        primeiros = self._veiculos_historico()
+        chaves = list(primeiros)
+        self._paginar(len(chaves), CURVAS_POR_PAGINA)
+        inicio = self.pagina * CURVAS_POR_PAGINA
+        series = self.historico.series(chaves[inicio:inicio +
+                                              CURVAS_POR_PAGINA])
+
+        for chave, serie in zip(chaves[inicio:], series.values()):
+            if not serie:
+                continue
+            d = self.dados.registro(primeiros[chave])
+            meses = [date(mes // 100, mes % 100, 1) for mes, _ in serie]
+            valores = [valor for _, valor in serie]
+            variacao = (valores[-1] / valores[0] - 1) * 100 if valores[0] else 0
+            self.ax.plot(meses, valores, marker='o',
+                         label=f"{d.get('Modelo', 'N/A')} "
+                               f"({d.get('AnoModelo', 'N/A')}): "
+                               f"{variacao:+.1f}%")
+        self.ax.set_ylabel('Valor (R$)')
+        self.ax.set_title('Evolução dos Preços (Tabela FIPE)')
+        self.ax.tick_params(axis='x', rotation=15)
+        if self.ax.lines:
+            self.ax.legend(fontsize='small')
+        else:
+            self.ax.set_title('Nenhum histórico guardado para estes veículos')
+
+    def _veiculos_historico(self):
+        """
+        Um veículo por (CodigoFipe, AnoModelo), na ordem em que aparece,
+        atualizado só com os veículos novos de `dados`.
+
+        :return: (dict) {(CodigoFipe, AnoModelo): índice do primeiro}.
+        """
+        if len(self.dados) < self._vistos_historico:
+            # A coleção foi limpa: recomeça.
+            self._primeiros = {}
+            self._vistos_historico = 0
+        novos = range(self._vistos_historico, len(self.dados))
+        for indice, d in zip(novos, self.dados.registros(novos)):
+            if d.get('CodigoFipe') is not None:
+                self._primeiros.setdefault(
+                    (d['CodigoFipe'], d.get('AnoModelo')), indice)
+        self._vistos_historico = len(self.dados)
+        return self._primeiros
+
+    @cronometrado('desenho')
+    def adicionar_veiculos(self):
+        """
+        Incorpora ao gráfico os veículos acrescentados a `dados` desde o
+        último desenho, alterando apenas as barras afetadas quando possível.
+        """
+        quantidade_anterior = len(self._valores)
+        if not self._sincronizar_dados() or self._barras is None:
+            self.atualizar_grafico()
+            return
+
+        chaves, alturas = self._itens_do_modo()
+        # Os veículos novos podem abrir páginas, mesmo sem redesenhar tudo.
+        self._paginar(len(chaves), BARRAS_POR_PAGINA)
+        inicio = self.pagina * BARRAS_POR_PAGINA
+        chaves_pagina = chaves[inicio:inicio + BARRAS_POR_PAGINA]
+
+        if chaves_pagina == self._chaves_pagina:
+            # Mesmas barras na página (ex: novos veículos de marcas já
+            # exibidas): só as alturas e os rótulos mudam.
+            for barra, texto, altura in zip(self._barras, self._textos,
+                                            alturas[inicio:]):
+                barra.set_height(altura)
+                texto.set_y(altura)
+                texto.set_text(formatar_valor(altura))
+            self.ax.set_xticks(np.arange(len(chaves_pagina)),
+                               self._rotulos(chaves_pagina),
+                               rotation=15, ha='right')
+            self.ax.relim()
+            self.ax.autoscale_view()
+            self.canvas.draw_idle()
+        elif (MODOS[self.var_modo.get()] is None
+              and not self.var_ordenar.get()
+              and chaves_pagina[:len(self._chaves_pagina)] ==
+              self._chaves_pagina
+              and len(self._chaves_pagina) > 0
+              and self._chaves_pagina[-1] == quantidade_anterior - 1):
+            # Veículos novos no fim da última página: desenha só as barras
+            # que faltam.
+            self._acrescentar_barras(chaves_pagina, alturas[inicio:])
+        else:
+            self.atualizar_grafico()
+
+    def _acrescentar_barras(self, chaves_pagina, alturas):
+        """Desenha, na página atual, as barras além das já existentes."""
+        existentes = len(self._chaves_pagina)
+        novas = range(existentes, len(chaves_pagina))
+        barras = self.ax.bar(list(novas),
+                             alturas[existentes:len(chaves_pagina)],
+                             color=self._barras[0].get_facecolor())
+        self._barras = list(self._barras) + list(barras)
+        for i in novas:
+            self._textos.append(self.ax.text(i, alturas[i],
+                                             formatar_valor(alturas[i]),
+                                             ha='center', va='bottom'))
+        self._chaves_pagina = chaves_pagina
+        posicoes = np.arange(len(chaves_pagina))
+        self.ax.set_xticks(posicoes, self._rotulos(chaves_pagina),
+                           rotation=15, ha='right')
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.canvas.draw_idle()
+
+    def destroy(self):
+        """
+        Libera a figura ao sair do gráfico: a figura e o canvas se
+        referenciam em ciclo e, sem isso, só seriam liberados na próxima
+        passada do coletor de lixo.
+        """
+        super().destroy()
+        self.figura.clear()
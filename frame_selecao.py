@@ -1,14 +1,27 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import requests
+from tkinter import messagebox
+from cliente_fipe import ClienteFipe
+from consulta import extrair_itens
+from lista_virtual import ListaVirtual
+from indice_busca import IndiceBusca
+from diagnostico import cronometrado
+
+# Tempo (ms) sem digitar antes de aplicar o filtro, para não refazer a busca
+# a cada tecla de uma palavra digitada rapidamente.
+ATRASO_BUSCA_MS = 120
+# Quantas opções populares antecipar assim que a lista é carregada.
+QUANTIDADE_PREFETCH = 3
 
 class FrameSelecao(tk.Frame):
     """
     Um frame genérico para exibir uma lista de opções selecionáveis (Radiobuttons)
     com funcionalidade de busca e carregamento de dados via API ou lista estática.
     """
+    @cronometrado('tela')
     def __init__(self, parent, command=None, url=None, dados_estaticos=None, 
-                label_busca="Buscar:", chave_json=None):
+                label_busca="Buscar:", chave_json=None, cliente=None,
+                agendador=None, prefetcher=None, url_proximo_nivel=None,
+                ao_comparar=None):
         """
         Construtor do Frame de Seleção.
 
@@ -23,6 +36,16 @@ class FrameSelecao(tk.Frame):
         de busca.
         :param chave_json: (str, opcional) A chave a ser acessada no JSON 
         de resposta da API se a lista de itens estiver aninhada (ex: 'modelos').
+        :param cliente: (ClienteFipe, opcional) Cliente compartilhado da API.
+        Sem ele, o frame cria um cliente próprio, sem cache.
+        :param agendador: (Agendador, opcional) Executa a requisição em
+        segundo plano. Sem ele, a busca é feita de forma síncrona.
+        :param prefetcher: (Prefetcher, opcional) Antecipa a busca do próximo
+        nível do assistente para as opções mais prováveis.
+        :param url_proximo_nivel: (function, opcional) Recebe o código de uma
+        opção e retorna a URL que será buscada se ela for escolhida.
+        :param ao_comparar: (function, opcional) Exibe o botão 'Comparar...',
+        que chama a função com os itens exibidos (já filtrados pela busca).
         """
         super().__init__(parent)
         self.grid(row=0, column=0, sticky='nsew')
@@ -32,13 +55,29 @@ class FrameSelecao(tk.Frame):
         self.command_callback = command
         self.url = url
         self.chave_json = chave_json
+        self.cliente = cliente or (ClienteFipe() if url else None)
+        self.agendador = agendador
+        self.prefetcher = prefetcher
+        self.url_proximo_nivel = url_proximo_nivel
         self.all_items = []
+        # Índice de busca sobre `all_items`, criado quando os dados chegam.
+        self.indice = None
+        self._id_filtro = None
+        # Busca em andamento, cancelada se o frame for destruído antes do fim.
+        self._tarefa = None
+        # Se a tela pode ser reexibida pelo pool de telas; deixa de poder se
+        # a busca falhar, para que ela seja montada (e buscada) de novo.
+        self.reutilizavel = True
 
         # `var_selecao` é a variável de controle do Tkinter para os Radiobuttons.
         self.var_selecao = tk.StringVar()
         self.var_selecao.set("")
 
         self._criar_widgets(label_busca)
+        if ao_comparar:
+            tk.Button(self, text='Comparar...',
+                      command=lambda: ao_comparar(self.lista.itens)).grid(
+                row=0, column=2, padx=5)
 
         # Decide a fonte dos dados: API ou uma lista estática.
         if self.url:
@@ -48,91 +87,139 @@ class FrameSelecao(tk.Frame):
             # {'nome': ..., 'codigo': ...}
             self.all_items = [{'nome': item.capitalize(), 'codigo': item} 
                             for item in dados_estaticos]
+            self.indice = IndiceBusca(self.all_items)
             self.atualizar_lista_radio(self.all_items)
+            self._antecipar_populares()
 
     def _criar_widgets(self, label_busca):
-        """Cria os widgets base do frame (busca, canvas, scrollbar)."""
+        """Cria os widgets base do frame (busca e lista de opções)."""
         self.var_entry_busca = tk.StringVar()
         tk.Label(self, text=label_busca).grid(row=0, column=0, sticky='w', padx=5)
         entry = tk.Entry(self, textvariable=self.var_entry_busca)
         entry.grid(row=0, column=1, sticky='ew', padx=5, pady=5)
-        # O evento <KeyRelease> chama o filtro toda vez que uma tecla é solta.
-        entry.bind('<KeyRelease>', self.filtrar_lista)
-
-        # --- Canvas e Scrollbar ---
-        self.canvas = tk.Canvas(self)
-        self.scrollbar = ttk.Scrollbar(self, orient='vertical', 
-                                    command=self.canvas.yview)
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-
-        self.scrollable_frame = tk.Frame(self.canvas)
-        # Adiciona o frame rolável dentro do canvas.
-        self.canvas.create_window((0, 0), window=self.scrollable_frame,
-                                anchor='nw')
-        # Configura o canvas para atualizar a região de rolagem quando o 
-        # tamanho do frame interno mudar.
-        self.scrollable_frame.bind('<Configure>', lambda e: 
-            self.canvas.configure(scrollregion=self.canvas.bbox('all')))
-
-        self.canvas.grid(row=1, column=0, columnspan=2, sticky='nsew')
-        self.scrollbar.grid(row=1, column=2, sticky='ns')
+        # O evento <KeyRelease> agenda o filtro toda vez que uma tecla é solta.
+        entry.bind('<KeyRelease>', self._agendar_filtro)
+
+        # --- Lista de opções ---
+        # A ListaVirtual só cria Radiobuttons para as linhas visíveis, então
+        # listas com milhares de modelos abrem e rolam sem travar.
+        self.lista = ListaVirtual(self, self.var_selecao,
+                                  command=self.ao_clicar,
+                                  ao_destacar=self._antecipar_item)
+        self.lista.grid(row=1, column=0, columnspan=3, sticky='nsew')
 
     def _carregar_dados_api(self):
-        """Busca os dados da API e popula a lista de itens."""
-        try:
-            response = requests.get(self.url) #type:ignore
-            response.raise_for_status()
-            dados = response.json()
-
-            # Se `chave_json` for fornecida (ex: 'modelos'), busca a lista
-            # dentro do JSON.
-            if self.chave_json:
-                self.all_items = dados.get(self.chave_json, [])
-            # Caso contrário, a resposta da API já é a lista.
-            else:
-                self.all_items = dados
-            
-            self.atualizar_lista_radio(self.all_items)
-        except requests.exceptions.RequestException as e:
-            messagebox.showerror(
-                "Erro de Rede", f"Não foi possível buscar os dados: {e}")
+        """Busca os dados da API sem travar a interface e popula a lista."""
+        self._exibir_mensagem("Carregando...")
+        if self.agendador:
+            self._tarefa = self.agendador.agendar(
+                self._obter_dados,
+                ao_concluir=self._ao_receber_dados,
+                ao_falhar=self._ao_falhar_busca)
+        else:
+            import requests
+            try:
+                self._ao_receber_dados(self._obter_dados())
+            except requests.exceptions.RequestException as e:
+                self._ao_falhar_busca(e)
+
+    def _obter_dados(self):
+        """
+        Obtém o JSON da URL pelo cliente e monta o índice de busca.
+        Roda em segundo plano.
+
+        :return: (tuple) `(itens, indice)`.
+        """
+        # Se `chave_json` for fornecida (ex: 'modelos'), a lista está
+        # dentro do JSON; caso contrário, a resposta da API já é a lista.
+        itens = extrair_itens(self.cliente.obter_json(self.url),
+                              self.chave_json)
+        return itens, IndiceBusca(itens)
+
+    def _ao_receber_dados(self, resultado):
+        """Popula a lista com os itens recebidos da API."""
+        self._tarefa = None
+        self.all_items, self.indice = resultado
+        self._antecipar_populares()
+        # Aplica o filtro que o usuário já tenha digitado durante o carregamento.
+        self.filtrar_lista()
+
+    def _ao_falhar_busca(self, erro):
+        """Exibe o erro da requisição ao usuário."""
+        self._tarefa = None
+        self.reutilizavel = False
+        self._exibir_mensagem("Não foi possível carregar os dados.")
+        messagebox.showerror(
+            "Erro de Rede", f"Não foi possível buscar os dados: {erro}")
+
+    def _exibir_mensagem(self, texto):
+        """Substitui a lista por uma mensagem (ex: estado de carregamento)."""
+        self.lista.exibir_mensagem(texto)
+
+    def destroy(self):
+        """Cancela a busca pendente antes de destruir o frame."""
+        if self._tarefa:
+            self._tarefa.cancelar()
+            self._tarefa = None
+        if self._id_filtro:
+            self.after_cancel(self._id_filtro)
+            self._id_filtro = None
+        super().destroy()
+
+    def _agendar_filtro(self, event=None):
+        """Adia o filtro até o usuário parar de digitar por um instante."""
+        if self._id_filtro:
+            self.after_cancel(self._id_filtro)
+        self._id_filtro = self.after(ATRASO_BUSCA_MS, self.filtrar_lista)
 
     def filtrar_lista(self, event=None):
-        """Filtra a lista de itens com base no texto da busca."""
-        texto_busca = self.var_entry_busca.get().lower()
-        # Se a busca estiver vazia, mostra todos os itens.
-        if not texto_busca:
-            items_filtrados = self.all_items
-        else:
-            # Filtra a lista `all_items` mantendo apenas os que contêm o texto 
-            # da busca.
-            items_filtrados = [item for item in self.all_items if 
-                            texto_busca in item['nome'].lower()]
-        
+        """
+        Filtra a lista de itens com base no texto da busca. Aceita várias
+        palavras em qualquer ordem e ignora acentos (ex: "gol 1.0 flex").
+        """
+        self._id_filtro = None
+        # Os dados ainda estão sendo carregados.
+        if self.indice is None:
+            return
+        items_filtrados = self.indice.buscar(self.var_entry_busca.get())
         self.atualizar_lista_radio(items_filtrados)
+        # Se a busca chegou a uma única opção, ela é quase certamente a
+        # próxima escolha.
+        if len(items_filtrados) == 1:
+            self._antecipar_item(items_filtrados[0])
 
     def atualizar_lista_radio(self, lista_items):
-        """Limpa e recria os Radiobuttons na tela."""
-        # Destrói todos os widgets antigos para evitar sobreposição.
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-        
-        for item in lista_items:
-            # Cria um Radiobutton para cada item na lista fornecida.
-            tk.Radiobutton(
-                self.scrollable_frame, 
-                text=item['nome'], 
-                value=item['codigo'],
-                variable=self.var_selecao,
-                command=self.ao_clicar
-            ).pack(anchor='w', padx=10, pady=2)
+        """Exibe os itens fornecidos na lista de Radiobuttons."""
+        self.lista.definir_itens(lista_items)
 
     def ao_clicar(self):
         """Callback executado ao clicar em um Radiobutton."""
+        valor_selecionado = self.var_selecao.get()
+        if self.prefetcher:
+            self.prefetcher.registrar_escolha(self._chave_lista(),
+                                              valor_selecionado)
         if self.command_callback:
-            valor_selecionado = self.var_selecao.get()
             self.command_callback(valor_selecionado)
 
+    # --- Busca antecipada do próximo nível ---
+    def _chave_lista(self):
+        """Identificador desta lista para a contagem de popularidade."""
+        return self.url or 'tipos'
+
+    def _antecipar_item(self, item):
+        """Antecipa a busca da tela que abre se `item` for escolhido."""
+        if self.prefetcher and self.url_proximo_nivel:
+            self.prefetcher.prefetch(self.url_proximo_nivel(item['codigo']))
+
+    def _antecipar_populares(self):
+        """Antecipa as opções mais prováveis assim que a lista é exibida."""
+        if not (self.prefetcher and self.url_proximo_nivel):
+            return
+        for item in self.prefetcher.populares(self._chave_lista(),
+                                              self.all_items,
+                                              QUANTIDADE_PREFETCH):
+            self._antecipar_item(item)
+
 if __name__ == '__main__':
     # Bloco para teste visual do componente
     def on_selection_test(value):
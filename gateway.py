@@ -0,0 +1,293 @@
+"""
+Porta de saída única para a API FIPE.
+
+Todas as requisições do `ClienteFipe` (telas, prefetch, lote, histórico)
+passam pelo `GatewayFipe`, que:
+
+- junta as requisições idênticas em andamento: quem pede uma URL que outra
+  thread já está buscando espera por aquela resposta em vez de repetir a
+  chamada;
+- limita a taxa de requisições (token bucket, `LimitadorTaxa`);
+- ajusta sozinho quantas requisições ficam abertas ao mesmo tempo
+  (aumento aditivo, redução multiplicativa): a concorrência cresce enquanto
+  a latência se mantém perto da menor já observada e cai pela metade em
+  uma resposta 429/503, que também pausa todas as threads pelo tempo do
+  cabeçalho Retry-After;
+- mede a fila: quantas requisições esperam por uma vaga e por quanto tempo.
+"""
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Taxa padrão (requisições por segundo) para a API pública.
+TAXA_PADRAO = 8.0
+# Limites da concorrência adaptativa.
+CONCORRENCIA_INICIAL = 4
+CONCORRENCIA_MINIMA = 1
+CONCORRENCIA_MAXIMA = 8
+# A concorrência é reduzida quando a latência média passa deste múltiplo da
+# menor latência observada...
+TOLERANCIA_LATENCIA = 2.0
+# ...desde que passe também deste valor, em segundos (abaixo dele a
+# variação é ruído).
+LATENCIA_DESPREZIVEL = 0.25
+# Peso da última requisição na média móvel da latência.
+PESO_LATENCIA = 0.2
+# Respostas que indicam sobrecarga do servidor.
+STATUS_SOBRECARGA = {429, 503}
+# Pausa, em segundos, quando a sobrecarga vem sem Retry-After.
+PAUSA_PADRAO = 2.0
+PAUSA_MAXIMA = 60.0
+
+
+class LimitadorTaxa:
+    """
+    Limita a taxa de requisições (token bucket): permite rajadas de até
+    `rajada` requisições e, em média, no máximo `taxa` por segundo.
+    Pode ser compartilhado por várias threads.
+    """
+    def __init__(self, taxa, rajada=None):
+        """
+        :param taxa: (float) Requisições por segundo permitidas em média.
+        :param rajada: (int, opcional) Requisições permitidas de uma vez;
+        por padrão, igual à taxa (mínimo 1).
+        """
+        self.taxa = taxa
+        self.rajada = rajada or max(int(taxa), 1)
+        self._fichas = float(self.rajada)
+        self._ultima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """Bloqueia até haver uma ficha disponível e a consome."""
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(self.rajada, self._fichas +
+                                   (agora - self._ultima) * self.taxa)
+                self._ultima = agora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.taxa
+            time.sleep(espera)
+
+
+def tempo_retry_after(resposta):
+    """
+    Lê o cabeçalho Retry-After de uma resposta.
+
+    :param resposta: Resposta HTTP (com `headers`) ou None.
+    :return: (float | None) Segundos a esperar, se o cabeçalho existir.
+    """
+    valor = getattr(resposta, 'headers', {}).get('Retry-After')
+    if not valor:
+        return None
+    try:
+        return max(float(valor), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(valor).timestamp() - time.time(),
+                   0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class _Chamada:
+    """Uma requisição em andamento e as threads que esperam por ela."""
+    def __init__(self):
+        self.concluida = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class GatewayFipe:
+    """
+    Controla o acesso à API: junção de requisições idênticas, limite de
+    taxa e concorrência adaptativa. Compartilhado por várias threads.
+    """
+    def __init__(self, limitador=None,
+                 concorrencia_inicial=CONCORRENCIA_INICIAL,
+                 concorrencia_minima=CONCORRENCIA_MINIMA,
+                 concorrencia_maxima=CONCORRENCIA_MAXIMA):
+        """
+        Construtor do GatewayFipe.
+
+        :param limitador: (LimitadorTaxa, opcional) Limite de taxa. Por
+        padrão, `TAXA_PADRAO` requisições por segundo.
+        :param concorrencia_inicial: (int) Requisições simultâneas no início.
+        :param concorrencia_minima: (int) Menor concorrência permitida.
+        :param concorrencia_maxima: (int) Maior concorrência permitida.
+        """
+        self.limitador = limitador or LimitadorTaxa(TAXA_PADRAO)
+        self.concorrencia_minima = concorrencia_minima
+        self.concorrencia_maxima = concorrencia_maxima
+        self.limite = float(min(max(concorrencia_inicial,
+                                    concorrencia_minima),
+                                concorrencia_maxima))
+        self._condicao = threading.Condition()
+        self._ativas = 0
+        self._em_fila = 0
+        self._pausa_ate = 0.0
+        self._latencia_media = None
+        self._latencia_minima = None
+        self._chamadas = {}
+        self._lock_chamadas = threading.Lock()
+        # Métricas.
+        self.maior_fila = 0
+        self.juntadas = 0
+        self.sobrecargas = 0
+        self.requisicoes = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+
+    # --- Junção de requisições idênticas ---
+    def juntar(self, chave, funcao):
+        """
+        Executa `funcao()` uma única vez para todas as threads que pedirem
+        a mesma `chave` enquanto ela estiver em andamento.
+
+        :param chave: Identificação da requisição (ex: URL e validadores).
+        :param funcao: (function) Busca o resultado.
+        :return: O resultado de `funcao`; se ela falhar, a mesma exceção é
+        lançada em todas as threads que esperavam.
+        """
+        with self._lock_chamadas:
+            chamada = self._chamadas.get(chave)
+            lider = chamada is None
+            if lider:
+                chamada = self._chamadas[chave] = _Chamada()
+            else:
+                self.juntadas += 1
+        if not lider:
+            chamada.concluida.wait()
+            if chamada.erro is not None:
+                raise chamada.erro
+            return chamada.resultado
+        try:
+            chamada.resultado = funcao()
+            return chamada.resultado
+        except BaseException as e:
+            chamada.erro = e
+            raise
+        finally:
+            with self._lock_chamadas:
+                del self._chamadas[chave]
+            chamada.concluida.set()
+
+    # --- Vagas, taxa e concorrência adaptativa ---
+    def executar(self, funcao, *args):
+        """
+        Executa uma requisição quando houver vaga, ficha no limitador e
+        nenhuma pausa por sobrecarga em vigor.
+
+        :param funcao: (function) Faz uma única requisição. Se falhar com
+        uma resposta 429/503 (`erro.response`), a concorrência é reduzida.
+        :return: O resultado de `funcao(*args)`.
+        """
+        inicio_espera = time.monotonic()
+        self._ocupar_vaga()
+        try:
+            self._aguardar_pausa()
+            self.limitador.aguardar()
+            self._registrar_espera(time.monotonic() - inicio_espera)
+            inicio = time.monotonic()
+            try:
+                resultado = funcao(*args)
+            except Exception as e:
+                self._registrar_falha(e)
+                raise
+            self._registrar_latencia(time.monotonic() - inicio)
+            return resultado
+        finally:
+            self._liberar_vaga()
+
+    def _ocupar_vaga(self):
+        """Bloqueia até o número de requisições abertas ficar abaixo do
+        limite atual."""
+        with self._condicao:
+            self._em_fila += 1
+            self.maior_fila = max(self.maior_fila, self._em_fila)
+            while self._ativas >= int(self.limite):
+                self._condicao.wait()
+            self._em_fila -= 1
+            self._ativas += 1
+
+    def _liberar_vaga(self):
+        with self._condicao:
+            self._ativas -= 1
+            self._condicao.notify_all()
+
+    def _aguardar_pausa(self):
+        """Espera o fim de uma pausa pedida pelo servidor (Retry-After)."""
+        while True:
+            with self._condicao:
+                restante = self._pausa_ate - time.monotonic()
+            if restante <= 0:
+                return
+            time.sleep(restante)
+
+    def _registrar_espera(self, espera):
+        with self._condicao:
+            self.requisicoes += 1
+            self.espera_total += espera
+            self.espera_maxima = max(self.espera_maxima, espera)
+
+    def _registrar_latencia(self, latencia):
+        """Aumenta a concorrência (em ~1 a cada `limite` respostas) enquanto
+        a latência estiver estável; reduz quando ela cresce."""
+        with self._condicao:
+            if self._latencia_media is None:
+                self._latencia_media = latencia
+            else:
+                self._latencia_media += PESO_LATENCIA * (
+                    latencia - self._latencia_media)
+            if self._latencia_minima is None or \
+                    latencia < self._latencia_minima:
+                self._latencia_minima = latencia
+            congestionado = (
+                self._latencia_media > LATENCIA_DESPREZIVEL and
+                self._latencia_media >
+                TOLERANCIA_LATENCIA * self._latencia_minima)
+            if congestionado:
+                self._reduzir(0.9)
+            else:
+                self.limite = min(self.concorrencia_maxima,
+                                  self.limite + 1 / self.limite)
+            self._condicao.notify_all()
+
+    def _registrar_falha(self, erro):
+        """Em uma resposta 429/503, reduz a concorrência pela metade e pausa
+        as próximas requisições pelo tempo do Retry-After."""
+        resposta = getattr(erro, 'response', None)
+        if getattr(resposta, 'status_code', None) not in STATUS_SOBRECARGA:
+            return
+        pausa = tempo_retry_after(resposta)
+        pausa = min(PAUSA_PADRAO if pausa is None else pausa, PAUSA_MAXIMA)
+        with self._condicao:
+            self.sobrecargas += 1
+            self._reduzir(0.5)
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + pausa)
+
+    def _reduzir(self, fator):
+        """Deve ser chamado com a condição adquirida."""
+        self.limite = max(self.concorrencia_minima, self.limite * fator)
+
+    # --- Métricas ---
+    def resumo(self):
+        """Retorna um dicionário com o estado da fila e da concorrência."""
+        with self._condicao:
+            return {
+                'limite_concorrencia': int(self.limite),
+                'em_andamento': self._ativas,
+                'em_fila': self._em_fila,
+                'maior_fila': self.maior_fila,
+                'juntadas': self.juntadas,
+                'sobrecargas': self.sobrecargas,
+                'espera_media': (self.espera_total / self.requisicoes
+                                 if self.requisicoes else 0.0),
+                'espera_maxima': self.espera_maxima,
+                'pausa_restante': max(self._pausa_ate - time.monotonic(),
+                                      0.0),
+            }
@@ -0,0 +1,283 @@
+"""
+Histórico local dos preços FIPE, mês a mês.
+
+Cada valor consultado (ou importado) é guardado em um SQLite local pela
+chave Código FIPE + ano-modelo e pelo mês de referência, formando uma série
+temporal por veículo. O `AtualizadorHistorico` consulta a lista de meses de
+referência da API e busca apenas os meses que ainda faltam para cada
+veículo acompanhado: quando o mês vira, só o mês novo é consultado.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cache import DIRETORIO_DADOS
+from cliente_fipe import valor_v2_para_v1
+from precos import converter_valor
+
+MESES = {'janeiro': 1, 'fevereiro': 2, 'março': 3, 'marco': 3, 'abril': 4,
+         'maio': 5, 'junho': 6, 'julho': 7, 'agosto': 8, 'setembro': 9,
+         'outubro': 10, 'novembro': 11, 'dezembro': 12}
+_PADRAO_MES = re.compile(r'([a-zç]+)\W+(?:de\W+)?(\d{4})')
+
+_ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS observacoes (
+    codigo_fipe TEXT NOT NULL,
+    ano_modelo INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    mes_referencia TEXT NOT NULL,
+    valor REAL,
+    observado_em REAL NOT NULL,
+    PRIMARY KEY (codigo_fipe, ano_modelo, mes)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS veiculos (
+    codigo_fipe TEXT NOT NULL,
+    ano_modelo INTEGER NOT NULL,
+    marca TEXT,
+    modelo TEXT,
+    tipo TEXT,
+    codigo_marca TEXT,
+    codigo_modelo TEXT,
+    codigo_ano TEXT,
+    PRIMARY KEY (codigo_fipe, ano_modelo)
+) WITHOUT ROWID;
+'''
+
+
+def numero_mes(texto):
+    """
+    Converte um mês de referência em um número ordenável.
+
+    :param texto: (str) Ex: 'outubro de 2026 ' ou 'outubro/2026'.
+    :return: (int | None) Ex: 202610; None se o texto não for reconhecido.
+    """
+    encontrado = _PADRAO_MES.search(str(texto).strip().lower())
+    if not encontrado or encontrado.group(1) not in MESES:
+        return None
+    return int(encontrado.group(2)) * 100 + MESES[encontrado.group(1)]
+
+
+def _ano_modelo(valor):
+    """AnoModelo como inteiro, ou None se não for numérico."""
+    if isinstance(valor, int) and not isinstance(valor, bool):
+        return valor
+    return int(valor) if str(valor).strip().isdigit() else None
+
+
+class HistoricoPrecos:
+    """
+    Séries de preços por veículo, guardadas em disco.
+    """
+    def __init__(self, caminho=None):
+        """
+        Construtor do HistoricoPrecos.
+
+        :param caminho: (str, opcional) Arquivo SQLite. Por padrão fica em
+        `DIRETORIO_DADOS`. Use ':memory:' para um histórico temporário.
+        """
+        if caminho is None:
+            os.makedirs(DIRETORIO_DADOS, exist_ok=True)
+            caminho = os.path.join(DIRETORIO_DADOS, 'historico.sqlite3')
+        self.caminho = caminho
+        # Gravado pela interface e pelo atualizador, em threads diferentes.
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._conexao.executescript(_ESQUEMA)
+        self._conexao.commit()
+
+    def registrar(self, registro, codigos=None):
+        """
+        Guarda o valor de um veículo no seu mês de referência.
+
+        :param registro: (dict) Veículo no formato da API.
+        :param codigos: (dict, opcional) Códigos da API do veículo ('tipo',
+        'marca', 'modelo', 'ano'), necessários para atualizá-lo depois.
+        :return: (bool) True se o registro tinha chave e mês válidos.
+        """
+        return self.registrar_varios([(registro, codigos)]) == 1
+
+    def registrar_varios(self, registros):
+        """
+        Guarda vários valores em uma única transação.
+
+        :param registros: (iterable) Veículos no formato da API, ou tuplas
+        `(veiculo, codigos)` como em `registrar`.
+        :return: (int) Quantidade de registros guardados.
+        """
+        agora = time.time()
+        observacoes, veiculos = [], []
+        for item in registros:
+            registro, codigos = item if isinstance(item, tuple) else (item, None)
+            codigo_fipe = str(registro.get('CodigoFipe') or '').strip()
+            ano = _ano_modelo(registro.get('AnoModelo'))
+            mes = numero_mes(registro.get('MesReferencia', ''))
+            if not codigo_fipe or ano is None or mes is None:
+                continue
+            observacoes.append((codigo_fipe, ano, mes,
+                                str(registro['MesReferencia']).strip(),
+                                converter_valor(registro.get('Valor')), agora))
+            codigos = codigos or {}
+            veiculos.append((codigo_fipe, ano, registro.get('Marca'),
+                             registro.get('Modelo'), codigos.get('tipo'),
+                             codigos.get('marca'), codigos.get('modelo'),
+                             codigos.get('ano')))
+        with self._lock:
+            self._conexao.executemany(
+                'INSERT OR REPLACE INTO observacoes VALUES (?, ?, ?, ?, ?, ?)',
+                observacoes)
+            # Os códigos da API só são conhecidos nas consultas feitas pelo
+            # assistente; um registro importado não apaga os já guardados.
+            self._conexao.executemany(
+                'INSERT INTO veiculos VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (codigo_fipe, ano_modelo) DO UPDATE SET '
+                ' marca = COALESCE(excluded.marca, marca),'
+                ' modelo = COALESCE(excluded.modelo, modelo),'
+                ' tipo = COALESCE(excluded.tipo, tipo),'
+                ' codigo_marca = COALESCE(excluded.codigo_marca, codigo_marca),'
+                ' codigo_modelo = COALESCE(excluded.codigo_modelo,'
+                '                          codigo_modelo),'
+                ' codigo_ano = COALESCE(excluded.codigo_ano, codigo_ano)',
+                veiculos)
+            self._conexao.commit()
+        return len(observacoes)
+
+    def series(self, chaves):
+        """
+        Séries de preços de alguns veículos.
+
+        :param chaves: (iterable) Tuplas (CodigoFipe, AnoModelo).
+        :return: (dict) {(codigo_fipe, ano_modelo): [(mes, valor), ...]},
+        com os meses (ex: 202610) em ordem crescente.
+        """
+        resultado = {}
+        with self._lock:
+            for codigo_fipe, ano in chaves:
+                ano = _ano_modelo(ano)
+                resultado[(codigo_fipe, ano)] = self._conexao.execute(
+                    'SELECT mes, valor FROM observacoes '
+                    'WHERE codigo_fipe = ? AND ano_modelo = ? AND '
+                    'valor IS NOT NULL ORDER BY mes',
+                    (codigo_fipe, ano)).fetchall()
+        return resultado
+
+    def acompanhados(self):
+        """
+        Veículos que podem ser atualizados pela API (têm os códigos da
+        consulta) e os meses já guardados de cada um.
+
+        :return: (list) Dicts com codigo_fipe, ano_modelo, tipo, marca,
+        modelo, ano (códigos da API) e `meses` (set).
+        """
+        with self._lock:
+            veiculos = self._conexao.execute(
+                'SELECT codigo_fipe, ano_modelo, tipo, codigo_marca,'
+                ' codigo_modelo, codigo_ano FROM veiculos '
+                'WHERE tipo IS NOT NULL AND codigo_marca IS NOT NULL AND'
+                ' codigo_modelo IS NOT NULL AND codigo_ano IS NOT NULL'
+            ).fetchall()
+            meses = {}
+            for codigo_fipe, ano, mes in self._conexao.execute(
+                    'SELECT codigo_fipe, ano_modelo, mes FROM observacoes'):
+                meses.setdefault((codigo_fipe, ano), set()).add(mes)
+        return [{'codigo_fipe': v[0], 'ano_modelo': v[1], 'tipo': v[2],
+                 'marca': v[3], 'modelo': v[4], 'ano': v[5],
+                 'meses': meses.get((v[0], v[1]), set())}
+                for v in veiculos]
+
+    def fechar(self):
+        """Fecha a conexão com o arquivo do histórico."""
+        with self._lock:
+            self._conexao.close()
+
+
+class AtualizadorHistorico:
+    """
+    Completa o histórico buscando na API só os meses que ainda faltam.
+    """
+    def __init__(self, historico, cliente, concorrencia=4):
+        """
+        Construtor do AtualizadorHistorico.
+
+        :param historico: (HistoricoPrecos) Onde os valores são guardados.
+        :param cliente: (ClienteFipe) Cliente usado nas consultas.
+        :param concorrencia: (int) Consultas simultâneas.
+        """
+        self.historico = historico
+        self.cliente = cliente
+        self.concorrencia = concorrencia
+
+    def referencias(self):
+        """
+        Meses de referência publicados pela API.
+
+        :return: (list) Tuplas `(codigo, mes, texto)`, do mais recente para
+        o mais antigo. Ex: ('320', 202610, 'outubro de 2026').
+        """
+        referencias = []
+        for item in self.cliente.obter_json(self.cliente.url_referencias()):
+            mes = numero_mes(item.get('month', ''))
+            if mes is not None:
+                referencias.append((str(item['code']), mes,
+                                    item['month'].strip()))
+        referencias.sort(key=lambda r: r[1], reverse=True)
+        return referencias
+
+    def pendencias(self, meses_anteriores=0):
+        """
+        Consultas necessárias para completar o histórico.
+
+        :param meses_anteriores: (int) Além do mês mais recente, quantos
+        meses anteriores cada veículo deve ter. Com 0, só os veículos cujo
+        último mês guardado ficou para trás são consultados.
+        :return: (list) Tuplas `(veiculo, referencia)`.
+        """
+        referencias = self.referencias()[:meses_anteriores + 1]
+        return [(veiculo, referencia)
+                for veiculo in self.historico.acompanhados()
+                for referencia in referencias
+                if referencia[1] not in veiculo['meses']]
+
+    def _consultar(self, veiculo, referencia):
+        """Busca o valor de um veículo em um mês (roda no pool)."""
+        url = self.cliente.url_valor_referencia(
+            veiculo['tipo'], veiculo['marca'], veiculo['modelo'],
+            veiculo['ano'], referencia[0])
+        registro = valor_v2_para_v1(self.cliente.obter_json(url))
+        # A v2 devolve o mês no mesmo formato da v1; se não devolver,
+        # vale o mês pedido.
+        if numero_mes(registro.get('MesReferencia', '')) is None:
+            registro['MesReferencia'] = referencia[2]
+        return registro
+
+    def atualizar(self, meses_anteriores=0, progresso=None):
+        """
+        Consulta e guarda os meses que faltam.
+
+        Feito para rodar em segundo plano (ex: `Agendador.agendar`, com
+        `ao_progresso`).
+
+        :param meses_anteriores: (int) Ver `pendencias`.
+        :param progresso: (function, opcional) Recebe dicts com
+        `concluidas` e `total`.
+        :return: (dict) `consultas`, `novos` e `falhas`.
+        """
+        progresso = progresso or (lambda parcial: None)
+        pendencias = self.pendencias(meses_anteriores)
+        novos = falhas = 0
+        with ThreadPoolExecutor(max_workers=self.concorrencia) as executor:
+            futuros = {executor.submit(self._consultar, veiculo, referencia):
+                       veiculo for veiculo, referencia in pendencias}
+            for concluidas, futuro in enumerate(as_completed(futuros), 1):
+                veiculo = futuros[futuro]
+                try:
+                    registro = futuro.result()
+                except Exception:  # pylint: disable=broad-exception-caught
+                    falhas += 1
+                else:
+                    novos += self.historico.registrar(registro, veiculo)
+                progresso({'concluidas': concluidas,
+                           'total': len(pendencias)})
+        return {'consultas': len(pendencias), 'novos': novos,
+                'falhas': falhas}
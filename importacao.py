@@ -0,0 +1,298 @@
+"""
+Importação de veículos salvos em arquivos JSON, JSONL e NDJSON.
+
+Aceita vários arquivos e pastas de uma vez. Os registros são lidos aos
+poucos, um por vez, sem carregar o arquivo inteiro na memória: JSONL/NDJSON
+linha a linha e JSON (um veículo ou uma lista de veículos) em blocos. Cada
+registro é validado contra os campos da resposta da API e os repetidos,
+pela chave (CodigoFipe, AnoModelo, MesReferencia), são descartados.
+
+O `Importador` roda fora da thread da interface e publica os registros em
+lotes, junto com o progresso em bytes lidos.
+"""
+import codecs
+import csv
+import io
+import json
+import os
+import threading
+from colecao import chave_registro
+
+EXTENSOES = ('.json', '.jsonl', '.ndjson', '.csv', '.fipecol')
+# Campos numéricos da API, que no CSV chegam como texto.
+CAMPOS_INTEIROS_CSV = ('TipoVeiculo', 'AnoModelo')
+# Campos obrigatórios de um veículo e os tipos aceitos para cada um.
+CAMPOS_OBRIGATORIOS = {
+    'Marca': (str,),
+    'Modelo': (str,),
+    'AnoModelo': (int, str),
+    'Valor': (str, int, float),
+    'CodigoFipe': (str,),
+    'MesReferencia': (str,),
+}
+TAMANHO_BLOCO = 64 * 1024
+# Máximo de mensagens de erro guardadas no resumo da importação.
+MAXIMO_ERROS = 20
+
+
+class ErroImportacao(ValueError):
+    """Registro ou arquivo fora do formato esperado."""
+
+
+def validar_registro(registro):
+    """
+    Confere se um registro tem os campos de um veículo da tabela FIPE.
+
+    :param registro: Objeto lido do arquivo.
+    :raises ErroImportacao: Se faltar algum campo ou o tipo for inválido.
+    """
+    if not isinstance(registro, dict):
+        raise ErroImportacao('o registro não é um objeto JSON')
+    for campo, tipos in CAMPOS_OBRIGATORIOS.items():
+        valor = registro.get(campo)
+        if valor is None or valor == '':
+            raise ErroImportacao(f"campo '{campo}' ausente")
+        if not isinstance(valor, tipos) or isinstance(valor, bool):
+            raise ErroImportacao(f"campo '{campo}' com tipo inválido")
+
+
+def listar_arquivos(caminhos):
+    """
+    Expande pastas (recursivamente) nos arquivos importáveis que contêm.
+
+    :param caminhos: (iterable) Arquivos e/ou pastas.
+    :return: (list) Caminhos dos arquivos, sem repetições.
+    """
+    arquivos = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for pasta, _, nomes in sorted(os.walk(caminho)):
+                arquivos.extend(os.path.join(pasta, nome)
+                                for nome in sorted(nomes)
+                                if nome.lower().endswith(EXTENSOES))
+        else:
+            arquivos.append(caminho)
+    return list(dict.fromkeys(arquivos))
+
+
+def ler_registros(caminho, ao_ler=None):
+    """
+    Lê os registros de um arquivo, um de cada vez.
+
+    :param caminho: (str) Arquivo JSON, JSONL, NDJSON, CSV ou colunar
+    (.fipecol), como os gravados pela exportação da sessão.
+    :param ao_ler: (function, opcional) Recebe a quantidade de bytes lida a
+    cada bloco ou linha, para o cálculo do progresso.
+    :return: Gerador de objetos JSON.
+    :raises ErroImportacao: Se o arquivo não for JSON válido.
+    """
+    ao_ler = ao_ler or (lambda quantidade: None)
+    if caminho.lower().endswith('.fipecol'):
+        # Arquivo colunar: lido de uma vez (é rápido) e percorrido.
+        from exportacao import carregar_colunar
+        colecao = carregar_colunar(caminho, indexar=False)
+        ao_ler(os.path.getsize(caminho))
+        yield from colecao
+        return
+    with open(caminho, 'rb') as f:
+        if caminho.lower().endswith(('.jsonl', '.ndjson')):
+            for numero, linha in enumerate(f, 1):
+                ao_ler(len(linha))
+                if not linha.strip():
+                    continue
+                try:
+                    yield json.loads(linha)
+                except ValueError as e:
+                    raise ErroImportacao(f'linha {numero}: {e}') from e
+        elif caminho.lower().endswith('.csv'):
+            yield from _ler_csv(f, ao_ler)
+        else:
+            yield from _ler_json(f, ao_ler)
+
+
+def _ler_csv(arquivo, ao_ler):
+    """
+    Lê um CSV com uma coluna por campo, convertendo os campos numéricos e
+    descartando as células vazias.
+    """
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    lidos = 0
+    for linha in csv.DictReader(texto):
+        # Posição no arquivo binário: avança em blocos, conforme o
+        # TextIOWrapper lê.
+        posicao = arquivo.tell()
+        ao_ler(posicao - lidos)
+        lidos = posicao
+        registro = {campo: valor for campo, valor in linha.items()
+                    if campo is not None and valor not in (None, '')}
+        for campo in CAMPOS_INTEIROS_CSV:
+            if str(registro.get(campo, '')).isdigit():
+                registro[campo] = int(registro[campo])
+        yield registro
+    ao_ler(arquivo.tell() - lidos)
+
+
+def _ler_json(arquivo, ao_ler):
+    """
+    Lê um arquivo JSON com um objeto ou uma lista de objetos, decodificando
+    um elemento da lista por vez à medida que os blocos são lidos.
+    """
+    decodificador = json.JSONDecoder()
+    texto_utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer, posicao, fim_arquivo = '', 0, False
+    em_lista = None
+
+    def ler_bloco():
+        nonlocal buffer, posicao, fim_arquivo
+        bloco = arquivo.read(TAMANHO_BLOCO)
+        ao_ler(len(bloco))
+        fim_arquivo = not bloco
+        buffer = buffer[posicao:] + texto_utf8.decode(bloco, final=fim_arquivo)
+        posicao = 0
+
+    def proximo_caractere():
+        """Pula os espaços e retorna o próximo caractere ('' no fim)."""
+        nonlocal posicao
+        while True:
+            while posicao < len(buffer) and buffer[posicao].isspace():
+                posicao += 1
+            if posicao < len(buffer) or fim_arquivo:
+                return buffer[posicao:posicao + 1]
+            ler_bloco()
+
+    while True:
+        caractere = proximo_caractere()
+        if em_lista is None:
+            em_lista = caractere == '['
+            if em_lista:
+                posicao += 1
+                continue
+        elif em_lista:
+            if caractere == ']':
+                return
+            if caractere == ',':
+                posicao += 1
+                continue
+        if caractere == '':
+            if em_lista:
+                raise ErroImportacao('lista JSON incompleta')
+            return
+        # Decodifica o próximo valor; se o bloco terminou no meio dele, lê
+        # mais um bloco e tenta de novo.
+        while True:
+            try:
+                registro, posicao = decodificador.raw_decode(buffer, posicao)
+                break
+            except ValueError as e:
+                if fim_arquivo:
+                    raise ErroImportacao(str(e)) from e
+                ler_bloco()
+        yield registro
+        if not em_lista:
+            if proximo_caractere() != '':
+                raise ErroImportacao('conteúdo extra após o objeto JSON')
+            return
+
+
+class Importador:
+    """
+    Importa registros de vários arquivos, validando e descartando repetidos.
+    """
+    def __init__(self, dados_existentes=(), tamanho_lote=500):
+        """
+        Construtor do Importador.
+
+        :param dados_existentes: (ColecaoVeiculos | iterable) Veículos já
+        carregados; os registros com a mesma chave não são importados de
+        novo.
+        :param tamanho_lote: (int) Registros publicados por vez.
+        """
+        self.tamanho_lote = tamanho_lote
+        # A coleção já sabe responder se contém um veículo; para outros
+        # iteráveis, as chaves são calculadas aqui.
+        self._ja_carregado = getattr(dados_existentes, 'contem', None)
+        self._chaves = (set() if self._ja_carregado else
+                        {chave_registro(d) for d in dados_existentes})
+        self._cancelado = threading.Event()
+        self.importados = 0
+        # Último registro novo lido, para exibir quando for o único.
+        self.ultimo = None
+        self.duplicados = 0
+        self.invalidos = 0
+        self.erros = []
+
+    def cancelar(self):
+        """Interrompe a importação no próximo registro."""
+        self._cancelado.set()
+
+    def _registrar_erro(self, mensagem):
+        """Conta um registro inválido e guarda a mensagem para o resumo."""
+        self.invalidos += 1
+        if len(self.erros) < MAXIMO_ERROS:
+            self.erros.append(mensagem)
+
+    def importar(self, caminhos, progresso=None):
+        """
+        Lê todos os arquivos e publica os registros novos em lotes.
+
+        Feito para rodar em segundo plano (ex: `Agendador.agendar`, com
+        `ao_progresso`).
+
+        :param caminhos: (iterable) Arquivos e/ou pastas.
+        :param progresso: (function, opcional) Recebe dicts com `registros`
+        (lote de veículos novos), `arquivo`, `bytes_lidos` e `bytes_totais`.
+        :return: (dict) Resumo: arquivos, importados, duplicados, invalidos,
+        as primeiras mensagens de `erros` e o `ultimo` registro importado
+        (ou None).
+        """
+        progresso = progresso or (lambda parcial: None)
+        arquivos = listar_arquivos(caminhos)
+        bytes_totais = sum(os.path.getsize(a) for a in arquivos
+                           if os.path.isfile(a))
+        bytes_lidos = 0
+        lote = []
+
+        def contar_bytes(quantidade):
+            nonlocal bytes_lidos
+            bytes_lidos += quantidade
+
+        def publicar(arquivo):
+            progresso({'registros': lote[:], 'arquivo': arquivo,
+                       'bytes_lidos': bytes_lidos,
+                       'bytes_totais': bytes_totais})
+            lote.clear()
+
+        for arquivo in arquivos:
+            nome = os.path.basename(arquivo)
+            try:
+                for numero, registro in enumerate(
+                        ler_registros(arquivo, contar_bytes), 1):
+                    if self._cancelado.is_set():
+                        break
+                    try:
+                        validar_registro(registro)
+                    except ErroImportacao as e:
+                        self._registrar_erro(f'{nome}, registro {numero}: {e}')
+                        continue
+                    chave = chave_registro(registro)
+                    if chave in self._chaves or (
+                            self._ja_carregado and
+                            self._ja_carregado(registro)):
+                        self.duplicados += 1
+                        continue
+                    self._chaves.add(chave)
+                    lote.append(registro)
+                    self.importados += 1
+                    self.ultimo = registro
+                    if len(lote) >= self.tamanho_lote:
+                        publicar(arquivo)
+            except (OSError, ValueError) as e:
+                self._registrar_erro(f'{nome}: {e}')
+            if self._cancelado.is_set():
+                break
+            publicar(arquivo)
+
+        return {'arquivos': len(arquivos), 'importados': self.importados,
+                'duplicados': self.duplicados, 'invalidos': self.invalidos,
+                'erros': list(self.erros), 'ultimo': self.ultimo,
+                'cancelado': self._cancelado.is_set()}
@@ -0,0 +1,140 @@
+"""
+Índice de busca para as listas de marcas, modelos e anos.
+
+Os nomes são normalizados uma única vez (minúsculas, sem acentos) e
+indexados por n-gramas (sequências de 1 a 3 caracteres). Uma busca separa o
+texto em palavras e retorna os itens que contêm todas elas, em qualquer
+ordem: "gol 1.0 flex" encontra "Gol 1.0 Mi Total Flex 8V 4p". Quando nada
+é encontrado, os itens mais parecidos (mais trigramas em comum) são
+retornados, tolerando erros de digitação.
+"""
+import unicodedata
+from collections import Counter
+
+
+def normalizar(texto):
+    """
+    Converte o texto para minúsculas, remove acentos e espaços repetidos.
+
+    :param texto: (str) Texto original. Ex: 'Citroën C4 Cactus'
+    :return: (str) Ex: 'citroen c4 cactus'
+    """
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acentos = ''.join(c for c in decomposto
+                          if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().split())
+
+
+def trigramas(texto):
+    """Retorna o conjunto de trigramas de um texto já normalizado."""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def ngramas(texto, maximo=3):
+    """Retorna todos os trechos de 1 até `maximo` caracteres do texto."""
+    return {texto[i:i + n] for n in range(1, maximo + 1)
+            for i in range(len(texto) - n + 1)}
+
+
+class IndiceBusca:
+    """
+    Índice pré-calculado sobre uma lista de itens {'nome': ..., 'codigo': ...}.
+    """
+    def __init__(self, itens, minimo_similaridade=0.3, limite_aproximado=50):
+        """
+        Construtor do índice.
+
+        :param itens: (list) Itens a indexar, na ordem em que são exibidos.
+        :param minimo_similaridade: (float) Fração mínima dos trigramas da
+        busca que um item precisa ter para aparecer na busca aproximada.
+        :param limite_aproximado: (int) Máximo de itens retornados pela busca
+        aproximada.
+        """
+        self.itens = itens
+        self.minimo_similaridade = minimo_similaridade
+        self.limite_aproximado = limite_aproximado
+        self._nomes = [normalizar(item['nome']) for item in itens]
+        # Para cada n-grama (1 a 3 caracteres), os índices dos itens cujo
+        # nome o contém. Palavras curtas da busca são respondidas direto por
+        # aqui; as mais longas usam os trigramas para reduzir os candidatos.
+        self._por_ngrama = {}
+        for indice, nome in enumerate(self._nomes):
+            for ngrama in ngramas(nome):
+                self._por_ngrama.setdefault(ngrama, set()).add(indice)
+        # Última busca exata e seus resultados (índices), reaproveitados
+        # quando o usuário continua digitando a mesma busca.
+        self._ultima_busca = ''
+        self._ultimos_indices = range(len(itens))
+
+    def buscar(self, texto):
+        """
+        Retorna os itens que correspondem ao texto, na ordem original.
+
+        :param texto: (str) Texto digitado pelo usuário.
+        """
+        consulta = normalizar(texto)
+        if not consulta:
+            self._ultima_busca = ''
+            self._ultimos_indices = range(len(self.itens))
+            return self.itens
+
+        indices = self._buscar_exato(consulta)
+        if indices:
+            return [self.itens[i] for i in indices]
+        return self._buscar_aproximado(consulta)
+
+    def _buscar_exato(self, consulta):
+        """Índices dos itens que contêm todas as palavras da consulta."""
+        palavras = consulta.split()
+        # Se a nova consulta só acrescenta caracteres à anterior, todo
+        # resultado novo já estava entre os resultados anteriores.
+        if self._ultima_busca and consulta.startswith(self._ultima_busca):
+            indices = [i for i in self._ultimos_indices
+                       if all(palavra in self._nomes[i]
+                              for palavra in palavras)]
+        else:
+            candidatos = self._candidatos_por_ngrama(palavras)
+            # Palavras de até 3 caracteres já foram resolvidas pelo índice;
+            # só as mais longas precisam ser conferidas no nome.
+            longas = [palavra for palavra in palavras if len(palavra) > 3]
+            indices = [i for i in candidatos
+                       if all(palavra in self._nomes[i] for palavra in longas)]
+        self._ultima_busca = consulta
+        self._ultimos_indices = indices
+        return indices
+
+    def _candidatos_por_ngrama(self, palavras):
+        """
+        Reduz os candidatos aos itens que contêm cada palavra curta e todos
+        os trigramas de cada palavra longa da consulta.
+        """
+        candidatos = None
+        for palavra in palavras:
+            chaves = [palavra] if len(palavra) <= 3 else trigramas(palavra)
+            for chave in chaves:
+                encontrados = self._por_ngrama.get(chave)
+                if not encontrados:
+                    return []
+                candidatos = (set(encontrados) if candidatos is None
+                              else candidatos & encontrados)
+                if not candidatos:
+                    return []
+        return sorted(candidatos)
+
+    def _buscar_aproximado(self, consulta):
+        """
+        Itens com mais trigramas em comum com a consulta, do mais parecido
+        para o menos parecido.
+        """
+        trigramas_consulta = set()
+        for palavra in consulta.split():
+            trigramas_consulta |= trigramas(palavra)
+        if not trigramas_consulta:
+            return []
+        contagem = Counter()
+        for trigrama in trigramas_consulta:
+            contagem.update(self._por_ngrama.get(trigrama, ()))
+        minimo = self.minimo_similaridade * len(trigramas_consulta)
+        return [self.itens[i] for i, comuns in
+                contagem.most_common(self.limite_aproximado)
+                if comuns >= minimo]
@@ -0,0 +1,146 @@
+"""
+Abertura rápida da aplicação.
+
+Na abertura só é importado o necessário para a primeira tela. Os módulos
+pesados (o matplotlib, pelo `frame_grafico`, e o `requests`) são importados
+no primeiro uso; depois que a primeira janela aparece, `precarregar` os
+importa em segundo plano para que o gráfico e a primeira consulta não
+esperem por eles.
+
+Uso:
+
+    python inicio.py                     # módulos que mais pesam na abertura
+    python inicio.py --orcamento 250     # termina com erro acima de 250 ms
+
+O relatório roda `python -X importtime` em um processo novo, como em uma
+abertura a frio. Para o tempo até a janela aparecer, use
+`python main.py --tempo-inicio`.
+"""
+import argparse
+import importlib
+import logging
+import subprocess
+import sys
+import threading
+from diagnostico import medir
+
+# Importados em segundo plano depois que a primeira janela aparece.
+MODULOS_PESADOS = ('requests', 'frame_grafico')
+# Tempo máximo, em segundos, para importar o `app` (antes da primeira
+# janela). Acima disso, `python inicio.py` termina com erro.
+ORCAMENTO = 0.3
+# Módulos listados no relatório.
+LINHAS_RELATORIO = 20
+
+logger = logging.getLogger(__name__)
+
+
+def precarregar(modulos=MODULOS_PESADOS):
+    """
+    Importa os módulos em uma thread separada, sem travar a interface.
+
+    :param modulos: (tuple) Nomes dos módulos a importar.
+    :return: (threading.Thread) A thread da pré-carga.
+    """
+    thread = threading.Thread(target=_importar, args=(modulos,),
+                              name='precarga', daemon=True)
+    thread.start()
+    return thread
+
+
+def _importar(modulos):
+    for nome in modulos:
+        with medir('inicio', f'precarregar {nome}'):
+            try:
+                importlib.import_module(nome)
+            except ImportError as e:
+                # O erro aparece de novo (e com a tela certa) no primeiro uso.
+                logger.warning("Pré-carga de %s falhou: %s", nome, e)
+
+
+def analisar_importtime(texto):
+    """
+    Lê a saída de `python -X importtime`.
+
+    :param texto: (str) Linhas 'import time: proprio | acumulado | modulo',
+    em microssegundos.
+    :return: (list) Dicts com 'modulo', 'nivel' (profundidade na árvore de
+    importações), 'proprio' e 'acumulado' (em segundos), na ordem da saída.
+    """
+    importacoes = []
+    for linha in texto.splitlines():
+        if not linha.startswith('import time:'):
+            continue
+        partes = linha[len('import time:'):].split('|')
+        if len(partes) != 3 or not partes[0].strip().isdigit():
+            continue  # Cabeçalho ('self [us] | cumulative | ...').
+        nome = partes[2].rstrip()
+        modulo = nome.lstrip()
+        importacoes.append({
+            'modulo': modulo,
+            'nivel': (len(nome) - len(modulo) - 1) // 2,
+            'proprio': int(partes[0]) / 1e6,
+            'acumulado': int(partes[1]) / 1e6})
+    return importacoes
+
+
+def medir_importacoes(modulo='app'):
+    """
+    Importa um módulo em um processo novo com `-X importtime`.
+
+    :param modulo: (str) Módulo a importar.
+    :return: (list) As importações, como em `analisar_importtime`.
+    :raises ImportError: Se a importação falhar.
+    """
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        capture_output=True, text=True, check=False)
+    if processo.returncode != 0:
+        raise ImportError(processo.stderr.strip().splitlines()[-1])
+    return analisar_importtime(processo.stderr)
+
+
+def relatorio(importacoes, modulo='app', linhas=LINHAS_RELATORIO):
+    """
+    Resumo legível das importações.
+
+    :param importacoes: (list) Saída de `medir_importacoes`.
+    :param modulo: (str) Módulo medido (a raiz da árvore).
+    :param linhas: (int) Quantos módulos listar.
+    :return: (tuple) `(texto, total)`, com o tempo total de importação do
+    módulo em segundos.
+    """
+    total = next((i['acumulado'] for i in importacoes
+                  if i['modulo'] == modulo and i['nivel'] == 0), 0.0)
+    texto = [f'import {modulo}: {total * 1000:.1f} ms',
+             f"{'acumulado':>10} {'próprio':>9}  módulo"]
+    maiores = sorted(importacoes, key=lambda i: i['acumulado'],
+                     reverse=True)[:linhas]
+    for i in maiores:
+        texto.append(f"{i['acumulado'] * 1000:8.1f}ms {i['proprio'] * 1000:7.1f}"
+                     f"ms  {'  ' * i['nivel']}{i['modulo']}")
+    return '\n'.join(texto), total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Mede o tempo de importação da aplicação.')
+    parser.add_argument('--modulo', default='app',
+                        help='módulo a importar (padrão: app)')
+    parser.add_argument('--orcamento', type=float, default=ORCAMENTO * 1000,
+                        metavar='MS', help='tempo máximo aceito, em ms')
+    parser.add_argument('--linhas', type=int, default=LINHAS_RELATORIO,
+                        help='quantos módulos listar')
+    args = parser.parse_args(argv)
+
+    texto, total = relatorio(medir_importacoes(args.modulo), args.modulo,
+                             args.linhas)
+    print(texto)
+    if total * 1000 > args.orcamento:
+        print(f'\nAcima do orçamento de {args.orcamento:.0f} ms.')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from comparacao import MAXIMO_VEICULOS
+
+
+class JanelaComparacao(tk.Toplevel):
+    """
+    Janela para marcar vários anos-modelo (ou modelos) e compará-los de uma
+    vez no gráfico.
+    """
+    def __init__(self, parent, titulo, itens, ao_confirmar):
+        """
+        Construtor da JanelaComparacao.
+
+        :param parent: A janela principal (tk.Tk).
+        :param titulo: (str) Título da janela.
+        :param itens: (list) Opções {'nome': ..., 'codigo': ...}; só as
+        primeiras `MAXIMO_VEICULOS` são exibidas.
+        :param ao_confirmar: (function) Recebe a lista de códigos marcados.
+        """
+        super().__init__(parent)
+        self.title(titulo)
+        self.geometry('420x460')
+        self.transient(parent)
+        self.ao_confirmar = ao_confirmar
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        texto = 'Marque os veículos a comparar:'
+        if len(itens) > MAXIMO_VEICULOS:
+            texto = (f'Marque até {MAXIMO_VEICULOS} veículos (refine a busca '
+                     'para ver os demais):')
+        tk.Label(self, text=texto, anchor='w').grid(
+            row=0, column=0, columnspan=2, sticky='ew', padx=10, pady=(10, 5))
+
+        # --- Lista rolável de Checkbuttons ---
+        canvas = tk.Canvas(self, highlightthickness=0)
+        scrollbar = ttk.Scrollbar(self, orient='vertical',
+                                  command=canvas.yview)
+        canvas.configure(yscrollcommand=scrollbar.set)
+        canvas.grid(row=1, column=0, sticky='nsew', padx=(10, 0))
+        scrollbar.grid(row=1, column=1, sticky='ns', padx=(0, 10))
+        quadro = tk.Frame(canvas)
+        canvas.create_window(0, 0, window=quadro, anchor='nw')
+        quadro.bind('<Configure>', lambda e: canvas.configure(
+            scrollregion=canvas.bbox('all')))
+
+        self._marcados = []
+        for item in itens[:MAXIMO_VEICULOS]:
+            variavel = tk.BooleanVar(value=False)
+            tk.Checkbutton(quadro, text=item['nome'], variable=variavel,
+                           anchor='w').pack(fill=tk.X, anchor='w')
+            self._marcados.append((item['codigo'], variavel))
+
+        botoes = tk.Frame(self)
+        botoes.grid(row=2, column=0, columnspan=2, pady=10)
+        tk.Button(botoes, text='Marcar todos',
+                  command=self._marcar_todos).pack(side=tk.LEFT, padx=5)
+        tk.Button(botoes, text='Comparar',
+                  command=self._confirmar).pack(side=tk.LEFT, padx=5)
+        tk.Button(botoes, text='Cancelar',
+                  command=self.destroy).pack(side=tk.LEFT, padx=5)
+
+    def _marcar_todos(self):
+        for _, variavel in self._marcados:
+            variavel.set(True)
+
+    def _confirmar(self):
+        """Entrega os códigos marcados e fecha a janela."""
+        codigos = [str(codigo) for codigo, variavel in self._marcados
+                   if variavel.get()]
+        if len(codigos) < 2:
+            messagebox.showwarning('Comparar',
+                                   'Marque pelo menos dois veículos.',
+                                   parent=self)
+            return
+        self.destroy()
+        self.ao_confirmar(codigos)
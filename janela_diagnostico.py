@@ -0,0 +1,170 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+from diagnostico import intervalos
+from memoria import MB, maiores_alocacoes, memoria_rastreada
+
+# Intervalo, em milissegundos, entre as atualizações da janela.
+INTERVALO_ATUALIZACAO = 1000
+
+
+class JanelaDiagnostico(tk.Toplevel):
+    """
+    Janela com os tempos de cada trecho da aplicação (p50/p95 de rede,
+    JSON, cache, telas e desenho) e os contadores do cache e da API,
+    atualizada a cada segundo.
+    """
+    def __init__(self, parent, cliente=None, telas=None, memoria=None,
+                 dados=None):
+        """
+        Construtor da JanelaDiagnostico.
+
+        :param parent: A janela principal (tk.Tk).
+        :param cliente: (ClienteFipe, opcional) Cliente cujos cache,
+        estatísticas e gateway são exibidos.
+        :param telas: (PoolTelas, opcional) Pool de telas cujo uso é exibido.
+        :param memoria: (GerenciadorMemoria, opcional) Orçamentos cujo uso é
+        exibido.
+        :param dados: (ColecaoVeiculos, opcional) Veículos da sessão, para
+        informar quantos estão no disco.
+        """
+        super().__init__(parent)
+        self.title('Diagnóstico')
+        self.geometry('720x420')
+        self.cliente = cliente
+        self.telas = telas
+        self.memoria = memoria
+        self.dados = dados
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.var_resumo = tk.StringVar()
+        tk.Label(self, textvariable=self.var_resumo, justify=tk.LEFT,
+                 anchor='w').grid(row=0, column=0, sticky='ew', padx=10,
+                                  pady=(10, 5))
+
+        colunas = ('categoria', 'quantidade', 'p50', 'p95', 'maximo',
+                   'total')
+        self.tabela = ttk.Treeview(self, columns=colunas)
+        self.tabela.heading('#0', text='Trecho')
+        self.tabela.column('#0', width=260)
+        for coluna, titulo in zip(colunas, ('Categoria', 'Qtd.', 'p50',
+                                             'p95', 'Máx.', 'Total')):
+            self.tabela.heading(coluna, text=titulo)
+            self.tabela.column(coluna, width=70, anchor='e')
+        self.tabela.grid(row=1, column=0, sticky='nsew', padx=10)
+
+        botoes = tk.Frame(self)
+        botoes.grid(row=2, column=0, pady=10)
+        tk.Button(botoes, text='Exportar trace...',
+                  command=self._exportar).pack(side=tk.LEFT, padx=5)
+        tk.Button(botoes, text='Limpar',
+                  command=self._limpar).pack(side=tk.LEFT, padx=5)
+        if memoria_rastreada() is not None:
+            tk.Button(botoes, text='Maiores alocações...',
+                      command=self._mostrar_alocacoes).pack(side=tk.LEFT,
+                                                            padx=5)
+
+        self._id_after = None
+        self.atualizar()
+
+    def atualizar(self):
+        """Relê os intervalos e os contadores e agenda a próxima leitura."""
+        self.var_resumo.set(self._texto_resumo())
+        self.tabela.delete(*self.tabela.get_children())
+        for trecho in intervalos.percentis():
+            self.tabela.insert('', tk.END, text=trecho['nome'], values=(
+                trecho['categoria'], trecho['quantidade'],
+                _ms(trecho['p50']), _ms(trecho['p95']),
+                _ms(trecho['maximo']), _ms(trecho['total'])))
+        self._id_after = self.after(INTERVALO_ATUALIZACAO, self.atualizar)
+
+    def _texto_resumo(self):
+        """Linhas com os contadores do cache, da API e do gateway."""
+        linhas = []
+        cache = getattr(self.cliente, 'cache', None)
+        if cache is not None:
+            c = cache.resumo()
+            linhas.append(
+                f"Cache: {c['taxa_acertos']:.0%} de acertos "
+                f"({c['acertos']} frescos, {c['obsoletos']} vencidos, "
+                f"{c['faltas']} buscas) — {c['bytes'] / 1024:.0f} KiB")
+        estatisticas = getattr(self.cliente, 'estatisticas', None)
+        if estatisticas is not None:
+            e = estatisticas.resumo()
+            linhas.append(
+                f"API: {e['requisicoes']} requisições, {e['falhas']} falhas, "
+                f"{e['nao_modificadas']} não modificadas, latência média "
+                f"{_ms(e['latencia_media'])}")
+        gateway = getattr(self.cliente, 'gateway', None)
+        if gateway is not None:
+            g = gateway.resumo()
+            linhas.append(
+                f"Gateway: {g['em_andamento']} em andamento de até "
+                f"{g['limite_concorrencia']}, {g['em_fila']} na fila, "
+                f"espera média {_ms(g['espera_media'])}, "
+                f"{g['juntadas']} juntadas, "
+                f"{g['sobrecargas']} sobrecargas (429/503)")
+        if self.telas is not None:
+            t = self.telas.resumo()
+            linhas.append(
+                f"Telas: {t['guardadas']} guardadas (máx. {t['maximo']}), "
+                f"{t['reaproveitadas']} reaproveitadas, "
+                f"{t['criadas']} criadas")
+        if self.memoria is not None:
+            partes = [f"{area} {m['estimado'] / MB:.1f} de "
+                      f"{m['orcamento'] / MB:.0f} MiB "
+                      f"({m['liberado'] / MB:.1f} liberados)"
+                      for area, m in self.memoria.resumo().items()]
+            if self.dados is not None and self.dados.descarregados:
+                partes.append(f"{self.dados.descarregados} veículos no disco")
+            linhas.append('Memória: ' + ', '.join(partes))
+        rastreada = memoria_rastreada()
+        if rastreada is not None:
+            linhas.append(f"tracemalloc: {rastreada[0] / MB:.1f} MiB "
+                          f"alocados (pico {rastreada[1] / MB:.1f} MiB)")
+        return '\n'.join(linhas) or 'Fonte de dados local (sem rede).'
+
+    def _mostrar_alocacoes(self):
+        """Lista os trechos do código com mais memória alocada."""
+        texto = '\n'.join(f'{tamanho / 1024:10.0f} KiB  {local}'
+                          for local, tamanho in maiores_alocacoes())
+        messagebox.showinfo('Maiores alocações', texto or 'Nada rastreado.',
+                            parent=self)
+
+    def _exportar(self):
+        """Grava os intervalos como trace do Chrome (.json) ou JSONL."""
+        caminho = filedialog.asksaveasfilename(
+            parent=self, defaultextension='.json',
+            filetypes=[('Trace do Chrome', '*.json'),
+                       ('JSON Lines', '*.jsonl')])
+        if not caminho:
+            return
+        try:
+            if caminho.endswith('.jsonl'):
+                quantidade = intervalos.exportar_jsonl(caminho)
+            else:
+                quantidade = intervalos.exportar_chrome_trace(caminho)
+        except OSError as e:
+            messagebox.showerror('Erro ao Exportar', str(e), parent=self)
+            return
+        messagebox.showinfo('Sucesso',
+                            f'{quantidade} intervalos gravados em:\n{caminho}',
+                            parent=self)
+
+    def _limpar(self):
+        intervalos.limpar()
+        if self._id_after:
+            self.after_cancel(self._id_after)
+        self.atualizar()
+
+    def destroy(self):
+        """Para as atualizações antes de fechar."""
+        if self._id_after:
+            self.after_cancel(self._id_after)
+            self._id_after = None
+        super().destroy()
+
+
+def _ms(segundos):
+    """Ex: 0.01234 -> '12.3 ms'."""
+    return f'{segundos * 1000:.1f} ms'
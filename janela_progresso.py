@@ -0,0 +1,50 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class JanelaProgresso(tk.Toplevel):
+    """
+    Janela pequena com uma barra de progresso para operações longas feitas
+    em segundo plano (ex: importação de arquivos), com botão de cancelar.
+    """
+    def __init__(self, parent, titulo, ao_cancelar=None):
+        """
+        Construtor da JanelaProgresso.
+
+        :param parent: A janela principal (tk.Tk).
+        :param titulo: (str) Título da janela.
+        :param ao_cancelar: (function, opcional) Callback para o botão
+                            'Cancelar'.
+        """
+        super().__init__(parent)
+        self.title(titulo)
+        self.resizable(False, False)
+        self.transient(parent)
+        self.ao_cancelar = ao_cancelar
+
+        self.var_texto = tk.StringVar(value="Preparando...")
+        tk.Label(self, textvariable=self.var_texto, width=50,
+                 anchor='w').pack(padx=10, pady=(10, 5), fill=tk.X)
+        self.barra = ttk.Progressbar(self, length=360, maximum=1.0)
+        self.barra.pack(padx=10, pady=5)
+        if ao_cancelar:
+            tk.Button(self, text="Cancelar",
+                      command=self._cancelar).pack(pady=(5, 10))
+        # Fechar a janela equivale a cancelar.
+        self.protocol('WM_DELETE_WINDOW', self._cancelar)
+
+    def atualizar(self, fracao, texto):
+        """
+        Atualiza a barra e a mensagem.
+
+        :param fracao: (float) Progresso, de 0 a 1.
+        :param texto: (str) Mensagem exibida acima da barra.
+        """
+        self.barra['value'] = fracao
+        self.var_texto.set(texto)
+
+    def _cancelar(self):
+        """Pede o cancelamento da operação e avisa o usuário."""
+        if self.ao_cancelar:
+            self.ao_cancelar()
+            self.var_texto.set("Cancelando...")
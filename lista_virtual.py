@@ -0,0 +1,141 @@
+import tkinter as tk
+from tkinter import ttk
+from diagnostico import cronometrado
+
+
+class ListaVirtual(tk.Frame):
+    """
+    Lista rolável de Radiobuttons que só cria widgets para as linhas visíveis.
+
+    Em vez de um Radiobutton por item, mantém um pequeno conjunto de linhas
+    (do tamanho da área visível) que é reaproveitado durante a rolagem: ao
+    rolar, cada linha apenas troca de texto, valor e posição. Assim, o custo
+    de exibir ou rolar a lista não depende da quantidade de itens.
+    """
+    def __init__(self, parent, variable, command=None, altura_linha=26,
+                 ao_destacar=None):
+        """
+        Construtor da ListaVirtual.
+
+        :param parent: O widget pai.
+        :param variable: (tk.StringVar) Variável de controle compartilhada
+        pelos Radiobuttons; recebe o 'codigo' do item escolhido.
+        :param command: (function, opcional) Chamada ao clicar em uma opção.
+        :param altura_linha: (int) Altura, em pixels, de cada linha.
+        :param ao_destacar: (function, opcional) Chamada com o item quando o
+        mouse passa sobre uma opção ou ela recebe o foco do teclado.
+        """
+        super().__init__(parent)
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.variable = variable
+        self.command = command
+        self.ao_destacar = ao_destacar
+        self.altura_linha = altura_linha
+        # Itens exibidos, no formato {'nome': ..., 'codigo': ...}.
+        self.itens = []
+        # Linhas reaproveitáveis: [radiobutton, id da janela no canvas,
+        # índice do item exibido atualmente].
+        self._linhas = []
+        self._id_mensagem = None
+
+        self.canvas = tk.Canvas(self, highlightthickness=0,
+                                yscrollincrement=altura_linha)
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical',
+                                       command=self.canvas.yview)
+        # O canvas avisa toda mudança de posição; é nesse momento que as
+        # linhas são reposicionadas.
+        self.canvas.configure(yscrollcommand=self._ao_rolar)
+        self.canvas.grid(row=0, column=0, sticky='nsew')
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
+
+        self.canvas.bind('<Configure>', self._ao_redimensionar)
+        self._ligar_roda_do_mouse(self.canvas)
+
+    @cronometrado('desenho')
+    def definir_itens(self, itens):
+        """
+        Substitui os itens da lista e volta ao topo.
+
+        :param itens: (list) Lista de dicionários com 'nome' e 'codigo'.
+        """
+        self.itens = itens
+        self._remover_mensagem()
+        for linha in self._linhas:
+            linha[2] = None
+        self.canvas.configure(scrollregion=(
+            0, 0, self.canvas.winfo_width(), len(itens) * self.altura_linha))
+        self.canvas.yview_moveto(0)
+        self._redesenhar()
+
+    def exibir_mensagem(self, texto):
+        """Esconde os itens e exibe apenas uma mensagem (ex: 'Carregando...')."""
+        self.definir_itens([])
+        self._id_mensagem = self.canvas.create_text(
+            10, 5, text=texto, anchor='nw')
+
+    def _remover_mensagem(self):
+        """Remove a mensagem exibida por `exibir_mensagem`, se houver."""
+        if self._id_mensagem is not None:
+            self.canvas.delete(self._id_mensagem)
+            self._id_mensagem = None
+
+    def _ao_rolar(self, primeiro, ultimo):
+        """Sincroniza a scrollbar e redesenha as linhas visíveis."""
+        self.scrollbar.set(primeiro, ultimo)
+        self._redesenhar()
+
+    def _ao_redimensionar(self, event):
+        """Ajusta o número de linhas ao novo tamanho da área visível."""
+        necessarias = event.height // self.altura_linha + 2
+        while len(self._linhas) < necessarias:
+            radio = tk.Radiobutton(self.canvas, variable=self.variable,
+                                   command=self.command, anchor='w')
+            self._ligar_roda_do_mouse(radio)
+            janela = self.canvas.create_window(10, 0, window=radio,
+                                               anchor='nw', state='hidden')
+            linha = [radio, janela, None]
+            self._linhas.append(linha)
+            if self.ao_destacar:
+                radio.bind('<Enter>', lambda e, l=linha: self._destacar(l))
+                radio.bind('<FocusIn>', lambda e, l=linha: self._destacar(l))
+        for _, janela, _ in self._linhas:
+            self.canvas.itemconfigure(janela, width=max(event.width - 20, 1))
+        self.canvas.configure(scrollregion=(
+            0, 0, event.width, len(self.itens) * self.altura_linha))
+        self._redesenhar()
+
+    def _redesenhar(self):
+        """Associa cada linha reaproveitável a um item visível."""
+        primeiro = max(int(self.canvas.canvasy(0)) // self.altura_linha, 0)
+        for deslocamento, linha in enumerate(self._linhas):
+            radio, janela, atual = linha
+            indice = primeiro + deslocamento
+            if indice >= len(self.itens):
+                self.canvas.itemconfigure(janela, state='hidden')
+                linha[2] = None
+                continue
+            # Só reconfigura a linha se ela passou a mostrar outro item.
+            if atual != indice:
+                item = self.itens[indice]
+                radio.configure(text=item['nome'], value=item['codigo'])
+                self.canvas.coords(janela, 10, indice * self.altura_linha)
+                self.canvas.itemconfigure(janela, state='normal')
+                linha[2] = indice
+
+    def _destacar(self, linha):
+        """Avisa qual item está sob o mouse (ou com o foco)."""
+        indice = linha[2]
+        if indice is not None and indice < len(self.itens):
+            self.ao_destacar(self.itens[indice])
+
+    def _ligar_roda_do_mouse(self, widget):
+        """Permite rolar a lista com a roda do mouse sobre o widget."""
+        widget.bind('<MouseWheel>', lambda e: self.canvas.yview_scroll(
+            -1 if e.delta > 0 else 1, 'units'))
+        # No Linux a roda do mouse gera os eventos Button-4 e Button-5.
+        widget.bind('<Button-4>',
+                    lambda e: self.canvas.yview_scroll(-1, 'units'))
+        widget.bind('<Button-5>',
+                    lambda e: self.canvas.yview_scroll(1, 'units'))
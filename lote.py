@@ -0,0 +1,258 @@
+"""
+Consulta de preços em lote, para listas grandes de veículos (ex: frotas).
+
+Uso pela linha de comando:
+
+    python lote.py frota.csv --saida precos.jsonl --concorrencia 8 --taxa 5
+
+A entrada pode ser CSV ou JSONL. Cada linha identifica um veículo pelos
+códigos da API (colunas `tipo`, `marca`, `modelo`, `ano`) ou pelo Código
+FIPE (coluna `codigo_fipe`, com `ano` opcional). Consultas idênticas são
+feitas uma única vez e os resultados são gravados, em JSONL, assim que
+ficam prontos.
+
+Os valores vêm da fonte escolhida com `--fonte` (a API, por padrão; ver
+fontes.py). Os Códigos FIPE são localizados no snapshot, quando ele é a
+fonte (`--snapshot ARQUIVO` é o mesmo que `--fonte snapshot:ARQUIVO`), ou
+no índice de códigos em disco (ver codigos_fipe.py), que cresce com cada
+valor consultado por código da API.
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from codigos_fipe import IndiceCodigosFipe
+from fontes import ErroFonte, abrir_fonte
+from gateway import GatewayFipe, LimitadorTaxa
+
+# Aceita o tipo pelo nome usado nas URLs ou pelo código numérico da FIPE.
+TIPOS = {'carros': 'carros', 'motos': 'motos', 'caminhoes': 'caminhoes',
+         '1': 'carros', '2': 'motos', '3': 'caminhoes'}
+
+
+def ler_entradas(caminho):
+    """
+    Lê as linhas de um arquivo CSV ou JSONL, uma de cada vez.
+
+    :param caminho: (str) Arquivo de entrada; '-' lê JSONL da entrada padrão.
+    :return: Gerador de dicionários.
+    """
+    if caminho == '-':
+        for linha in sys.stdin:
+            if linha.strip():
+                yield json.loads(linha)
+        return
+    with open(caminho, 'r', encoding='utf-8', newline='') as f:
+        if caminho.lower().endswith('.csv'):
+            yield from csv.DictReader(f)
+        else:
+            for linha in f:
+                if linha.strip():
+                    yield json.loads(linha)
+
+
+class PrecificadorLote:
+    """
+    Resolve o preço de muitos veículos em paralelo, sem repetir consultas.
+    """
+    def __init__(self, cliente, concorrencia=8, localizador=None,
+                 indice=None):
+        """
+        :param cliente: (ClienteFipe) Cliente usado nas consultas de valor.
+        :param concorrencia: (int) Consultas simultâneas.
+        :param localizador: (opcional) Objeto com `localizar_codigo_fipe`
+        (ex: SnapshotFipe), necessário para linhas que só têm o Código FIPE.
+        :param indice: (IndiceCodigosFipe, opcional) Recebe o Código FIPE de
+        cada valor consultado pelos códigos da API.
+        """
+        self.cliente = cliente
+        self.concorrencia = concorrencia
+        self.localizador = localizador
+        self.indice = indice
+        # Máximo de consultas enviadas ao pool e ainda não concluídas, para
+        # não carregar o arquivo inteiro na memória de uma vez.
+        self.janela = concorrencia * 4
+        self.linhas = 0
+        self.consultas = 0
+        self.erros = 0
+        self._inicio = None
+
+    def _chave(self, entrada):
+        """
+        Identifica a consulta necessária para uma linha de entrada. Linhas
+        com a mesma chave compartilham o mesmo resultado.
+        """
+        codigo_fipe = str(entrada.get('codigo_fipe') or
+                          entrada.get('CodigoFipe') or '').strip()
+        ano = str(entrada.get('ano') or '').strip() or None
+        if codigo_fipe:
+            return ('fipe', codigo_fipe, ano)
+        tipo = TIPOS.get(str(entrada.get('tipo', '')).strip().lower())
+        marca = str(entrada.get('marca') or '').strip()
+        modelo = str(entrada.get('modelo') or '').strip()
+        if not (tipo and marca and modelo and ano):
+            raise ValueError('Informe codigo_fipe ou tipo, marca, modelo '
+                             'e ano.')
+        return ('codigos', tipo, marca, modelo, ano)
+
+    def _resolver(self, chave):
+        """Executa a consulta de uma chave (roda no pool de threads)."""
+        if chave[0] == 'codigos':
+            _, tipo, marca, modelo, ano = chave
+            dados = self.cliente.obter_json(
+                self.cliente.url_valor(tipo, marca, modelo, ano))
+            if self.indice is not None:
+                self.indice.registrar({'tipo': tipo, 'marca': marca,
+                                       'modelo': modelo, 'ano': ano}, dados)
+            return dados
+
+        _, codigo_fipe, ano = chave
+        if self.localizador is None:
+            raise ValueError('Consultas por Código FIPE precisam de um '
+                             'índice (use --snapshot ou --indice).')
+        veiculos = self.localizador.localizar_codigo_fipe(codigo_fipe)
+        if ano:
+            # Aceita o código do ano-modelo ('2014-1') ou só o ano ('2014').
+            veiculos = [v for v in veiculos if v['ano'] == ano or
+                        v['ano'].split('-')[0] == ano]
+        if not veiculos:
+            raise LookupError(f'Código FIPE {codigo_fipe} não encontrado.')
+        resultados = [self.cliente.obter_json(self.cliente.url_valor(
+            v['tipo'], v['marca'], v['modelo'], v['ano'])) for v in veiculos]
+        # Sem ano, retorna todos os anos-modelo daquele Código FIPE.
+        return resultados[0] if ano and len(resultados) == 1 else resultados
+
+    def precificar(self, entradas):
+        """
+        Consulta o preço de cada linha, entregando os resultados conforme
+        ficam prontos (não necessariamente na ordem de entrada).
+
+        :param entradas: (iterable) Dicionários lidos por `ler_entradas`.
+        :return: Gerador de tuplas `(entrada, resultado, erro)`; `erro` é
+        None em caso de sucesso.
+        """
+        self._inicio = time.perf_counter()
+        aguardando = {}  # chave -> linhas de entrada à espera do resultado
+        resolvidos = {}  # chave -> (resultado, erro), para duplicatas tardias
+        futuros = {}     # futuro -> chave
+        with ThreadPoolExecutor(max_workers=self.concorrencia) as executor:
+            for entrada in entradas:
+                self.linhas += 1
+                try:
+                    chave = self._chave(entrada)
+                except ValueError as e:
+                    self.erros += 1
+                    yield entrada, None, str(e)
+                    continue
+                if chave in resolvidos:
+                    if resolvidos[chave][1]:
+                        self.erros += 1
+                    yield (entrada, *resolvidos[chave])
+                    continue
+                if chave in aguardando:
+                    aguardando[chave].append(entrada)
+                    continue
+                aguardando[chave] = [entrada]
+                futuros[executor.submit(self._resolver, chave)] = chave
+                self.consultas += 1
+                if len(futuros) >= self.janela:
+                    yield from self._colher(futuros, aguardando, resolvidos)
+            while futuros:
+                yield from self._colher(futuros, aguardando, resolvidos)
+
+    def _colher(self, futuros, aguardando, resolvidos):
+        """Espera ao menos uma consulta terminar e entrega seus resultados."""
+        prontos, _ = wait(futuros, return_when=FIRST_COMPLETED)
+        for futuro in prontos:
+            chave = futuros.pop(futuro)
+            try:
+                resultado, erro = futuro.result(), None
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                resultado, erro = None, str(e)
+            resolvidos[chave] = (resultado, erro)
+            for entrada in aguardando.pop(chave):
+                if erro:
+                    self.erros += 1
+                yield entrada, resultado, erro
+
+    def relatorio(self):
+        """Resumo de vazão da última execução de `precificar`."""
+        decorrido = time.perf_counter() - self._inicio if self._inicio else 0
+        return {
+            'linhas': self.linhas,
+            'consultas_unicas': self.consultas,
+            'erros': self.erros,
+            'segundos': decorrido,
+            'linhas_por_segundo': self.linhas / decorrido if decorrido else 0,
+        }
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description='Consulta preços FIPE em lote a partir de CSV ou JSONL.')
+    parser.add_argument('entrada', help="arquivo CSV/JSONL ('-' para stdin)")
+    parser.add_argument('--saida', help='arquivo JSONL de saída '
+                        '(padrão: saída padrão)')
+    parser.add_argument('--concorrencia', type=int, default=8,
+                        help='consultas simultâneas')
+    parser.add_argument('--taxa', type=float, default=5.0,
+                        help='máximo de requisições por segundo à API')
+    parser.add_argument('--fonte', metavar='FONTE',
+                        help="origem dos dados: 'api' (padrão), 'api:URL', "
+                        "'snapshot:ARQUIVO', 'fixture:ARQUIVO' ou "
+                        "'fixture:sintetica' (ver fontes.py)")
+    parser.add_argument('--snapshot', metavar='ARQUIVO',
+                        help='consulta um snapshot local, que também localiza '
+                        "os Códigos FIPE; o mesmo que --fonte snapshot:ARQUIVO")
+    parser.add_argument('--indice', metavar='ARQUIVO',
+                        help='índice de Códigos FIPE (padrão: o da '
+                        'aplicação, em ~/.tabela_fipe)')
+    args = parser.parse_args(argv)
+
+    especificacao = args.fonte or (f'snapshot:{args.snapshot}'
+                                   if args.snapshot else 'api')
+    try:
+        cliente = abrir_fonte(especificacao,
+                              gateway=GatewayFipe(
+                                  LimitadorTaxa(args.taxa),
+                                  concorrencia_inicial=args.concorrencia,
+                                  concorrencia_maxima=args.concorrencia),
+                              tamanho_pool=args.concorrencia)
+    except ErroFonte as e:
+        parser.error(str(e))
+    indice = IndiceCodigosFipe(args.indice)
+    # Um snapshot já sabe localizar os Códigos FIPE de todo o catálogo.
+    localizador = (cliente if hasattr(cliente, 'localizar_codigo_fipe')
+                   else indice)
+    precificador = PrecificadorLote(cliente, args.concorrencia, localizador,
+                                    indice)
+
+    saida = (open(args.saida, 'w', encoding='utf-8') if args.saida
+             else sys.stdout)
+    try:
+        for entrada, resultado, erro in precificador.precificar(
+                ler_entradas(args.entrada)):
+            registro = {'entrada': entrada}
+            if erro:
+                registro['erro'] = erro
+            else:
+                registro['resultado'] = resultado
+            saida.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            saida.flush()
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+        indice.fechar()
+
+    r = precificador.relatorio()
+    print(f"{r['linhas']} linhas, {r['consultas_unicas']} consultas únicas, "
+          f"{r['erros']} erros em {r['segundos']:.1f}s "
+          f"({r['linhas_por_segundo']:.1f} linhas/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,89 @@
-import tkinter as tk
-from app import App
+import argparse
+import logging
+import time
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = App(root)
-    root.mainloop()
\ No newline at end of file
+    inicio = time.perf_counter()
+    parser = argparse.ArgumentParser(description='Consulta Tabela FIPE')
+    parser.add_argument('--fonte', metavar='FONTE',
+                        help="origem dos dados: 'api' (padrão), 'api:URL', "
+                        "'snapshot:ARQUIVO', 'fixture:ARQUIVO' ou "
+                        "'fixture:sintetica' (ver fontes.py)")
+    parser.add_argument('--snapshot', metavar='ARQUIVO',
+                        help='usa um snapshot local (gerado por snapshot.py) '
+                        "no lugar da API; o mesmo que --fonte snapshot:ARQUIVO")
+    parser.add_argument('--servidor', metavar='[HOST:]PORTA',
+                        help='roda sem interface, servindo a consulta como '
+                        'uma API HTTP/JSON local')
+    parser.add_argument('--log', default='WARNING', type=str.upper,
+                        choices=('DEBUG', 'INFO', 'WARNING', 'ERROR',
+                                 'CRITICAL'),
+                        help='nível do log; DEBUG inclui cada intervalo de '
+                        'tempo medido (padrão: WARNING)')
+    parser.add_argument('--trace', metavar='ARQUIVO',
+                        help='ao sair, grava os tempos medidos como trace do '
+                        'Chrome (abra em chrome://tracing ou ui.perfetto.dev)')
+    parser.add_argument('--tempo-inicio', action='store_true',
+                        help='informa quanto tempo a janela levou para '
+                        'aparecer (detalhes das importações: python inicio.py)')
+    parser.add_argument('--sem-precarga', action='store_true',
+                        help='não importa em segundo plano os módulos do '
+                        'gráfico e da rede depois que a janela aparece')
+    parser.add_argument('--memoria-sessao', type=float, metavar='MB',
+                        help='memória para os veículos da sessão; acima '
+                        'disso, os usados há mais tempo vão para o disco '
+                        '(padrão: 64)')
+    parser.add_argument('--memoria-caches', type=float, metavar='MB',
+                        help='memória para os índices do catálogo e dos '
+                        'Códigos FIPE (padrão: 128)')
+    parser.add_argument('--rastrear-memoria', action='store_true',
+                        help='mede a memória alocada com o tracemalloc '
+                        '(exibida na janela de diagnóstico; deixa a '
+                        'aplicação mais lenta)')
+    args = parser.parse_args()
+    if args.rastrear_memoria:
+        from memoria import iniciar_rastreamento
+        iniciar_rastreamento()
+    logging.basicConfig(level=args.log,
+                        format='%(asctime)s %(name)s %(levelname)s '
+                        '%(message)s')
+
+    from fontes import ErroFonte, abrir_fonte
+    especificacao = args.fonte or (f'snapshot:{args.snapshot}'
+                                   if args.snapshot else 'api')
+    try:
+        cliente = abrir_fonte(especificacao)
+    except ErroFonte as e:
+        parser.error(str(e))
+
+    if args.servidor:
+        # Sem Tkinter: o modo servidor roda em máquinas sem display.
+        from servidor import endereco, executar
+        executar(cliente, *endereco(args.servidor))
+    else:
+        import tkinter as tk
+        from diagnostico import medir
+        from memoria import MB, GerenciadorMemoria
+        with medir('inicio', 'importar app'):
+            from app import App
+        orcamentos = {area: megas * MB for area, megas in (
+            ('sessao', args.memoria_sessao), ('caches', args.memoria_caches))
+            if megas is not None}
+        with medir('inicio', 'primeira janela'):
+            root = tk.Tk()
+            app = App(root, cliente=cliente,
+                      memoria=GerenciadorMemoria(orcamentos))
+            root.update_idletasks()
+        if args.tempo_inicio:
+            print(f'Janela pronta em '
+                  f'{(time.perf_counter() - inicio) * 1000:.0f} ms')
+        if not args.sem_precarga:
+            from inicio import precarregar
+            # Só depois de desenhada a primeira tela.
+            root.after_idle(precarregar)
+        root.mainloop()
+        app.encerrar()
+
+    if args.trace:
+        from diagnostico import intervalos
+        intervalos.exportar_chrome_trace(args.trace)
@@ -0,0 +1,261 @@
+"""
+Orçamentos de memória da sessão.
+
+Em uma sessão longa (ex: um quiosque aberto o dia inteiro), os veículos
+carregados e os índices mantidos em memória crescem sem limite. O
+`GerenciadorMemoria` guarda um orçamento, em bytes, para cada área:
+
+- 'sessao': os veículos da sessão (`App.dados`);
+- 'caches': os índices em memória (catálogo de modelos e Códigos FIPE).
+
+Cada área tem consumidores registrados, com `memoria_estimada()` e
+`liberar(bytes)`. A aplicação chama `verificar` de tempos em tempos: numa
+área acima do orçamento, os consumidores liberam memória até `FOLGA` do
+orçamento — a coleção descarrega para o disco os veículos usados há mais
+tempo e os índices esquecem as entradas menos usadas, relidas do disco
+quando pedidas de novo. Com um agendador, a coleção grava no disco fora da
+thread da interface (`liberar_em_segundo_plano`), em lotes, e a memória é
+liberada quando a gravação termina.
+
+As estimativas não percorrem os dados, para que a verificação seja
+barata. A memória de fato alocada é medida pelo tracemalloc: com
+`python main.py --rastrear-memoria`, a janela de diagnóstico mostra o
+total rastreado e os trechos que mais alocam. Para conferir as
+estimativas contra o tracemalloc:
+
+    python memoria.py                    # 20 mil veículos sintéticos
+    python memoria.py --veiculos 100000
+"""
+import argparse
+import gc
+import logging
+import os
+import sys
+import tracemalloc
+from functools import partial
+
+MB = 1024 * 1024
+# Orçamento padrão de cada área, em bytes.
+ORCAMENTOS = {'sessao': 64 * MB, 'caches': 128 * MB}
+# Ao passar do orçamento, libera até esta fração dele, para não voltar a
+# liberar na verificação seguinte.
+FOLGA = 0.8
+# Intervalo, em milissegundos, entre as verificações da aplicação.
+INTERVALO_VERIFICACAO = 5000
+# Intervalo até a próxima verificação quando a anterior agendou uma
+# descarga: os lotes seguem um após o outro até caber no orçamento.
+INTERVALO_DESCARGA = 250
+# Trechos listados em `maiores_alocacoes`.
+LINHAS_ALOCACOES = 10
+# Razão aceita entre a estimativa e a medição em `python memoria.py`.
+TOLERANCIA_ESTIMATIVA = 2.0
+
+logger = logging.getLogger(__name__)
+
+
+class GerenciadorMemoria:
+    """
+    Orçamento de memória de cada área e os consumidores que a ocupam.
+    """
+    def __init__(self, orcamentos=None):
+        """
+        :param orcamentos: (dict, opcional) Bytes por área; as áreas
+        omitidas ficam com o valor de `ORCAMENTOS`.
+        """
+        self.orcamentos = dict(ORCAMENTOS, **(orcamentos or {}))
+        self._consumidores = {area: [] for area in self.orcamentos}
+        # Bytes liberados por área desde o início, para o diagnóstico.
+        self.liberados = dict.fromkeys(self.orcamentos, 0)
+
+    def registrar(self, area, consumidor):
+        """
+        :param area: (str) 'sessao' ou 'caches'.
+        :param consumidor: Objeto com `memoria_estimada()` e
+        `liberar(bytes)`. Os primeiros registrados liberam primeiro.
+        """
+        self._consumidores[area].append(consumidor)
+
+    def estimativa(self, area):
+        """:return: (int) Bytes estimados ocupados pela área."""
+        return sum(consumidor.memoria_estimada()
+                   for consumidor in self._consumidores[area])
+
+    def verificar(self, agendador=None):
+        """
+        Libera memória nas áreas que passaram do orçamento.
+
+        :param agendador: (Agendador, opcional) Com ele, os consumidores que
+        têm `liberar_em_segundo_plano` fazem a parte lenta (ex: gravar no
+        disco) fora da thread da interface; a memória deles é liberada e
+        contada quando a tarefa termina.
+        :return: (dict) {area: bytes liberados ou agendados}, só das áreas
+        acima do orçamento.
+        """
+        liberados = {}
+        for area, orcamento in self.orcamentos.items():
+            uso = self.estimativa(area)
+            if uso <= orcamento:
+                continue
+            excesso = uso - int(orcamento * FOLGA)
+            total = agendado = 0
+            for consumidor in self._consumidores[area]:
+                if total + agendado >= excesso:
+                    break
+                if agendador is not None and hasattr(
+                        consumidor, 'liberar_em_segundo_plano'):
+                    agendado += consumidor.liberar_em_segundo_plano(
+                        excesso - total - agendado, agendador,
+                        partial(self._contar_liberados, area))
+                else:
+                    total += consumidor.liberar(excesso - total - agendado)
+            self.liberados[area] += total
+            liberados[area] = total + agendado
+            # Sem nada mais a liberar (ou com a liberação anterior ainda em
+            # andamento), o aviso se repetiria a cada verificação.
+            logger.log(logging.INFO if total or agendado else logging.DEBUG,
+                       "Memória '%s' acima do orçamento (%.1f de %.1f MiB): "
+                       "%.1f MiB liberados, %.1f MiB em segundo plano.", area,
+                       uso / MB, orcamento / MB, total / MB, agendado / MB)
+        return liberados
+
+    def _contar_liberados(self, area, total):
+        """Soma a memória liberada por uma tarefa em segundo plano."""
+        self.liberados[area] += total
+        logger.debug("Memória '%s': %.1f MiB liberados em segundo plano.",
+                     area, total / MB)
+
+    def resumo(self):
+        """
+        :return: (dict) {area: {'estimado', 'orcamento', 'liberado'}}, em
+        bytes.
+        """
+        return {area: {'estimado': self.estimativa(area),
+                       'orcamento': orcamento,
+                       'liberado': self.liberados[area]}
+                for area, orcamento in self.orcamentos.items()}
+
+
+# --- Rastreamento (tracemalloc) ---
+def iniciar_rastreamento(quadros=1):
+    """
+    Liga o tracemalloc. Deixa as alocações mais lentas: use só para medir.
+
+    :param quadros: (int) Quadros da pilha guardados por alocação.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(quadros)
+
+
+def memoria_rastreada():
+    """
+    :return: (tuple) `(atual, pico)` em bytes, ou None se o rastreamento
+    não estiver ligado.
+    """
+    if not tracemalloc.is_tracing():
+        return None
+    return tracemalloc.get_traced_memory()
+
+
+def maiores_alocacoes(linhas=LINHAS_ALOCACOES):
+    """
+    Trechos do código com mais memória alocada (e ainda não liberada).
+
+    :return: (list) Tuplas `('arquivo.py:linha', bytes)`; vazia se o
+    rastreamento não estiver ligado.
+    """
+    if not tracemalloc.is_tracing():
+        return []
+    foto = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__),))
+    return [(f'{os.path.basename(item.traceback[0].filename)}:'
+             f'{item.traceback[0].lineno}', item.size)
+            for item in foto.statistics('lineno')[:linhas]]
+
+
+def medir_pegada(construir):
+    """
+    Memória retida pelo objeto criado por `construir`, pelo tracemalloc.
+    Alocações fora do Python (ex: as páginas do SQLite) não entram.
+
+    :param construir: (function) Cria o objeto; chamada sem argumentos.
+    :return: (tuple) `(objeto, bytes)`.
+    """
+    ligado = tracemalloc.is_tracing()
+    if not ligado:
+        tracemalloc.start()
+    try:
+        gc.collect()
+        antes = tracemalloc.get_traced_memory()[0]
+        objeto = construir()
+        gc.collect()
+        return objeto, tracemalloc.get_traced_memory()[0] - antes
+    finally:
+        if not ligado:
+            tracemalloc.stop()
+
+
+def conferir_estimativas(veiculos=20_000):
+    """
+    Compara, para cada consumidor, a memória estimada com a medida pelo
+    tracemalloc, com dados sintéticos.
+
+    :param veiculos: (int) Tamanho da coleção e do índice de Códigos FIPE.
+    :return: (list) Dicts com 'consumidor', 'medido' e 'estimado'.
+    """
+    from catalogo import CatalogoModelos
+    from codigos_fipe import IndiceCodigosFipe
+    from colecao import ColecaoVeiculos
+    from fontes import FixtureFipe, gerar_veiculos
+
+    def medir(nome, construir):
+        objeto, medido = medir_pegada(construir)
+        resultados.append({'consumidor': nome, 'medido': medido,
+                           'estimado': objeto.memoria_estimada()})
+        return objeto
+
+    def registrar_codigos():
+        indice = IndiceCodigosFipe(':memory:')
+        indice.registrar_varios(
+            ({'tipo': 'carros', 'marca': '1', 'modelo': str(i // 10),
+              'ano': f'{2000 + i % 10}-1'}, veiculo)
+            for i, veiculo in enumerate(gerar_veiculos(veiculos)))
+        return indice
+
+    resultados = []
+    fixture = FixtureFipe.sintetica(marcas=90, modelos=40, anos=1)
+    iniciar_rastreamento()
+    colecao = medir('ColecaoVeiculos', lambda: ColecaoVeiculos(
+        gerar_veiculos(veiculos)))
+    # Com todos os veículos no disco (a variação medida é negativa).
+    _, variacao = medir_pegada(lambda: colecao.descarregar(len(colecao)))
+    resultados.append({'consumidor': 'ColecaoVeiculos (no disco)',
+                       'medido': resultados[-1]['medido'] + variacao,
+                       'estimado': colecao.memoria_estimada()})
+    colecao.fechar()
+    medir('CatalogoModelos', lambda: CatalogoModelos(fixture).construir())
+    medir('IndiceCodigosFipe', registrar_codigos).fechar()
+    tracemalloc.stop()
+    return resultados
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description='Confere as estimativas de memória com o tracemalloc.')
+    parser.add_argument('--veiculos', type=int, default=20_000,
+                        help='veículos na coleção de teste')
+    args = parser.parse_args(argv)
+
+    fora = 0
+    print(f"{'consumidor':32} {'medido':>10} {'estimado':>10}  razão")
+    for r in conferir_estimativas(args.veiculos):
+        razao = r['estimado'] / max(r['medido'], 1)
+        if not 1 / TOLERANCIA_ESTIMATIVA <= razao <= TOLERANCIA_ESTIMATIVA:
+            fora += 1
+        print(f"{r['consumidor']:32} {r['medido'] / MB:8.1f}MB "
+              f"{r['estimado'] / MB:8.1f}MB  {razao:.2f}")
+    return 1 if fora else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
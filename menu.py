@@ -8,7 +8,12 @@ class Menu:
     os comandos (callbacks) fornecidos.
     """
     def __init__(self, root_window, restart_command=None, open_command=None, 
-                save_as_command=None, load_graphic=None,about_us=None):
+                save_as_command=None, back_command=None,
+                search_command=None, fipe_code_command=None, load_graphic=None,about_us=None,
+                open_folder_command=None, export_command=None,
+                export_catalog_command=None, import_catalog_command=None,
+                update_history_command=None, download_history_command=None,
+                diagnostics_command=None, profile_command=None):
         """
         Construtor da classe Menu.
 
@@ -16,11 +21,33 @@ class Menu:
         será inserido.
         :param restart_command: Callback a ser executado para o item 
         de menu 'Novo'.
+        :param back_command: Callback a ser executado para o item de menu
+        'Voltar' (atalho Alt+Esquerda).
+        :param search_command: Callback a ser executado para o item de menu
+        'Buscar em todo o catálogo...' (atalho Ctrl+F).
+        :param fipe_code_command: Callback a ser executado para o item de
+        menu 'Consultar por Código FIPE...'.
         :param open_command: Callback a ser executado para o item de menu 'Abrir'.
+        :param open_folder_command: Callback a ser executado para o item de
+        menu 'Importar pasta...'.
         :param save_as_command: Callback a ser executado para o item 
         de menu 'Salvar Como...'.
+        :param export_command: Callback a ser executado para o item de
+        menu 'Exportar sessão...'.
+        :param export_catalog_command: Callback a ser executado para o item
+        de menu 'Exportar catálogo...'.
+        :param import_catalog_command: Callback a ser executado para o item
+        de menu 'Importar catálogo...'.
         :param load_graphic: Callback a ser executado para o item de
         menu 'Carregar Gráfico'.
+        :param update_history_command: Callback a ser executado para o item
+        de menu 'Atualizar histórico de preços'.
+        :param download_history_command: Callback a ser executado para o
+        item de menu 'Baixar histórico (12 meses)'.
+        :param diagnostics_command: Callback a ser executado para o item de
+        menu 'Diagnóstico...'.
+        :param profile_command: Callback do item de marcar 'Capturar perfil
+        (cProfile)'; recebe True ao marcar e False ao desmarcar.
         """
         main_menu = tk.Menu(root_window)
         root_window.config(menu=main_menu)
@@ -31,13 +58,43 @@ class Menu:
         # Conecta os itens de menu diretamente aos callbacks fornecidos
         if restart_command:
             file_menu.add_command(label='Novo', command=restart_command)
+
+        if back_command:
+            file_menu.add_command(label='Voltar', accelerator='Alt+←',
+                                  command=back_command)
+
+        if search_command:
+            file_menu.add_command(label='Buscar em todo o catálogo...',
+                                  accelerator='Ctrl+F',
+                                  command=search_command)
+
+        if fipe_code_command:
+            file_menu.add_command(label='Consultar por Código FIPE...',
+                                  command=fipe_code_command)
         
         if open_command:
             file_menu.add_command(label='Abrir', command=open_command)
 
+        if open_folder_command:
+            file_menu.add_command(label='Importar pasta...',
+                                  command=open_folder_command)
+
         if save_as_command:
             file_menu.add_command(label='Salvar como...', command=save_as_command)
 
+        if export_command:
+            file_menu.add_command(label='Exportar sessão...',
+                                  command=export_command)
+
+        if export_catalog_command or import_catalog_command:
+            file_menu.add_separator()
+        if export_catalog_command:
+            file_menu.add_command(label='Exportar catálogo...',
+                                  command=export_catalog_command)
+        if import_catalog_command:
+            file_menu.add_command(label='Importar catálogo...',
+                                  command=import_catalog_command)
+
         
         file_menu.add_separator()
         file_menu.add_command(label='Sair', command=root_window.destroy)
@@ -49,9 +106,25 @@ class Menu:
         if load_graphic:
             graphic_menu.add_command(label='Carregar Gráfico',
                                     command=load_graphic)
+        if update_history_command:
+            graphic_menu.add_command(label='Atualizar histórico de preços',
+                                    command=update_history_command)
+        if download_history_command:
+            graphic_menu.add_command(label='Baixar histórico (12 meses)',
+                                    command=download_history_command)
 
         # -- Menu Help -- 
         help_menu = tk.Menu(main_menu, tearoff=0)
+        if diagnostics_command:
+            help_menu.add_command(label='Diagnóstico...',
+                                  command=diagnostics_command)
+        if profile_command:
+            self.var_perfil = tk.BooleanVar(value=False)
+            help_menu.add_checkbutton(
+                label='Capturar perfil (cProfile)', variable=self.var_perfil,
+                command=lambda: profile_command(self.var_perfil.get()))
+        if diagnostics_command or profile_command:
+            help_menu.add_separator()
         if about_us:
             help_menu.add_command(label='Sobre',command=about_us)
         
@@ -74,9 +147,20 @@ if __name__ == '__main__':
     menu_app = Menu(
         root,
         restart_command=lambda: mock_action("Novo"),
+        back_command=lambda: mock_action("Voltar"),
+        search_command=lambda: mock_action("Buscar no catálogo"),
+        fipe_code_command=lambda: mock_action("Código FIPE"),
         open_command=lambda: mock_action("Abrir"),
+        open_folder_command=lambda: mock_action("Importar pasta"),
         save_as_command=lambda: mock_action("Salvar Como"),
+        export_command=lambda: mock_action("Exportar sessão"),
+        export_catalog_command=lambda: mock_action("Exportar catálogo"),
+        import_catalog_command=lambda: mock_action("Importar catálogo"),
         load_graphic=lambda:mock_action("Gerar Gráfico"),
+        update_history_command=lambda: mock_action("Atualizar histórico"),
+        download_history_command=lambda: mock_action("Baixar histórico"),
+        diagnostics_command=lambda: mock_action("Diagnóstico"),
+        profile_command=lambda ativo: mock_action(f"Perfil {ativo}"),
         about_us=lambda:mock_action('Sobre')
     )
     
@@ -0,0 +1,101 @@
+"""
+Reaproveitamento das telas do assistente.
+
+Em vez de destruir cada tela ao avançar ou voltar, as telas de seleção já
+montadas ficam guardadas (escondidas) em um `PoolTelas`. Ao voltar para uma
+delas, a tela reaparece como foi deixada — com a lista carregada, o texto da
+busca e a posição da rolagem — sem refazer a requisição nem redesenhar a
+lista. O pool tem tamanho limitado: as telas usadas há mais tempo são
+destruídas quando ele enche.
+"""
+from collections import OrderedDict
+
+# Quantas telas manter guardadas, além da que está sendo exibida.
+TELAS_GUARDADAS = 8
+
+
+class PoolTelas:
+    """
+    Telas (frames) já montadas, identificadas por uma chave e guardadas da
+    menos para a mais usada recentemente.
+    """
+    def __init__(self, maximo=TELAS_GUARDADAS):
+        """
+        :param maximo: (int) Quantas telas guardar; ao passar disso, a usada
+        há mais tempo é destruída.
+        """
+        self.maximo = maximo
+        self._telas = OrderedDict()
+        # Contadores para a janela de diagnóstico.
+        self.reaproveitadas = 0
+        self.criadas = 0
+
+    def __len__(self):
+        return len(self._telas)
+
+    def __contains__(self, tela):
+        """Indica se a tela (o frame) está guardada no pool."""
+        return any(guardada is tela for guardada in self._telas.values())
+
+    def obter(self, chave, construir):
+        """
+        Exibe a tela guardada com a chave ou, se não houver, cria uma nova.
+
+        :param chave: (hashable) Identifica a tela (ex: a URL da lista).
+        :param construir: (function) Cria a tela; chamada sem argumentos.
+        Espera-se que a tela se posicione com `grid` ao ser criada.
+        :return: (tk.Frame) A tela, já visível.
+        """
+        tela = self._telas.get(chave)
+        if tela is not None:
+            # Uma tela destruída por fora ou marcada como não reaproveitável
+            # (ex: a requisição falhou) é montada de novo.
+            if tela.winfo_exists() and getattr(tela, 'reutilizavel', True):
+                self._telas.move_to_end(chave)
+                tela.grid()
+                tela.tkraise()
+                self.reaproveitadas += 1
+                return tela
+            self.descartar(chave)
+        tela = construir()
+        self.criadas += 1
+        self._telas[chave] = tela
+        self._liberar_espaco(tela)
+        return tela
+
+    def esconder(self, tela):
+        """
+        Tira a tela de vista sem destruí-la, se ela estiver no pool.
+
+        :return: (bool) False se a tela não é do pool (cabe a quem chamou
+        destruí-la).
+        """
+        if tela not in self:
+            return False
+        tela.grid_remove()
+        return True
+
+    def descartar(self, chave):
+        """Destrói e esquece a tela guardada com a chave, se houver."""
+        tela = self._telas.pop(chave, None)
+        if tela is not None and tela.winfo_exists():
+            tela.destroy()
+
+    def limpar(self):
+        """Destrói todas as telas guardadas."""
+        for chave in list(self._telas):
+            self.descartar(chave)
+
+    def _liberar_espaco(self, atual):
+        """Destrói as telas usadas há mais tempo até caber no limite."""
+        while len(self._telas) > self.maximo + 1:
+            chave, tela = next(iter(self._telas.items()))
+            if tela is atual:
+                break
+            self.descartar(chave)
+
+    def resumo(self):
+        """Contadores do pool, para a janela de diagnóstico."""
+        return {'guardadas': len(self._telas), 'maximo': self.maximo,
+                'reaproveitadas': self.reaproveitadas,
+                'criadas': self.criadas}
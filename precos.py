@@ -0,0 +1,175 @@
+"""
+Conversão e estatísticas dos valores FIPE em lote (NumPy).
+
+A API retorna os preços como texto no formato brasileiro ('R$ 15.342,00').
+As funções deste módulo convertem listas inteiras de uma só vez para um
+array de floats, usando NaN para valores inválidos em vez de interromper o
+processamento, e calculam estatísticas agregadas (por marca, ano...) sem
+laços em Python sobre os veículos.
+"""
+import numpy as np
+
+PERCENTIS_PADRAO = (25, 50, 75)
+
+
+def converter_valores(valores):
+    """
+    Converte valores no formato 'R$ 15.342,00' para um array de floats.
+
+    :param valores: (iterable) Textos no formato da API. Números (int/float)
+    são aceitos como já convertidos.
+    :return: (np.ndarray) Array float64; NaN onde o valor é inválido.
+    """
+    brutos = np.asarray(list(valores), dtype=object)
+    resultado = np.full(brutos.shape, np.nan)
+    if brutos.size == 0:
+        return resultado
+
+    numericos = np.fromiter(
+        (isinstance(v, (int, float)) and not isinstance(v, bool)
+         for v in brutos), dtype=bool, count=brutos.size)
+    resultado[numericos] = brutos[numericos].astype(float)
+
+    textos = brutos[~numericos].astype(str)
+    if textos.size == 0:
+        return resultado
+    # Remove 'R$', os pontos de milhar e troca a vírgula decimal por ponto.
+    limpos = np.char.strip(np.char.replace(textos, 'R$', ''))
+    limpos = np.char.replace(np.char.replace(limpos, '.', ''), ',', '.')
+    # Válido: apenas dígitos, com no máximo um ponto decimal.
+    validos = np.char.isdigit(np.char.replace(limpos, '.', '', count=1))
+    convertidos = np.full(limpos.shape, np.nan)
+    convertidos[validos] = limpos[validos].astype(float)
+    resultado[~numericos] = convertidos
+    return resultado
+
+
+def converter_valor(valor):
+    """
+    Converte um único valor no formato 'R$ 15.342,00' para float. Mais
+    rápido que `converter_valores` quando os valores chegam um a um.
+
+    :param valor: (str | int | float) Texto no formato da API ou número.
+    :return: (float) NaN se o valor for inválido.
+    """
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return float(valor)
+    if not isinstance(valor, str):
+        return np.nan
+    limpo = valor.replace('R$', '').strip().replace('.', '').replace(',', '.')
+    if not limpo.replace('.', '', 1).isdigit():
+        return np.nan
+    return float(limpo)
+
+
+def formatar_valor(valor):
+    """
+    Formata um número no padrão da tabela FIPE.
+
+    :param valor: (float) Ex: 15342.0
+    :return: (str) Ex: 'R$ 15.342,00' ('N/A' para NaN).
+    """
+    if valor is None or np.isnan(valor):
+        return 'N/A'
+    texto = f'{valor:,.2f}'
+    return 'R$ ' + texto.replace(',', '_').replace('.', ',').replace('_', '.')
+
+
+def estatisticas(valores, percentis=PERCENTIS_PADRAO):
+    """
+    Estatísticas de um conjunto de valores, ignorando os inválidos.
+
+    :param valores: (np.ndarray | iterable) Floats ou textos 'R$ ...'.
+    :param percentis: (tuple) Percentis a calcular, de 0 a 100.
+    :return: (dict) contagem, invalidos, minimo, maximo, media, mediana e
+    'p<n>' para cada percentil.
+    """
+    if not isinstance(valores, np.ndarray) or valores.dtype.kind != 'f':
+        valores = converter_valores(valores)
+    validos = valores[~np.isnan(valores)]
+    resumo = {'contagem': int(validos.size),
+              'invalidos': int(valores.size - validos.size)}
+    if validos.size == 0:
+        return resumo
+    resumo.update({
+        'minimo': float(validos.min()),
+        'maximo': float(validos.max()),
+        'media': float(validos.mean()),
+        'mediana': float(np.median(validos)),
+    })
+    for p, valor in zip(percentis, np.percentile(validos, percentis)):
+        resumo[f'p{p}'] = float(valor)
+    return resumo
+
+
+def estatisticas_por(dados, chave, percentis=PERCENTIS_PADRAO):
+    """
+    Estatísticas dos valores agrupados por um campo dos veículos.
+
+    Os grupos são calculados de uma vez: os valores são ordenados por grupo
+    e por valor, e os mínimos, máximos e percentis saem por indexação nas
+    fronteiras de cada grupo.
+
+    :param dados: (list) Dicionários de veículos no formato da API.
+    :param chave: (str) Campo de agrupamento. Ex: 'Marca', 'AnoModelo'.
+    :param percentis: (tuple) Percentis a calcular, de 0 a 100.
+    :return: (dict) {grupo: {contagem, minimo, maximo, media, mediana,
+    p<n>...}}. Veículos sem valor válido são ignorados.
+    """
+    dados = list(dados)
+    grupos = np.asarray([str(d.get(chave, 'N/A')) for d in dados])
+    valores = converter_valores(d.get('Valor') for d in dados)
+    return {str(grupo): resumo for grupo, resumo in
+            estatisticas_agrupadas(grupos, valores, percentis).items()}
+
+
+def estatisticas_agrupadas(grupos, valores, percentis=PERCENTIS_PADRAO):
+    """
+    Estatísticas de valores já convertidos, agrupados por um array paralelo
+    de rótulos (textos ou códigos inteiros).
+
+    :param grupos: (np.ndarray) Grupo de cada valor.
+    :param valores: (np.ndarray) Valores em float; NaN é ignorado.
+    :param percentis: (tuple) Percentis a calcular, de 0 a 100.
+    :return: (dict) {grupo: {contagem, minimo, maximo, media, mediana,
+    p<n>...}}, em ordem crescente de grupo.
+    """
+    validos = ~np.isnan(valores)
+    grupos_brutos, valores = np.asarray(grupos)[validos], valores[validos]
+    if valores.size == 0:
+        return {}
+
+    grupos, inverso = np.unique(grupos_brutos, return_inverse=True)
+    ordem = np.lexsort((valores, inverso))
+    ordenados = valores[ordem]
+    contagem = np.bincount(inverso, minlength=len(grupos))
+    inicio = np.concatenate(([0], np.cumsum(contagem)[:-1]))
+    fim = inicio + contagem - 1
+    soma = np.bincount(inverso, weights=valores, minlength=len(grupos))
+
+    colunas = {
+        'contagem': contagem,
+        'minimo': ordenados[inicio],
+        'maximo': ordenados[fim],
+        'media': soma / contagem,
+        'mediana': _percentil_ordenado(ordenados, inicio, contagem, 50),
+    }
+    for p in percentis:
+        colunas[f'p{p}'] = _percentil_ordenado(ordenados, inicio, contagem, p)
+
+    return {grupo: {nome: (int(coluna[i]) if nome == 'contagem'
+                           else float(coluna[i]))
+                    for nome, coluna in colunas.items()}
+            for i, grupo in enumerate(grupos.tolist())}
+
+
+def _percentil_ordenado(ordenados, inicio, contagem, percentil):
+    """
+    Percentil de cada grupo de um array já ordenado por grupo e valor, com
+    interpolação linear (mesmo resultado de `np.percentile`).
+    """
+    posicao = inicio + (contagem - 1) * (percentil / 100)
+    baixo = np.floor(posicao).astype(int)
+    alto = np.ceil(posicao).astype(int)
+    fracao = posicao - baixo
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * fracao
@@ -0,0 +1,139 @@
+"""
+Busca antecipada (prefetch) do próximo nível do assistente.
+
+Enquanto o usuário ainda está escolhendo uma marca (ou modelo, ou ano), as
+respostas das opções mais prováveis são buscadas em segundo plano e ficam
+no cache. Quando a escolha é feita, a próxima tela abre sem esperar a rede.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cache import DIRETORIO_DADOS
+from indice_busca import normalizar
+
+# Marcas mais consultadas, usadas enquanto não há histórico de escolhas.
+NOMES_POPULARES = {normalizar(nome) for nome in (
+    'Fiat', 'VW - VolksWagen', 'GM - Chevrolet', 'Ford', 'Toyota',
+    'Hyundai', 'Renault', 'Honda', 'Yamaha', 'Jeep', 'Nissan',
+    'Mercedes-Benz', 'Scania', 'Volvo')}
+
+
+class Prefetcher:
+    """
+    Busca URLs em segundo plano apenas para aquecer o cache do cliente.
+    """
+    def __init__(self, cliente, max_simultaneos=2, arquivo_popularidade=None):
+        """
+        Construtor do Prefetcher.
+
+        :param cliente: (ClienteFipe) Cliente cujo cache será aquecido.
+        :param max_simultaneos: (int) Buscas antecipadas em paralelo. Usa um
+        pool próprio e pequeno para não atrasar as buscas reais das telas.
+        :param arquivo_popularidade: (str, opcional) Arquivo JSON com a
+        contagem das escolhas do usuário em cada lista.
+        """
+        self.cliente = cliente
+        self._executor = ThreadPoolExecutor(max_workers=max_simultaneos,
+                                            thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._pendentes = set()
+        if arquivo_popularidade is None:
+            arquivo_popularidade = os.path.join(DIRETORIO_DADOS,
+                                                'popularidade.json')
+        self.arquivo_popularidade = arquivo_popularidade
+        self._popularidade = self._ler_popularidade()
+        # Há escolhas contadas ainda não salvas (gravadas em `encerrar`).
+        self._popularidade_alterada = False
+
+    def prefetch(self, url):
+        """
+        Agenda a busca antecipada de uma URL, se ela ainda não estiver fresca
+        no cache nem sendo buscada.
+
+        :param url: (str) URL da API.
+        """
+        # Sem cache não há onde guardar o resultado (ex: snapshot local, em
+        # que toda consulta já é instantânea).
+        if self.cliente.cache is None:
+            return
+        # Chamado a cada passagem do mouse na thread da interface: a
+        # consulta ao cache fica para a thread do prefetch.
+        with self._lock:
+            if url in self._pendentes:
+                return
+            self._pendentes.add(url)
+        self._executor.submit(self._buscar, url)
+
+    def _buscar(self, url):
+        """Busca a URL, se ela ainda não estiver fresca no cache, e
+        descarta o resultado (fica no cache)."""
+        try:
+            if not self.cliente.cache.fresco(url):
+                self.cliente.obter_json(url)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Falhas no prefetch são ignoradas: a tela tenta de novo quando
+            # o usuário realmente fizer a escolha.
+            pass
+        finally:
+            with self._lock:
+                self._pendentes.discard(url)
+
+    # --- Popularidade das escolhas ---
+    def registrar_escolha(self, lista, codigo):
+        """
+        Conta uma escolha do usuário, usada para decidir o que antecipar.
+
+        :param lista: (str) Identificador da lista (ex: a URL das marcas).
+        :param codigo: (str) Código do item escolhido.
+        """
+        contagem = self._popularidade.setdefault(lista, {})
+        contagem[str(codigo)] = contagem.get(str(codigo), 0) + 1
+        # Cada clique só marca a contagem; o arquivo é gravado uma vez, ao
+        # encerrar.
+        self._popularidade_alterada = True
+
+    def populares(self, lista, itens, quantidade=3):
+        """
+        Retorna os itens mais prováveis de serem escolhidos em uma lista:
+        os mais escolhidos antes ou, sem histórico, as marcas populares.
+
+        :param lista: (str) Identificador da lista.
+        :param itens: (list) Itens exibidos {'nome': ..., 'codigo': ...}.
+        :param quantidade: (int) Máximo de itens retornados.
+        """
+        contagem = self._popularidade.get(lista)
+        if contagem:
+            escolhidos = [item for item in itens
+                          if str(item['codigo']) in contagem]
+            escolhidos.sort(key=lambda item: -contagem[str(item['codigo'])])
+            return escolhidos[:quantidade]
+        return [item for item in itens
+                if normalizar(item['nome']) in NOMES_POPULARES][:quantidade]
+
+    def _ler_popularidade(self):
+        """Carrega a contagem de escolhas salva em disco."""
+        try:
+            with open(self.arquivo_popularidade, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def salvar_popularidade(self):
+        """Grava a contagem de escolhas, se ela mudou desde a leitura."""
+        if not self._popularidade_alterada:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.arquivo_popularidade),
+                        exist_ok=True)
+            with open(self.arquivo_popularidade, 'w', encoding='utf-8') as f:
+                json.dump(self._popularidade, f)
+            self._popularidade_alterada = False
+        except OSError:
+            pass
+
+    def encerrar(self):
+        """Salva a contagem de escolhas e descarta as buscas antecipadas
+        que ainda não começaram."""
+        self.salvar_popularidade()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,291 @@
+"""
+Modo servidor: a consulta FIPE como uma API HTTP/JSON local, sem interface.
+
+Uso:
+
+    python main.py --servidor 8080
+    python main.py --servidor 0.0.0.0:8080 --snapshot fipe.sqlite3
+
+Rotas (GET):
+
+    /tipos
+    /<tipo>/marcas
+    /<tipo>/marcas/<marca>/modelos
+    /<tipo>/marcas/<marca>/modelos/<modelo>/anos
+    /<tipo>/marcas/<marca>/modelos/<modelo>/anos/<ano>
+    /estatisticas
+
+O servidor usa asyncio e atende muitas conexões (com keep-alive) em uma só
+thread; as consultas, que bloqueiam na rede ou no disco, rodam em um pool de
+threads. Requisições idênticas que chegam enquanto a primeira ainda está
+sendo resolvida esperam por ela em vez de gerar outra consulta, e as
+respostas mais recentes ficam em memória, já serializadas, por alguns
+segundos.
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from consulta import ConsultaFipe, ErroConsulta
+
+MOTIVOS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 431: 'Request Header Fields Too Large',
+           500: 'Internal Server Error', 502: 'Bad Gateway'}
+# Tamanho máximo da linha de requisição e dos cabeçalhos.
+LIMITE_CABECALHOS = 16 * 1024
+# Tempo máximo de uma conexão ociosa em keep-alive, em segundos.
+TEMPO_OCIOSO = 30
+
+
+class ServidorFipe:
+    """
+    Servidor HTTP assíncrono que responde às consultas da `ConsultaFipe`.
+    """
+    def __init__(self, consulta, host='127.0.0.1', porta=8080,
+                 max_threads=16, ttl_memoria=60, tamanho_memoria=4096):
+        """
+        Construtor do ServidorFipe.
+
+        :param consulta: (ConsultaFipe) Consultas usadas nas respostas.
+        :param host: (str) Endereço de escuta.
+        :param porta: (int) Porta de escuta (0 escolhe uma livre).
+        :param max_threads: (int) Consultas bloqueantes simultâneas.
+        :param ttl_memoria: (float) Segundos que uma resposta fica na
+        memória antes de ser consultada de novo (no cache em disco).
+        :param tamanho_memoria: (int) Máximo de respostas em memória.
+        """
+        self.consulta = consulta
+        self.host = host
+        self.porta = porta
+        self.ttl_memoria = ttl_memoria
+        self.tamanho_memoria = tamanho_memoria
+        self._executor = ThreadPoolExecutor(max_workers=max_threads,
+                                            thread_name_prefix='servidor')
+        self._memoria = OrderedDict()   # rota -> (expira_em, corpo)
+        self._em_andamento = {}         # rota -> asyncio.Future
+        self._servidor = None
+        self.contadores = {'requisicoes': 0, 'memoria': 0, 'coalescidas': 0,
+                           'consultas': 0, 'erros': 0}
+
+    # --- Rotas ---
+    def _rota(self, caminho):
+        """
+        Identifica a consulta de um caminho.
+
+        :return: (tuple | None) `(metodo, argumentos)` da ConsultaFipe, ou
+        None se o caminho não existir.
+        """
+        partes = [p for p in caminho.split('?', 1)[0].split('/') if p]
+        if partes == ['tipos']:
+            return 'tipos', ()
+        if len(partes) < 2 or partes[1] != 'marcas':
+            return None
+        nomes = ('marcas', 'modelos', 'anos')
+        # Formato: tipo/marcas[/marca/modelos[/modelo/anos[/ano]]]
+        if len(partes) % 2 == 0:
+            nivel = len(partes) // 2 - 1
+            if nivel < 3 and all(partes[2 * i + 1] == nomes[i]
+                                 for i in range(nivel + 1)):
+                return nomes[nivel], tuple(partes[0::2])
+        elif len(partes) == 7 and partes[1::2] == list(nomes):
+            return 'valor', tuple(partes[0::2])
+        return None
+
+    def _consultar(self, metodo, argumentos):
+        """Executa a consulta e serializa a resposta (roda no pool)."""
+        dados = getattr(self.consulta, metodo)(*argumentos)
+        return json.dumps(dados, ensure_ascii=False).encode('utf-8')
+
+    async def _resolver(self, metodo, argumentos):
+        """
+        Resolve uma consulta pela memória, por uma consulta idêntica em
+        andamento ou, por fim, no pool de threads.
+
+        :return: (bytes) Corpo JSON da resposta.
+        """
+        chave = (metodo, argumentos)
+        agora = time.monotonic()
+        guardado = self._memoria.get(chave)
+        if guardado and guardado[0] > agora:
+            self._memoria.move_to_end(chave)
+            self.contadores['memoria'] += 1
+            return guardado[1]
+
+        andamento = self._em_andamento.get(chave)
+        if andamento is not None:
+            self.contadores['coalescidas'] += 1
+            # `shield` impede que a desconexão de um cliente cancele a
+            # consulta compartilhada com os demais.
+            return await asyncio.shield(andamento)
+
+        loop = asyncio.get_running_loop()
+        futuro = loop.run_in_executor(self._executor, self._consultar,
+                                      metodo, argumentos)
+        self._em_andamento[chave] = futuro
+        self.contadores['consultas'] += 1
+        try:
+            corpo = await asyncio.shield(futuro)
+        finally:
+            self._em_andamento.pop(chave, None)
+        self._memoria[chave] = (time.monotonic() + self.ttl_memoria, corpo)
+        if len(self._memoria) > self.tamanho_memoria:
+            self._memoria.popitem(last=False)
+        return corpo
+
+    async def responder(self, metodo_http, caminho):
+        """
+        Gera a resposta de uma requisição.
+
+        :return: (tuple) `(status, corpo)`, com o corpo em JSON.
+        """
+        if metodo_http not in ('GET', 'HEAD'):
+            return 405, self._erro('Use GET.')
+        if caminho.split('?', 1)[0].rstrip('/') == '/estatisticas':
+            return 200, json.dumps(self.estatisticas()).encode('utf-8')
+        rota = self._rota(caminho)
+        if rota is None:
+            return 404, self._erro('Rota não encontrada.')
+        try:
+            return 200, await self._resolver(*rota)
+        except ErroConsulta as e:
+            return 400, self._erro(str(e))
+        except LookupError as e:
+            return 404, self._erro(str(e))
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else 0
+            return (404 if status == 404 else 502), self._erro(str(e))
+        except requests.exceptions.RequestException as e:
+            return 502, self._erro(str(e))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            return 500, self._erro(f'{type(e).__name__}: {e}')
+
+    def _erro(self, mensagem):
+        """Corpo JSON de uma resposta de erro."""
+        self.contadores['erros'] += 1
+        return json.dumps({'erro': mensagem},
+                          ensure_ascii=False).encode('utf-8')
+
+    def estatisticas(self):
+        """Contadores do servidor e, se houver, do cliente e do gateway da
+        API."""
+        resumo = dict(self.contadores)
+        resumo['em_andamento'] = len(self._em_andamento)
+        resumo['em_memoria'] = len(self._memoria)
+        estatisticas_cliente = getattr(self.consulta.cliente,
+                                       'estatisticas', None)
+        if estatisticas_cliente is not None:
+            resumo['api'] = estatisticas_cliente.resumo()
+        gateway = getattr(self.consulta.cliente, 'gateway', None)
+        if gateway is not None:
+            resumo['gateway'] = gateway.resumo()
+        return resumo
+
+    # --- HTTP ---
+    async def _atender(self, leitor, escritor):
+        """Atende as requisições de uma conexão até ela ser encerrada."""
+        try:
+            while True:
+                try:
+                    cabecalho = await asyncio.wait_for(
+                        leitor.readuntil(b'\r\n\r\n'), TEMPO_OCIOSO)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError,
+                        ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._escrever(escritor, 431,
+                                         self._erro('Cabeçalhos longos.'),
+                                         False, False)
+                    return
+                linhas = cabecalho.decode('latin-1').split('\r\n')
+                try:
+                    metodo, caminho, versao = linhas[0].split(' ', 2)
+                except ValueError:
+                    await self._escrever(escritor, 400,
+                                         self._erro('Requisição inválida.'),
+                                         False, False)
+                    return
+                cabecalhos = {}
+                for linha in linhas[1:]:
+                    nome, _, valor = linha.partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                conexao = cabecalhos.get('connection', '').lower()
+                manter = (conexao != 'close' if versao == 'HTTP/1.1'
+                          else conexao == 'keep-alive')
+
+                self.contadores['requisicoes'] += 1
+                status, corpo = await self.responder(metodo, caminho)
+                await self._escrever(escritor, status, corpo, manter,
+                                     metodo == 'HEAD')
+                if not manter:
+                    return
+        finally:
+            escritor.close()
+
+    @staticmethod
+    async def _escrever(escritor, status, corpo, manter, sem_corpo):
+        """Envia uma resposta HTTP/1.1."""
+        cabecalho = (f'HTTP/1.1 {status} {MOTIVOS.get(status, "")}\r\n'
+                     'Content-Type: application/json; charset=utf-8\r\n'
+                     f'Content-Length: {len(corpo)}\r\n'
+                     f'Connection: {"keep-alive" if manter else "close"}'
+                     '\r\n\r\n').encode('latin-1')
+        escritor.write(cabecalho if sem_corpo else cabecalho + corpo)
+        try:
+            await escritor.drain()
+        except ConnectionError:
+            pass
+
+    async def iniciar(self):
+        """Abre a porta de escuta. Com `porta=0`, atualiza `self.porta`."""
+        self._servidor = await asyncio.start_server(
+            self._atender, self.host, self.porta, limit=LIMITE_CABECALHOS)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+
+    async def servir(self):
+        """Inicia (se preciso) e atende até ser cancelado."""
+        if self._servidor is None:
+            await self.iniciar()
+        async with self._servidor:
+            await self._servidor.serve_forever()
+
+    async def encerrar(self):
+        """Fecha a porta de escuta e o pool de threads."""
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def endereco(texto):
+    """
+    Interpreta '[HOST:]PORTA'.
+
+    :return: (tuple) `(host, porta)`; o host padrão é 127.0.0.1.
+    """
+    host, _, porta = texto.rpartition(':')
+    return host or '127.0.0.1', int(porta)
+
+
+def executar(cliente, host='127.0.0.1', porta=8080):
+    """
+    Roda o servidor até Ctrl+C.
+
+    :param cliente: (ClienteFipe | SnapshotFipe) Fonte das respostas.
+    """
+    servidor = ServidorFipe(ConsultaFipe(cliente), host, porta)
+
+    async def principal():
+        await servidor.iniciar()
+        print(f'Servindo a tabela FIPE em http://{servidor.host}:'
+              f'{servidor.porta}/ (Ctrl+C para sair)')
+        try:
+            await servidor.servir()
+        finally:
+            await servidor.encerrar()
+
+    try:
+        asyncio.run(principal())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,185 @@
+"""
+Servidor local que imita a API FIPE, para testes e medições sem rede.
+
+Responde às mesmas rotas da API (v1 na raiz, v2 em '/v2/') com as respostas
+de uma fixture (ver `fontes.py`), simulando latência, variação (jitter) e
+falhas em uma proporção configurável. Com a mesma semente, a sequência de
+atrasos e falhas se repete, e as medições podem ser comparadas.
+
+Uso:
+
+    python servidor_mock.py --fixture respostas.jsonl --latencia 80 \\
+        --jitter 30 --taxa-erros 0.02 --porta 8765
+    python main.py --fonte api:http://127.0.0.1:8765/
+"""
+import argparse
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fontes import FixtureFipe
+
+
+class ConfiguracaoMock:
+    """
+    Comportamento simulado do servidor.
+    """
+    def __init__(self, latencia=0.0, jitter=0.0, taxa_erros=0.0,
+                 status_erro=503, retry_after=1, semente=0):
+        """
+        :param latencia: (float) Atraso médio de cada resposta, em segundos.
+        :param jitter: (float) Desvio padrão do atraso, em segundos.
+        :param taxa_erros: (float) Proporção (0 a 1) de respostas com erro.
+        :param status_erro: (int) Status das respostas com erro (ex: 429).
+        :param retry_after: (int | None) Cabeçalho Retry-After dos erros
+        429/503, em segundos.
+        :param semente: (int) Semente dos sorteios de atraso e de erro.
+        """
+        self.latencia = latencia
+        self.jitter = jitter
+        self.taxa_erros = taxa_erros
+        self.status_erro = status_erro
+        self.retry_after = retry_after
+        self._sorteio = random.Random(semente)
+        self._lock = threading.Lock()
+
+    def sortear(self):
+        """
+        :return: (tuple) `(atraso em segundos, falhar?)` da próxima resposta.
+        """
+        with self._lock:
+            atraso = max(self._sorteio.gauss(self.latencia, self.jitter), 0.0) \
+                if self.jitter else self.latencia
+            return atraso, self._sorteio.random() < self.taxa_erros
+
+
+class ServidorMock(ThreadingHTTPServer):
+    """
+    Servidor HTTP que responde com uma `FixtureFipe`.
+    """
+    daemon_threads = True
+
+    def __init__(self, fixture, configuracao=None, host='127.0.0.1',
+                 porta=0):
+        """
+        :param fixture: (FixtureFipe) Respostas servidas.
+        :param configuracao: (ConfiguracaoMock, opcional) Atrasos e falhas.
+        Por padrão, respostas imediatas e sem falhas.
+        :param porta: (int) Porta de escuta (0 escolhe uma livre).
+        """
+        super().__init__((host, porta), _Tratador)
+        self.fixture = fixture
+        self.configuracao = configuracao or ConfiguracaoMock()
+        self._lock = threading.Lock()
+        self.contadores = {'requisicoes': 0, 'nao_modificadas': 0,
+                           'erros_simulados': 0, 'nao_encontradas': 0}
+
+    @property
+    def url(self):
+        """Endereço base, para `fontes.abrir_fonte('api:' + url)`."""
+        host, porta = self.server_address[:2]
+        return f'http://{host}:{porta}/'
+
+    def contar(self, contador):
+        with self._lock:
+            self.contadores[contador] += 1
+
+    def iniciar(self):
+        """Atende em uma thread em segundo plano e retorna a thread."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _Tratador(BaseHTTPRequestHandler):
+    """Trata uma requisição GET de acordo com a fixture e a configuração."""
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalho e corpo saem em escritas separadas; sem isto, o atraso do
+    # algoritmo de Nagle somaria ~40 ms a cada resposta com keep-alive.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Silencia o log de cada requisição."""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        servidor = self.server
+        servidor.contar('requisicoes')
+        atraso, falhar = servidor.configuracao.sortear()
+        if atraso:
+            time.sleep(atraso)
+        if falhar:
+            servidor.contar('erros_simulados')
+            cabecalhos = {}
+            if servidor.configuracao.retry_after is not None and \
+                    servidor.configuracao.status_erro in (429, 503):
+                cabecalhos['Retry-After'] = \
+                    str(servidor.configuracao.retry_after)
+            self._responder(servidor.configuracao.status_erro,
+                            b'{"error": "simulado"}', cabecalhos)
+            return
+        try:
+            dados = servidor.fixture.respostas[self.path.lstrip('/')]
+        except KeyError:
+            servidor.contar('nao_encontradas')
+            self._responder(404, b'{"error": "nao encontrado"}')
+            return
+        corpo = json.dumps(dados, ensure_ascii=False).encode('utf-8')
+        etag = '"' + hashlib.sha1(corpo).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            servidor.contar('nao_modificadas')
+            self._responder(304, b'', {'ETag': etag})
+            return
+        self._responder(200, corpo, {'ETag': etag})
+
+    def _responder(self, status, corpo, cabecalhos=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description='Servidor local que imita a API FIPE.')
+    parser.add_argument('--fixture', metavar='ARQUIVO',
+                        help='respostas gravadas em JSONL (padrão: catálogo '
+                        'sintético)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.0,
+                        help='atraso médio por resposta, em ms')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='desvio padrão do atraso, em ms')
+    parser.add_argument('--taxa-erros', type=float, default=0.0,
+                        help='proporção de respostas com erro (0 a 1)')
+    parser.add_argument('--status-erro', type=int, default=503,
+                        help='status HTTP das respostas com erro')
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    fixture = (FixtureFipe.de_arquivo(args.fixture) if args.fixture
+               else FixtureFipe.sintetica(semente=args.semente))
+    configuracao = ConfiguracaoMock(args.latencia / 1000, args.jitter / 1000,
+                                    args.taxa_erros, args.status_erro,
+                                    semente=args.semente)
+    servidor = ServidorMock(fixture, configuracao, args.host, args.porta)
+    print(f'{len(fixture.respostas)} respostas em {servidor.url} '
+          '(Ctrl+C para sair)')
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
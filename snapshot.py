@@ -0,0 +1,399 @@
+"""
+Snapshot local (SQLite) do catálogo completo da tabela FIPE.
+
+Uso pela linha de comando, para coletar o catálogo:
+
+    python snapshot.py --saida fipe.sqlite3 --concorrencia 4
+
+A coleta percorre tipos -> marcas -> modelos -> anos -> valores e grava o
+progresso no próprio arquivo: se for interrompida, basta rodar o mesmo
+comando de novo para continuar de onde parou. Depois, a aplicação pode
+usar o snapshot no lugar da API:
+
+    python main.py --snapshot fipe.sqlite3
+"""
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from cliente_fipe import ClienteFipe, UrlsFipe
+
+TIPOS = ('carros', 'motos', 'caminhoes')
+
+# Situação de cada URL na fila de coleta.
+PENDENTE, CONCLUIDA, FALHOU = 0, 1, 2
+
+_ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT);
+CREATE TABLE IF NOT EXISTS tarefas (
+    caminho TEXT PRIMARY KEY,
+    nivel TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    marca TEXT,
+    modelo TEXT,
+    ano TEXT,
+    situacao INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS idx_tarefas_situacao ON tarefas (situacao);
+CREATE TABLE IF NOT EXISTS marcas (
+    tipo TEXT NOT NULL,
+    codigo TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    PRIMARY KEY (tipo, codigo));
+CREATE TABLE IF NOT EXISTS modelos (
+    tipo TEXT NOT NULL,
+    marca TEXT NOT NULL,
+    codigo INTEGER NOT NULL,
+    nome TEXT NOT NULL,
+    PRIMARY KEY (tipo, marca, codigo));
+CREATE TABLE IF NOT EXISTS anos (
+    tipo TEXT NOT NULL,
+    marca TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    codigo TEXT NOT NULL,
+    nome TEXT NOT NULL,
+    PRIMARY KEY (tipo, marca, modelo, codigo));
+CREATE TABLE IF NOT EXISTS valores (
+    tipo TEXT NOT NULL,
+    marca TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    ano TEXT NOT NULL,
+    tipo_veiculo INTEGER,
+    valor TEXT,
+    marca_nome TEXT,
+    modelo_nome TEXT,
+    ano_modelo INTEGER,
+    combustivel TEXT,
+    codigo_fipe TEXT,
+    mes_referencia TEXT,
+    sigla_combustivel TEXT,
+    PRIMARY KEY (tipo, marca, modelo, ano));
+CREATE INDEX IF NOT EXISTS idx_valores_codigo_fipe ON valores (codigo_fipe);
+'''
+
+
+class ErroSnapshot(LookupError):
+    """Dado não encontrado no snapshot ou snapshot inconsistente."""
+
+
+class SnapshotFipe(UrlsFipe):
+    """
+    Fonte de dados somente leitura que responde às mesmas URLs do
+    `ClienteFipe`, consultando as tabelas do snapshot em vez da rede.
+    """
+    base_url = 'snapshot:///'
+    # Não há cache: toda consulta já é local.
+    cache = None
+
+    def __init__(self, caminho):
+        """
+        :param caminho: (str) Arquivo gerado por `ConstrutorSnapshot`.
+        """
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True,
+                                        check_same_thread=False)
+        self.mes_referencia = self._meta('mes_referencia')
+
+    def _meta(self, chave):
+        """Lê um valor da tabela de metadados."""
+        linha = self._consultar(
+            'SELECT valor FROM meta WHERE chave = ?', (chave,))
+        return linha[0][0] if linha else None
+
+    def _consultar(self, sql, parametros=()):
+        """Executa uma consulta e retorna todas as linhas."""
+        with self._lock:
+            return self._conexao.execute(sql, parametros).fetchall()
+
+    def _verificar_coletado(self, url):
+        """Lança ErroSnapshot se a URL não foi coletada com sucesso."""
+        caminho = url[len(self.base_url):]
+        linha = self._consultar(
+            'SELECT situacao FROM tarefas WHERE caminho = ?', (caminho,))
+        if not linha or linha[0][0] != CONCLUIDA:
+            raise ErroSnapshot(f'{caminho} não foi coletado neste snapshot.')
+
+    def obter_json(self, url):
+        """
+        Retorna o JSON que a API devolveria para a URL.
+
+        :param url: (str) URL montada por `url_marcas`, `url_modelos`...
+        """
+        self._verificar_coletado(url)
+        p = self.decompor_url(url)
+        if 'ano' in p:
+            return self._valor(p['tipo'], p['marca'], p['modelo'], p['ano'])
+        if 'modelo' in p:
+            return [{'nome': nome, 'codigo': codigo} for codigo, nome in
+                    self._consultar(
+                        'SELECT codigo, nome FROM anos WHERE tipo = ? AND '
+                        'marca = ? AND modelo = ? ORDER BY rowid',
+                        (p['tipo'], p['marca'], p['modelo']))]
+        if 'marca' in p:
+            modelos = [{'nome': nome, 'codigo': codigo} for codigo, nome in
+                       self._consultar(
+                           'SELECT codigo, nome FROM modelos WHERE tipo = ? '
+                           'AND marca = ? ORDER BY rowid',
+                           (p['tipo'], p['marca']))]
+            anos = [{'nome': nome, 'codigo': codigo} for codigo, nome in
+                    self._consultar(
+                        'SELECT DISTINCT codigo, nome FROM anos WHERE '
+                        'tipo = ? AND marca = ? ORDER BY codigo DESC',
+                        (p['tipo'], p['marca']))]
+            return {'modelos': modelos, 'anos': anos}
+        return [{'nome': nome, 'codigo': codigo} for codigo, nome in
+                self._consultar(
+                    'SELECT codigo, nome FROM marcas WHERE tipo = ? '
+                    'ORDER BY rowid', (p['tipo'],))]
+
+    def _valor(self, tipo, marca, modelo, ano):
+        """Monta o dicionário de valor no mesmo formato da API."""
+        linhas = self._consultar(
+            'SELECT tipo_veiculo, valor, marca_nome, modelo_nome, ano_modelo,'
+            ' combustivel, codigo_fipe, mes_referencia, sigla_combustivel '
+            'FROM valores WHERE tipo = ? AND marca = ? AND modelo = ? '
+            'AND ano = ?', (tipo, marca, modelo, ano))
+        if not linhas:
+            raise ErroSnapshot('Veículo não encontrado no snapshot.')
+        return linha_para_valor(linhas[0])
+
+    def localizar_codigo_fipe(self, codigo_fipe):
+        """
+        Lista os veículos (um por ano-modelo) com um determinado Código FIPE.
+
+        :param codigo_fipe: (str) Ex: '005340-6'
+        :return: (list) Dicionários com 'tipo', 'marca', 'modelo' e 'ano'.
+        """
+        return [{'tipo': tipo, 'marca': marca, 'modelo': modelo, 'ano': ano}
+                for tipo, marca, modelo, ano in self._consultar(
+                    'SELECT tipo, marca, modelo, ano FROM valores '
+                    'WHERE codigo_fipe = ? ORDER BY ano DESC',
+                    (codigo_fipe,))]
+
+    def fechar(self):
+        """Fecha o arquivo do snapshot."""
+        with self._lock:
+            self._conexao.close()
+
+
+def linha_para_valor(linha):
+    """Converte uma linha da tabela `valores` no dicionário da API."""
+    (tipo_veiculo, valor, marca, modelo, ano_modelo, combustivel,
+     codigo_fipe, mes_referencia, sigla) = linha
+    return {
+        'TipoVeiculo': tipo_veiculo,
+        'Valor': valor,
+        'Marca': marca,
+        'Modelo': modelo,
+        'AnoModelo': ano_modelo,
+        'Combustivel': combustivel,
+        'CodigoFipe': codigo_fipe,
+        'MesReferencia': mes_referencia,
+        'SiglaCombustivel': sigla,
+    }
+
+
+class ConstrutorSnapshot:
+    """
+    Coleta o catálogo da API e grava no snapshot, com concorrência limitada
+    e progresso salvo a cada lote.
+    """
+    def __init__(self, caminho, cliente=None, concorrencia=4, tipos=TIPOS,
+                 tamanho_lote=200):
+        """
+        :param caminho: (str) Arquivo SQLite de saída (criado se não existir).
+        :param cliente: (ClienteFipe, opcional) Cliente usado na coleta.
+        :param concorrencia: (int) Requisições simultâneas à API.
+        :param tipos: (tuple) Tipos de veículo a coletar.
+        :param tamanho_lote: (int) URLs processadas entre dois commits.
+        """
+        self.cliente = cliente or ClienteFipe(tentativas=5)
+        self.concorrencia = concorrencia
+        self.tamanho_lote = tamanho_lote
+        self._conexao = sqlite3.connect(caminho)
+        self._conexao.executescript(_ESQUEMA)
+        for tipo in tipos:
+            self._enfileirar('marcas', tipo)
+        self._conexao.commit()
+
+    def _caminho(self, url):
+        """Caminho relativo da URL, usado como chave da fila."""
+        return url[len(self.cliente.base_url):]
+
+    def _enfileirar(self, nivel, tipo, marca=None, modelo=None, ano=None):
+        """Adiciona uma URL à fila de coleta (se ainda não estiver)."""
+        if nivel == 'marcas':
+            url = self.cliente.url_marcas(tipo)
+        elif nivel == 'modelos':
+            url = self.cliente.url_modelos(tipo, marca)
+        elif nivel == 'anos':
+            url = self.cliente.url_anos(tipo, marca, modelo)
+        else:
+            url = self.cliente.url_valor(tipo, marca, modelo, ano)
+        self._conexao.execute(
+            'INSERT OR IGNORE INTO tarefas '
+            '(caminho, nivel, tipo, marca, modelo, ano) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (self._caminho(url), nivel, tipo, marca, modelo, ano))
+
+    def repetir_falhas(self):
+        """Devolve à fila as URLs que falharam em execuções anteriores."""
+        self._conexao.execute(
+            'UPDATE tarefas SET situacao = ? WHERE situacao = ?',
+            (PENDENTE, FALHOU))
+        self._conexao.commit()
+
+    def executar(self):
+        """
+        Coleta todas as URLs pendentes até a fila esvaziar.
+
+        :return: (dict) Totais de URLs concluídas e com falha, e a taxa em
+        requisições por segundo.
+        """
+        concluidas = falhas = 0
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concorrencia) as executor:
+            while True:
+                lote = self._conexao.execute(
+                    'SELECT caminho, nivel, tipo, marca, modelo, ano '
+                    'FROM tarefas WHERE situacao = ? ORDER BY rowid LIMIT ?',
+                    (PENDENTE, self.tamanho_lote)).fetchall()
+                if not lote:
+                    break
+                futuros = {executor.submit(
+                    self.cliente.obter_json,
+                    self.cliente.base_url + tarefa[0]): tarefa
+                    for tarefa in lote}
+                for futuro in as_completed(futuros):
+                    tarefa = futuros[futuro]
+                    try:
+                        dados = futuro.result()
+                    except requests.exceptions.RequestException as e:
+                        print(f'Falha em {tarefa[0]}: {e}', file=sys.stderr)
+                        self._marcar(tarefa[0], FALHOU)
+                        falhas += 1
+                        continue
+                    self._registrar(tarefa, dados)
+                    self._marcar(tarefa[0], CONCLUIDA)
+                    concluidas += 1
+                # Cada lote é gravado de uma vez: se a coleta for
+                # interrompida, perde-se no máximo o lote atual.
+                self._conexao.commit()
+                decorrido = time.perf_counter() - inicio
+                print(f'{concluidas} concluídas, {falhas} falhas, '
+                      f'{self._pendentes()} pendentes '
+                      f'({concluidas / decorrido:.1f} req/s)')
+        decorrido = time.perf_counter() - inicio
+        return {'concluidas': concluidas, 'falhas': falhas,
+                'requisicoes_por_segundo': concluidas / decorrido
+                if decorrido else 0.0}
+
+    def _pendentes(self):
+        """Quantidade de URLs ainda na fila."""
+        return self._conexao.execute(
+            'SELECT COUNT(*) FROM tarefas WHERE situacao = ?',
+            (PENDENTE,)).fetchone()[0]
+
+    def _marcar(self, caminho, situacao):
+        """Atualiza a situação de uma URL da fila."""
+        self._conexao.execute(
+            'UPDATE tarefas SET situacao = ? WHERE caminho = ?',
+            (situacao, caminho))
+
+    def _registrar(self, tarefa, dados):
+        """Grava a resposta de uma URL e enfileira o nível seguinte."""
+        _, nivel, tipo, marca, modelo, ano = tarefa
+        if nivel == 'marcas':
+            for item in dados:
+                self._conexao.execute(
+                    'INSERT OR REPLACE INTO marcas VALUES (?, ?, ?)',
+                    (tipo, str(item['codigo']), item['nome']))
+                self._enfileirar('modelos', tipo, str(item['codigo']))
+        elif nivel == 'modelos':
+            for item in dados.get('modelos', []):
+                self._conexao.execute(
+                    'INSERT OR REPLACE INTO modelos VALUES (?, ?, ?, ?)',
+                    (tipo, marca, item['codigo'], item['nome']))
+                self._enfileirar('anos', tipo, marca, str(item['codigo']))
+        elif nivel == 'anos':
+            for item in dados:
+                self._conexao.execute(
+                    'INSERT OR REPLACE INTO anos VALUES (?, ?, ?, ?, ?)',
+                    (tipo, marca, modelo, str(item['codigo']), item['nome']))
+                self._enfileirar('valor', tipo, marca, modelo,
+                                 str(item['codigo']))
+        else:
+            self._verificar_mes(dados.get('MesReferencia'))
+            self._conexao.execute(
+                'INSERT OR REPLACE INTO valores VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (tipo, marca, modelo, ano, dados.get('TipoVeiculo'),
+                 dados.get('Valor'), dados.get('Marca'), dados.get('Modelo'),
+                 dados.get('AnoModelo'), dados.get('Combustivel'),
+                 dados.get('CodigoFipe'), dados.get('MesReferencia'),
+                 dados.get('SiglaCombustivel')))
+
+    def _verificar_mes(self, mes_referencia):
+        """
+        Garante que todo o snapshot é de um único mês de referência. A API
+        só responde o mês corrente, então uma coleta retomada depois da
+        virada do mês misturaria preços de meses diferentes.
+        """
+        linha = self._conexao.execute(
+            "SELECT valor FROM meta WHERE chave = 'mes_referencia'").fetchone()
+        if linha is None:
+            self._conexao.execute(
+                "INSERT INTO meta VALUES ('mes_referencia', ?)",
+                (mes_referencia,))
+        elif linha[0] != mes_referencia:
+            raise ErroSnapshot(
+                f'O snapshot é de {linha[0]}, mas a API já responde '
+                f'{mes_referencia}. Inicie um novo arquivo.')
+
+    def fechar(self):
+        """Grava o que estiver pendente e fecha o arquivo."""
+        self._conexao.commit()
+        self._conexao.close()
+
+
+def main(argv=None):
+    """Ponto de entrada da linha de comando."""
+    parser = argparse.ArgumentParser(
+        description='Coleta o catálogo da tabela FIPE em um snapshot local.')
+    parser.add_argument('--saida', default='fipe_snapshot.sqlite3',
+                        help='arquivo SQLite do snapshot')
+    parser.add_argument('--concorrencia', type=int, default=4,
+                        help='requisições simultâneas à API')
+    parser.add_argument('--tipos', nargs='+', choices=TIPOS, default=TIPOS,
+                        help='tipos de veículo a coletar')
+    parser.add_argument('--repetir-falhas', action='store_true',
+                        help='tenta de novo as URLs que falharam antes')
+    args = parser.parse_args(argv)
+
+    construtor = ConstrutorSnapshot(args.saida,
+                                    concorrencia=args.concorrencia,
+                                    tipos=tuple(args.tipos))
+    if args.repetir_falhas:
+        construtor.repetir_falhas()
+    try:
+        totais = construtor.executar()
+    except KeyboardInterrupt:
+        print('Interrompido. Rode o mesmo comando para continuar.')
+        return 1
+    except ErroSnapshot as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        construtor.fechar()
+    print(f"Coleta finalizada: {totais['concluidas']} URLs, "
+          f"{totais['falhas']} falhas.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())